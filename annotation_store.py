@@ -0,0 +1,215 @@
+import os
+import json
+import numpy as np
+from edit_journal import INSERT, DELETE, SET
+from label_io import parse_box_labels, format_box_labels
+
+'''
+关键点数据集的格式配置(schema)和按图片存放的数组式标注。
+schema 为 JSON 文件，列出类别名、关键点名和关键点数 K，例如：
+{"classes": ["person"], "num_keypoints": 17, "keypoints": ["nose", "left_eye", ...]}
+keypoints 可以省略(自动命名为 关键点1..K)，num_keypoints 也可以省略(取 keypoints 的长度)。
+
+一张图片的全部标注是一个 (N, 5 + 3K) 的 float64 数组，每行与 .txt 中的一行相同：
+类别 cx cy w h x1 y1 v1 ... xK yK vK(坐标为归一化值)。读写文件(label_io)、校验、绘制都直接对整个数组操作；
+界面代码通过 Annotation / KeypointList 视图按 ann["bbox"]、ann["keypoints"][k] 的方式读写单个标注。
+设置了 journal(EditJournal)时，每次增、删、改一行都会写一条预写日志记录。
+'''
+
+SCHEMA_FILENAME = "dataset_schema.json"
+DEFAULT_SCHEMA = {"classes": ["standing", "sidelying", "prone"], "num_keypoints": 9}
+
+
+class Schema:
+    def __init__(self, class_names, keypoint_names, path=None):
+        self.class_names = class_names
+        self.keypoint_names = keypoint_names
+        self.num_keypoints = len(keypoint_names)
+        self.path = path
+
+    def row_size(self):
+        return 5 + 3 * self.num_keypoints
+
+
+def parse_schema(config, path=None):
+    classes = config.get("classes")
+    if not classes or not all(isinstance(name, str) for name in classes):
+        raise ValueError("classes 必须是非空的类别名列表")
+    names = config.get("keypoints")
+    count = config.get("num_keypoints", len(names) if names else None)
+    if not isinstance(count, int) or count < 1:
+        raise ValueError("num_keypoints 必须是正整数")
+    if names is None:
+        names = [f"关键点{i + 1}" for i in range(count)]
+    elif len(names) != count:
+        raise ValueError(f"keypoints 有 {len(names)} 个名称，与 num_keypoints={count} 不一致")
+    return Schema(list(classes), list(names), path)
+
+
+def load_schema(path):
+    """读取 schema 文件，格式错误时抛出 ValueError"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            config = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{path} 不是有效的 JSON: {e}")
+    return parse_schema(config, path)
+
+
+def find_schema(folder, default_dir):
+    """优先使用数据集文件夹里的 schema 文件，其次是工具目录下的，都没有时用内置的默认配置"""
+    for directory in (folder, default_dir):
+        if directory and os.path.exists(os.path.join(directory, SCHEMA_FILENAME)):
+            return load_schema(os.path.join(directory, SCHEMA_FILENAME))
+    return parse_schema(DEFAULT_SCHEMA)
+
+
+def parse_labels(text, num_keypoints):
+    """把 .txt 内容解析为 (N, 5 + 3K) 数组，返回 (数组, 警告列表)，规则见 label_io.parse_box_labels"""
+    data, _, issues = parse_box_labels(text, num_keypoints)
+    return data, [f"第{line_num}行{message}" for line_num, _, message in issues]
+
+
+class AnnotationStore:
+    """一张图片的全部标注；按序号取出的是该行的视图，增删行时视图的序号随之更新"""
+
+    def __init__(self, num_keypoints, data=None):
+        self.num_keypoints = num_keypoints
+        self.data = np.zeros((0, 5 + 3 * num_keypoints)) if data is None else data
+        self.views = [Annotation(self, i) for i in range(len(self.data))]
+        self.saved = self.data.copy()  # 最近一次读取或保存时的内容，用来判断是否有改动
+        self.write_failed = False
+        self.image_path = None
+        self.journal = None
+
+    def attach(self, journal, image_path):
+        self.journal = journal
+        self.image_path = image_path
+
+    def log(self, op, index):
+        if self.journal is not None:
+            self.journal.record(self, op, index)
+
+    def is_dirty(self):
+        """与最近一次读取或保存时相比有没有改动(改了又撤销回去不算改动)"""
+        return self.write_failed or not np.array_equal(self.data, self.saved)
+
+    def mark_saved(self):
+        self.saved = self.data.copy()
+        self.write_failed = False
+
+    def mark_dirty(self):
+        self.write_failed = True
+
+    @classmethod
+    def load(cls, path, num_keypoints):
+        """读取 .txt，返回 (AnnotationStore, 警告列表)"""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_text(f.read(), num_keypoints)
+
+    @classmethod
+    def from_text(cls, text, num_keypoints):
+        """解析 .txt 内容，返回 (AnnotationStore, 警告列表)"""
+        data, warnings = parse_labels(text, num_keypoints)
+        return cls(num_keypoints, data), warnings
+
+    def to_text(self):
+        return format_box_labels(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __getitem__(self, index):
+        return self.views[index]
+
+    def __iter__(self):
+        return iter(self.views)
+
+    def append(self, class_id, bbox):
+        """添加一个关键点都未标注的标注，返回它的序号"""
+        row = np.zeros(self.data.shape[1])
+        row[0] = class_id
+        row[1:5] = bbox
+        self.insert(len(self), row)
+        return len(self) - 1
+
+    def insert(self, index, row):
+        self.data = np.insert(self.data, index, row, axis=0)
+        self.views.insert(index, Annotation(self, index))
+        self.renumber(index + 1)
+        self.log(INSERT, index)
+
+    def set_row(self, index, row):
+        self.data[index] = row
+        self.log(SET, index)
+
+    def pop(self, index):
+        """删除一行并返回它的副本(撤销时可以原样插回)"""
+        row = self.data[index].copy()
+        self.data = np.delete(self.data, index, axis=0)
+        del self.views[index]
+        self.renumber(index)
+        self.log(DELETE, index)
+        return row
+
+    def renumber(self, start):
+        for i in range(start, len(self.views)):
+            self.views[i].row = i
+
+
+class Annotation:
+    """AnnotationStore 中一行的视图"""
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, key):
+        values = self.store.data[self.row]
+        if key == "class_id":
+            return int(values[0])
+        if key == "bbox":
+            return values[1:5].tolist()
+        if key == "keypoints":
+            return KeypointList(self)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        values = self.store.data[self.row]
+        if key == "class_id":
+            values[0] = value
+        elif key == "bbox":
+            values[1:5] = value
+        elif key == "keypoints":
+            values[5:] = np.asarray(value, dtype=np.float64).reshape(-1)
+        else:
+            raise KeyError(key)
+        self.store.log(SET, self.row)
+
+
+class KeypointList:
+    """一个标注的 K 个关键点，元素为 (x, y, v) 元组"""
+    __slots__ = ("annotation",)
+
+    def __init__(self, annotation):
+        self.annotation = annotation
+
+    def values(self):
+        return self.annotation.store.data[self.annotation.row, 5:].reshape(-1, 3)
+
+    def __len__(self):
+        return self.annotation.store.num_keypoints
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return list(self)[k]
+        x, y, v = self.values()[k].tolist()
+        return (x, y, int(v))
+
+    def __setitem__(self, k, keypoint):
+        self.values()[k] = keypoint
+        self.annotation.store.log(SET, self.annotation.row)
+
+    def __iter__(self):
+        return ((x, y, int(v)) for x, y, v in self.values().tolist())
@@ -0,0 +1,521 @@
+import os
+import sys
+import time
+import argparse
+import importlib.util
+import numpy as np
+
+'''
+性能基准脚本，用法：
+python benchmark.py stroke --points 5000
+python benchmark.py decode 图片路径 --width 1700 --height 2300
+python benchmark.py alloc
+python benchmark.py kp-paint --instances 500 --keypoints 17
+python benchmark.py kp-drag --instances 500 --keypoints 17
+python benchmark.py label-io --files 100000 --format keypoint
+'''
+
+TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+SEG_TOOL = "标注--分割数据集标注3-中文-3.py"
+KP_TOOL = "标注-关键点数据集标注v4.py"
+
+
+def load_tool(filename, module_name):
+    """按文件名加载标注工具脚本(文件名含中文和连字符，不能直接 import)"""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(TOOL_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def simulated_stroke(n, width, height):
+    """沿一条螺旋线生成 n 个相邻的鼠标采样点，模拟沿脸部轮廓拖动画笔"""
+    t = np.linspace(0, 6 * np.pi, n)
+    radius = np.linspace(0.1, 0.45, n) * min(width, height)
+    xs = (width / 2 + radius * np.cos(t)).astype(int)
+    ys = (height / 2 + radius * np.sin(t)).astype(int)
+    return [(int(x), int(y)) for x, y in zip(xs, ys)]
+
+
+def report_per_event(name, times, buckets=5):
+    times = np.asarray(times) * 1e6
+    print(f"{name}: {len(times)} 个事件, 总计 {times.sum() / 1000:.1f} ms")
+    for i, chunk in enumerate(np.array_split(times, buckets)):
+        print(f"  第 {i + 1}/{buckets} 段: 平均 {chunk.mean():.1f} us/事件")
+
+
+def bench_stroke(args):
+    import cv2
+    seg = load_tool(SEG_TOOL, "seg_tool")
+    points = simulated_stroke(args.points, args.width, args.height)
+    canvas = np.zeros((args.height, args.width, 3), dtype=np.uint8)
+
+    stroke = seg.StrokeRasterizer(canvas, (0, 0, 255), args.radius)
+    times = []
+    for point in points:
+        start = time.perf_counter()
+        stroke.add_point(point)
+        times.append(time.perf_counter() - start)
+    report_per_event("增量光栅化", times)
+
+    if args.legacy:
+        # 旧实现：每个事件重画已收集的全部点，O(n^2)
+        canvas[:] = 0
+        times = []
+        for i in range(1, args.legacy + 1):
+            start = time.perf_counter()
+            for point in points[:i]:
+                cv2.circle(canvas, point, args.radius, (0, 0, 255), -1)
+            times.append(time.perf_counter() - start)
+        report_per_event("逐点重画(旧)", times)
+
+
+def bench_decode(args):
+    import cv2
+    seg = load_tool(SEG_TOOL, "seg_tool")
+
+    start = time.perf_counter()
+    full = seg.decode_image(args.image, cv2.IMREAD_COLOR)
+    full_time = time.perf_counter() - start
+    if full is None:
+        print(f"无法解码: {args.image}")
+        return 1
+    print(f"全分辨率解码: {full_time * 1000:.1f} ms, {full.shape[1]}x{full.shape[0]}, "
+          f"{full.nbytes / 1024 / 1024:.1f} MB")
+    del full
+
+    start = time.perf_counter()
+    img, scaled, img_size, reduction = seg.decode_for_display(args.image, args.width, args.height)
+    display_time = time.perf_counter() - start
+    print(f"按显示尺寸解码(1/{reduction}): {display_time * 1000:.1f} ms, {img.shape[1]}x{img.shape[0]}, "
+          f"{(img.nbytes + scaled.nbytes) / 1024 / 1024:.1f} MB, 原图尺寸 {img_size[0]}x{img_size[1]}")
+
+
+def bench_alloc(args):
+    """稳定状态的刷新(整幅重绘和笔画局部重绘)不应分配新的整帧缓冲区"""
+    import tempfile
+    import tracemalloc
+    import cv2
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    seg = load_tool(SEG_TOOL, "seg_tool")
+    app = QApplication.instance() or QApplication([])
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        img_path = os.path.join(tmp_dir, "alloc.png")
+        cv2.imwrite(img_path, np.random.randint(0, 255, (args.height, args.width, 3), dtype=np.uint8))
+        label = seg.ImageLabel()
+        label.resize(args.view_width, args.view_height)
+        label.set_class_color(0, (0, 0, 255))
+        label.set_image(img_path)
+        app.processEvents()
+
+        points = simulated_stroke(args.frames, args.width, args.height)
+
+        def refresh(i):
+            label.mark_dirty()
+            label.update_display()
+            if i == 0:
+                label.contour_points = [points[0]]
+                label.stroke = label.overlay.begin_stroke(0, 3, 1)
+            label.contour_points.append(points[i])
+            label.draw_points()
+            label.update_display()
+            label.repaint()
+
+        for i in range(5):
+            refresh(i)
+        allocs_before = label.allocation_count()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        for i in range(5, args.frames):
+            refresh(i)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+        allocs = label.allocation_count() - allocs_before
+        label.label_lines = []
+        label.labels_dirty = False
+
+    frame_bytes = label.scaled_img.nbytes
+    print(f"{args.frames - 5} 次刷新: 缓冲分配 {allocs} 次, tracemalloc 峰值 {peak / 1024:.1f} KB, "
+          f"整帧大小 {frame_bytes / 1024:.1f} KB")
+    if allocs or peak >= frame_bytes:
+        print("失败: 稳定状态的刷新分配了整帧缓冲区")
+        return 1
+    print("通过")
+    return 0
+
+
+def random_keypoint_annotations(instances, keypoints, classes=3, seed=0):
+    """随机生成密集人群的关键点标注(归一化坐标)，返回 AnnotationStore"""
+    from annotation_store import AnnotationStore
+    rng = np.random.default_rng(seed)
+    data = np.zeros((instances, 5 + 3 * keypoints))
+    w, h = rng.uniform(0.02, 0.08, instances), rng.uniform(0.04, 0.15, instances)
+    cx, cy = rng.uniform(w / 2, 1 - w / 2), rng.uniform(h / 2, 1 - h / 2)
+    data[:, 0] = rng.integers(classes, size=instances)
+    data[:, 1:5] = np.stack([cx, cy, w, h], axis=1)
+    points = data[:, 5:].reshape(instances, keypoints, 3)
+    points[:, :, 0] = rng.uniform(cx - w / 2, cx + w / 2, (keypoints, instances)).T
+    points[:, :, 1] = rng.uniform(cy - h / 2, cy + h / 2, (keypoints, instances)).T
+    points[:, :, 2] = rng.choice([0, 1, 2], (instances, keypoints), p=[0.1, 0.2, 0.7])
+    return AnnotationStore(keypoints, data)
+
+
+def crowd_display_widget(args):
+    """显示随机密集人群标注的关键点工具显示控件，返回 (app, widget)"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from PyQt5.QtGui import QPixmap
+    kp = load_tool(KP_TOOL, "kp_tool")
+    app = QApplication.instance() or QApplication([])
+
+    widget = kp.ImageDisplayWidget()
+    widget.resize(args.view_width, args.view_height)
+    widget.show()
+    pixmap = QPixmap(args.width, args.height)
+    pixmap.fill()
+    widget.set_image(pixmap)
+    widget.set_annotations(random_keypoint_annotations(args.instances, args.keypoints),
+                           ["standing", "sidelying", "prone"], [f"关键点{i + 1}" for i in range(args.keypoints)])
+    app.processEvents()
+    return app, widget
+
+
+def bench_kp_paint(args):
+    """关键点工具标注层的绘制耗时
+
+    整体重画(换图、改标注、缩放平移停下后各一次)与交互帧(切换高亮、缩放、平移，沿用缓存的标注层)分开统计
+    """
+    app, widget = crowd_display_widget(args)
+    cx, cy = args.view_width / 2, args.view_height / 2
+
+    def frames(step):
+        times = []
+        for i in range(args.frames):
+            step(i)
+            widget.repaint()
+            times.append(widget.last_frame_time)
+        return np.asarray(times)
+
+    def rebuild(i):
+        widget.annotation_layer = None
+
+    def highlight(i):
+        widget.set_highlighted_bbox(i * 7 % args.instances)
+
+    def zoom(i):
+        widget.viewport.zoom_at(cx, cy, 1.25 if i % 2 == 0 else 0.8)
+        widget.view_changed()
+
+    def pan(i):
+        widget.viewport.pan(40 if i % 4 < 2 else -40, 0)
+        widget.view_changed()
+
+    results = {"整体重画": frames(rebuild), "切换高亮": frames(highlight)}
+    frames(zoom)  # 预热：第一次放大时构建分块金字塔
+    results["缩放"] = frames(zoom)
+    widget.viewport.zoom_at(cx, cy, 2.0)
+    widget.invalidate_annotations()
+    frames(pan)
+    results["平移"] = frames(pan)
+
+    print(f"{args.instances} 个实例 x {args.keypoints} 个关键点, 每项 {args.frames} 帧:")
+    failed = False
+    for name, times in results.items():
+        budget = args.rebuild_budget if name == "整体重画" else args.budget
+        failed |= np.median(times) >= budget
+        print(f"  {name}: 中位数 {np.median(times):.1f} ms, 最大 {times.max():.1f} ms (预算 {budget:.0f} ms)")
+    if failed:
+        print("失败: 超过帧预算")
+        return 1
+    print("通过")
+    return 0
+
+
+def bench_kp_drag(args):
+    """密集人群图上点选(空间索引查询)和拖动关键点时每个鼠标事件的耗时"""
+    from PyQt5.QtCore import Qt, QPoint, QEvent
+    from PyQt5.QtGui import QMouseEvent
+    app, widget = crowd_display_widget(args)
+
+    start = time.perf_counter()
+    widget.get_spatial_index()
+    print(f"建立空间索引: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    rng = np.random.default_rng(1)
+    positions = [QPoint(int(x), int(y)) for x, y in
+                 zip(rng.uniform(0, args.view_width, args.events), rng.uniform(0, args.view_height, args.events))]
+    start = time.perf_counter()
+    hits = [widget.hit_test(pos) for pos in positions]
+    hit_time = (time.perf_counter() - start) / len(positions) * 1e6
+    print(f"点选查询: {len(positions)} 次, 平均 {hit_time:.1f} us/次, 命中 {sum(h is not None for h in hits)} 次")
+
+    # 拖动一个关键点：按下、逐步移动并立即重画、松开
+    ann = next(a for a in widget.annotations if any(v > 0 for _, _, v in a["keypoints"]))
+    k = next(i for i, (_, _, v) in enumerate(ann["keypoints"]) if v > 0)
+    x, y = widget.viewport.image_to_widget(ann["keypoints"][k][0] * args.width, ann["keypoints"][k][1] * args.height)
+    pos = QPoint(int(round(x)), int(round(y)))
+    widget.mousePressEvent(QMouseEvent(QEvent.MouseButtonPress, pos, Qt.LeftButton, Qt.LeftButton, Qt.NoModifier))
+    widget.repaint()
+    times = []
+    for i in range(args.events):
+        pos = pos + QPoint(int(rng.integers(-3, 4)), int(rng.integers(-3, 4)))
+        start = time.perf_counter()
+        widget.mouseMoveEvent(QMouseEvent(QEvent.MouseMove, pos, Qt.NoButton, Qt.LeftButton, Qt.NoModifier))
+        widget.repaint()
+        times.append((time.perf_counter() - start) * 1000)
+    widget.mouseReleaseEvent(QMouseEvent(QEvent.MouseButtonRelease, pos, Qt.LeftButton, Qt.LeftButton, Qt.NoModifier))
+    start = time.perf_counter()
+    changed = widget.spatial_index.sync(widget.annotations, widget.store.data, args.width, args.height)
+    print(f"拖动结束后增量更新索引: {changed} 个标注, {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    times = np.asarray(times)
+    print(f"拖动 {len(times)} 个鼠标事件(含重画): 中位数 {np.median(times):.2f} ms, 最大 {times.max():.2f} ms")
+    if np.median(times) >= args.budget:
+        print(f"失败: 超过 {args.budget:.0f} ms 的帧预算")
+        return 1
+    print("通过")
+    return 0
+
+
+def bench_journal(args):
+    """每次改动写编辑日志的开销(record 只入队，fsync 由后台线程成批完成)"""
+    import tempfile
+    from edit_journal import EditJournal, JOURNAL_FILENAME, SET, read_journal
+    store = random_keypoint_annotations(args.instances, args.keypoints)
+    with tempfile.TemporaryDirectory() as folder:
+        journal = EditJournal(folder)
+        store.attach(journal, os.path.join(folder, "crowd.jpg"))
+        rng = np.random.default_rng(2)
+        rows = rng.integers(len(store), size=args.edits).tolist()
+        start = time.perf_counter()
+        for i in rows:
+            store.data[i, 0] = (store.data[i, 0] + 1) % 3
+            store.log(SET, i)
+        per_edit = (time.perf_counter() - start) / args.edits * 1e6
+        start = time.perf_counter()
+        journal.flush()
+        drain = (time.perf_counter() - start) * 1000
+        print(f"{args.edits} 次改动: 平均 {per_edit:.2f} us/次, 后台 fsync {journal.commit_count} 次, "
+              f"入队结束后 {drain:.1f} ms 全部落盘")
+        recovered = read_journal(os.path.join(folder, JOURNAL_FILENAME))["crowd.jpg"]
+        journal.discard(os.path.join(folder, "crowd.txt"))
+        journal.close()
+    if not np.array_equal(recovered, store.data):
+        print("失败: 重放日志得到的标注与内存中不一致")
+        return 1
+    if per_edit >= args.budget:
+        print(f"失败: 超过每次改动 {args.budget:.0f} us 的预算")
+        return 1
+    print("通过")
+    return 0
+
+
+def bench_scan(args):
+    """扫描文件夹：第一批图片送达的时间和扫描总耗时"""
+    from folder_scan import scan_folder, parse_filter
+    include, exclude = parse_filter(args.filter)
+    batches = []
+    start = time.perf_counter()
+    result = scan_folder(args.folder, (".png", ".jpg", ".jpeg", ".bmp", ".gif"), args.recursive, include, exclude,
+                         on_batch=lambda names: batches.append((time.perf_counter() - start, len(names))))
+    total = time.perf_counter() - start
+    if not batches:
+        print("没有找到图片")
+        return 1
+    print(f"{len(result[0])} 张图片, {len(result[1])} 个标注文件, {len(batches)} 批: "
+          f"第一批 {batches[0][0] * 1000:.1f} ms, 总耗时 {total:.2f} s")
+    if batches[0][0] >= args.budget:
+        print(f"失败: 第一张图片超过 {args.budget:.1f} s 才送达")
+        return 1
+    print("通过")
+    return 0
+
+
+def legacy_parse_boxes(text, width):
+    """旧的逐行解析(label_io 之前关键点工具读取标注的写法)"""
+    rows = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        parts = parts[:5 + (min(len(parts), width) - 5) // 3 * 3]
+        try:
+            values = [float(p) for p in parts]
+        except ValueError:
+            continue
+        rows.append(values + [0.0] * (width - len(values)))
+    return np.array(rows, dtype=np.float64).reshape(-1, width)
+
+
+def legacy_format_boxes(data):
+    num_keypoints = (data.shape[1] - 5) // 3
+    fmt = "%d %.6f %.6f %.6f %.6f" + " %.6f %.6f %d" * num_keypoints + "\n"
+    return "".join(fmt % tuple(row) for row in data.tolist())
+
+
+def legacy_parse_polygons(text):
+    """旧的逐行解析(label_io 之前分割工具读取标注的写法)"""
+    polygons = []
+    for line in text.splitlines():
+        parts = line.split()
+        if len(parts) < 7 or (len(parts) - 1) % 2 != 0:
+            continue
+        try:
+            polygons.append((float(parts[0]), np.array(parts[1:], dtype=np.float64).reshape(-1, 2)))
+        except ValueError:
+            continue
+    return polygons
+
+
+def legacy_format_polygons(polygons):
+    return "".join(f"{int(class_id)} " + " ".join(f"{x:.6f} {y:.6f}" for x, y in points) + "\n"
+                   for class_id, points in polygons)
+
+
+def random_label_texts(args):
+    """随机生成 args.files 个标注文件的内容(每个文件 1..max_instances 个实例)"""
+    import label_io
+    rng = np.random.default_rng(0)
+    texts = []
+    for count in rng.integers(1, args.max_instances + 1, args.files).tolist():
+        if args.format == "keypoint":
+            data = random_keypoint_annotations(count, args.keypoints, seed=rng).data
+            texts.append(label_io.format_box_labels(data))
+        else:
+            sizes = rng.integers(3, args.max_vertices + 1, count)
+            offsets = np.concatenate([[0], np.cumsum(sizes)])
+            texts.append(label_io.format_polygon_labels(rng.integers(0, 3, count), offsets,
+                                                        rng.random((offsets[-1], 2))))
+    return texts
+
+
+def bench_label_io(args):
+    """逐行解析/格式化(旧)与 label_io 对比，结果须完全相同
+
+    只比较解析和格式化本身(read_box_rows / read_polygon_rows)，两边的取值校验相同，不计入
+    """
+    import label_io
+    if args.folder:
+        texts = []
+        for entry in os.scandir(args.folder):
+            if entry.name.endswith(".txt") and len(texts) < args.files:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    texts.append(f.read())
+    else:
+        texts = random_label_texts(args)
+    if not texts:
+        print("没有标注文件")
+        return 1
+
+    def run(name, func, items):
+        start = time.perf_counter()
+        results = [func(item) for item in items]
+        elapsed = time.perf_counter() - start
+        print(f"  {name}: {elapsed:.2f} s ({elapsed / len(items) * 1e6:.1f} us/文件)")
+        return results, elapsed
+
+    width = 5 + 3 * args.keypoints
+    print(f"{len(texts)} 个文件, {sum(len(t) for t in texts) / 1e6:.1f} MB")
+    if args.format == "keypoint":
+        old, old_parse = run("逐行解析(旧)", lambda t: legacy_parse_boxes(t, width), texts)
+        new, new_parse = run("label_io 解析", lambda t: label_io.read_box_rows(t, width)[0], texts)
+        same = all(a.shape == b.shape and np.array_equal(a, b) for a, b in zip(old, new))
+        old_text, old_format = run("逐行格式化(旧)", legacy_format_boxes, old)
+        new_text, new_format = run("label_io 格式化", label_io.format_box_labels, new)
+    else:
+        old, old_parse = run("逐行解析(旧)", legacy_parse_polygons, texts)
+        new, new_parse = run("label_io 解析", lambda t: label_io.read_polygon_rows(t)[0], texts)
+        same = all(len(a) == len(b) and all(c1 == c2 and np.array_equal(p1, p2)
+                                            for (c1, p1), (c2, p2) in zip(a, b)) for a, b in zip(old, new))
+        old_text, old_format = run("逐行格式化(旧)", legacy_format_polygons, old)
+        new_text, new_format = run("label_io 格式化", lambda labels: label_io.format_polygon_labels(
+            labels.class_ids, labels.offsets, labels.points), new)
+    print(f"解析加速 {old_parse / new_parse:.2f}x, 格式化加速 {old_format / new_format:.2f}x")
+    if not same or old_text != new_text:
+        print("失败: label_io 与逐行实现的结果不一致")
+        return 1
+    print("通过(解析结果和写出的文本与逐行实现完全相同)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="标注工具性能基准")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    stroke = subparsers.add_parser("stroke", help="模拟长笔画，检查每个鼠标事件的光栅化耗时是否恒定")
+    stroke.add_argument("--points", type=int, default=5000)
+    stroke.add_argument("--width", type=int, default=6000)
+    stroke.add_argument("--height", type=int, default=4000)
+    stroke.add_argument("--radius", type=int, default=3)
+    stroke.add_argument("--legacy", type=int, default=0, help="同时测量旧实现的前 N 个事件(0 表示不测)")
+    stroke.set_defaults(func=bench_stroke)
+
+    decode = subparsers.add_parser("decode", help="比较全分辨率解码和按显示尺寸缩小解码")
+    decode.add_argument("image")
+    decode.add_argument("--width", type=int, default=1700, help="显示区域宽度")
+    decode.add_argument("--height", type=int, default=2300, help="显示区域高度")
+    decode.set_defaults(func=bench_decode)
+
+    alloc = subparsers.add_parser("alloc", help="检查稳定状态的刷新不分配整帧缓冲区")
+    alloc.add_argument("--frames", type=int, default=200)
+    alloc.add_argument("--width", type=int, default=4000)
+    alloc.add_argument("--height", type=int, default=3000)
+    alloc.add_argument("--view-width", type=int, default=1200)
+    alloc.add_argument("--view-height", type=int, default=900)
+    alloc.set_defaults(func=bench_alloc)
+
+    kp_paint = subparsers.add_parser("kp-paint", help="关键点工具在密集人群图上整体重画标注层和交互帧(高亮、缩放、平移)的耗时")
+    kp_paint.add_argument("--instances", type=int, default=500)
+    kp_paint.add_argument("--keypoints", type=int, default=17)
+    kp_paint.add_argument("--frames", type=int, default=20)
+    kp_paint.add_argument("--width", type=int, default=4000)
+    kp_paint.add_argument("--height", type=int, default=3000)
+    kp_paint.add_argument("--view-width", type=int, default=1400)
+    kp_paint.add_argument("--view-height", type=int, default=900)
+    kp_paint.add_argument("--budget", type=float, default=16.0, help="交互帧(高亮、缩放、平移)的预算(ms)")
+    kp_paint.add_argument("--rebuild-budget", type=float, default=33.0,
+                          help="整体重画的预算(ms)，只在换图、改标注、缩放平移停下后发生一次")
+    kp_paint.set_defaults(func=bench_kp_paint)
+
+    kp_drag = subparsers.add_parser("kp-drag", help="关键点工具在密集人群图上点选和拖动关键点的耗时")
+    kp_drag.add_argument("--instances", type=int, default=500)
+    kp_drag.add_argument("--keypoints", type=int, default=17)
+    kp_drag.add_argument("--events", type=int, default=200)
+    kp_drag.add_argument("--width", type=int, default=4000)
+    kp_drag.add_argument("--height", type=int, default=3000)
+    kp_drag.add_argument("--view-width", type=int, default=1400)
+    kp_drag.add_argument("--view-height", type=int, default=900)
+    kp_drag.add_argument("--budget", type=float, default=16.0, help="每个鼠标事件的预算(ms)")
+    kp_drag.set_defaults(func=bench_kp_drag)
+
+    journal = subparsers.add_parser("journal", help="每次改动写编辑日志的开销和后台 fsync 次数")
+    journal.add_argument("--instances", type=int, default=500)
+    journal.add_argument("--keypoints", type=int, default=17)
+    journal.add_argument("--edits", type=int, default=100000)
+    journal.add_argument("--budget", type=float, default=50.0, help="每次改动的预算(us)")
+    journal.set_defaults(func=bench_journal)
+
+    scan = subparsers.add_parser("scan", help="扫描图片文件夹时第一批图片送达的时间和总耗时")
+    scan.add_argument("folder")
+    scan.add_argument("--recursive", action="store_true")
+    scan.add_argument("--filter", default="", help="过滤模式，如 \"cam1/* !*_bak*\"")
+    scan.add_argument("--budget", type=float, default=1.0, help="第一批图片的预算(s)")
+    scan.set_defaults(func=bench_scan)
+
+    label_io = subparsers.add_parser("label-io", help="标注文件解析/写入：逐行实现与 label_io 对比")
+    label_io.add_argument("--files", type=int, default=100000)
+    label_io.add_argument("--format", choices=["keypoint", "seg"], default="keypoint")
+    label_io.add_argument("--keypoints", type=int, default=17)
+    label_io.add_argument("--max-instances", type=int, default=10, help="每个文件的最多实例数")
+    label_io.add_argument("--max-vertices", type=int, default=60, help="分割多边形的最多顶点数")
+    label_io.add_argument("--folder", help="改用该目录下已有的 .txt 标注(最多 --files 个)")
+    label_io.set_defaults(func=bench_label_io)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import threading
+
+'''
+数据集索引：文件夹下 .dataset_index.sqlite 中每张图片一行，记录
+图片的 mtime/大小、尺寸、标注文件的 mtime/大小、标注状态和实例数。
+refresh() 把扫描结果(folder_scan.scan_folder)与上次的记录比较，只更新 mtime 或大小变了的行，
+新增/删除的图片增删对应的行；标注状态取自标注缓存(label_cache.LabelCache，同样只重新读取变了的标注文件)，
+20 万张图片的文件夹再次打开时不需要重新读取所有标注。
+refresh() 可以在后台线程中调用：所有数据库操作都在同一把锁内，写入按批提交，界面线程的更新不会被长时间阻塞。
+(status, name) 上有索引，next_with_status() 按文件名顺序找下一张未标注/异常的图片只需一次 B 树查找(O(log n))。
+图片尺寸在界面解码图片时顺便记录(set_image_info)，扫描时不打开图片文件。
+'''
+
+INDEX_FILENAME = ".dataset_index.sqlite"
+UNLABELED, LABELED, INVALID = range(3)  # 与界面文件列表的状态值相同
+WRITE_BATCH = 20000  # refresh 每个事务写入的行数
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    name TEXT PRIMARY KEY,
+    mtime REAL, size INTEGER,
+    width INTEGER, height INTEGER,
+    label_mtime REAL, label_size INTEGER,
+    status INTEGER NOT NULL DEFAULT 0,
+    instances INTEGER NOT NULL DEFAULT 0,
+    broken INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS images_status ON images (status, name);
+"""
+
+
+class DatasetIndex:
+    def __init__(self, folder):
+        self.folder = folder
+        self.lock = threading.Lock()
+        path = os.path.join(folder, INDEX_FILENAME)
+        try:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.executescript(SCHEMA)
+        except sqlite3.Error as e:
+            # 只读文件夹等情况：索引只放在内存里，功能不变，只是下次打开要重新扫描
+            print(f"Warning: Cannot open dataset index {path}: {e}")
+            self.db = sqlite3.connect(":memory:", check_same_thread=False)
+            self.db.executescript(SCHEMA)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def write(self, sql, params=(), many=False):
+        with self.lock, self.db:
+            if many:
+                self.db.executemany(sql, params)
+            else:
+                self.db.execute(sql, params)
+
+    def refresh(self, images, labels, label_cache, cancel=None):
+        """按 mtime/大小增量更新，返回 (新增, 标注有变化, 删除) 的图片数；cancel 被设置时返回 None
+
+        images、labels 为 scan_folder 的结果；标注状态和实例数取自已按同一 labels 更新过的 label_cache
+        """
+        known = {row[0]: row[1:] for row in self.query(
+            "SELECT name, mtime, size, label_mtime, label_size, broken FROM images")}
+
+        removed = [(name,) for name in known if name not in images]
+        added, changed = [], []
+        for name, stat in images.items():
+            label_stat = labels.get(os.path.splitext(name)[0], (None, None))
+            old = known.get(name)
+            if old is None:
+                added.append((name, stat, label_stat))
+            elif old[:2] != stat or old[2:4] != label_stat:
+                changed.append((name, stat, label_stat, old[:2] == stat and old[4]))
+
+        # 只有存在标注文件的图片需要查缓存
+        with_label = [item[0] for item in added + changed if item[2][0] is not None]
+        label_status = dict(zip(with_label, label_cache.label_status(
+            [os.path.splitext(name)[0] for name in with_label])))
+        added_status = [label_status.get(item[0], (UNLABELED, 0)) for item in added]
+        changed_status = [(INVALID, instances) if item[3] else (status, instances)
+                          for item in changed for status, instances in [label_status.get(item[0], (UNLABELED, 0))]]
+
+        if cancel is not None and cancel.is_set():
+            return None
+
+        inserts = [(name,) + stat + label_stat + status
+                   for (name, stat, label_stat), status in zip(added, added_status)]
+        # 图片文件变了就清除尺寸和"无法解码"标记，等界面重新解码
+        updates = [stat + label_stat + status + (int(broken), same_image, same_image, name)
+                   for (name, stat, label_stat, broken), status in zip(changed, changed_status)
+                   for same_image in [known[name][:2] == stat]]
+        for sql, rows in (("DELETE FROM images WHERE name = ?", removed),
+                          ("INSERT INTO images (name, mtime, size, label_mtime, label_size, status, instances) "
+                           "VALUES (?, ?, ?, ?, ?, ?, ?)", inserts),
+                          ("UPDATE images SET mtime = ?, size = ?, label_mtime = ?, label_size = ?, status = ?, "
+                           "instances = ?, broken = ?, width = CASE WHEN ? THEN width END, "
+                           "height = CASE WHEN ? THEN height END WHERE name = ?", updates)):
+            for i in range(0, len(rows), WRITE_BATCH):
+                self.write(sql, rows[i:i + WRITE_BATCH], many=True)
+        return len(added), len(changed), len(removed)
+
+    def names(self):
+        """按文件名排序的全部图片(SQLite 按 UTF-8 字节比较，与 Python 字符串排序一致)"""
+        return [row[0] for row in self.query("SELECT name FROM images ORDER BY name")]
+
+    def statuses(self):
+        """{图片名: 状态}"""
+        return dict(self.query("SELECT name, status FROM images"))
+
+    def counts(self):
+        """{状态: 图片数}"""
+        return dict(self.query("SELECT status, COUNT(*) FROM images GROUP BY status"))
+
+    def info(self, name):
+        """(宽, 高, 状态, 实例数)，不存在时返回 None"""
+        rows = self.query("SELECT width, height, status, instances FROM images WHERE name = ?", (name,))
+        return rows[0] if rows else None
+
+    def next_with_status(self, name, statuses):
+        """文件名排在 name 之后、状态为 statuses 之一的第一张图片，到末尾后从头找；没有时返回 None
+
+        每个状态一次 (status, name) 索引上的范围查找，再取最小的文件名
+        """
+        for condition in ("name > ?", "name <= ?"):
+            found = [row[0] for status in statuses for row in self.query(
+                f"SELECT name FROM images WHERE status = ? AND {condition} ORDER BY name LIMIT 1",
+                (status, name))]
+            if found:
+                return min(found)
+        return None
+
+    def update_label(self, name, instances):
+        """界面保存了标注后更新状态；标注文件的 mtime 留到下次 refresh 时再记录"""
+        self.write("UPDATE images SET status = CASE WHEN broken THEN ? WHEN ? > 0 THEN ? ELSE ? END, "
+                   "instances = ? WHERE name = ?", (INVALID, instances, LABELED, UNLABELED, instances, name))
+
+    def set_image_info(self, name, width, height):
+        self.write("UPDATE images SET width = ?, height = ? WHERE name = ? AND (width IS NOT ? OR height IS NOT ?)",
+                   (width, height, name, width, height))
+
+    def mark_broken(self, name):
+        """图片无法解码：状态记为异常，图片文件变化后在 refresh 中清除"""
+        self.write("UPDATE images SET broken = 1, status = ? WHERE name = ?", (INVALID, name))
+
+    def remove(self, name):
+        self.write("DELETE FROM images WHERE name = ?", (name,))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
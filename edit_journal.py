@@ -0,0 +1,161 @@
+import os
+import struct
+import threading
+import numpy as np
+
+'''
+标注编辑的预写日志(write-ahead journal)：每次改动标注都追加一条记录，崩溃后重新打开文件夹时重放，
+恢复还没来得及写入 .txt 的改动。
+record() 只把记录放进内存队列(每条几微秒)；后台线程把攒下的记录一次写入并 fsync(group commit)，
+一次 fsync 由期间的所有改动分摊，崩溃时最多丢失最后一次 fsync 之后的改动。
+.txt 写入完成后对应的记录就没用了：所有图片的改动都已写入 .txt 时把日志截断为空(compaction)。
+日志文件打不开(只读文件夹等)时 enabled 为 False，record 不做任何事，标注照常编辑保存，只是崩溃后无法恢复。
+
+记录格式：操作(1 字节) + 行号(4 字节) + 数据长度(4 字节) + 数据
+IMAGE  开始记录一张图片，行号位置为每行的列数，数据为图片相对文件夹的路径
+BASE   该图片开始记录时的标注数组，行号位置为行数
+INSERT / SET  插入或修改后的一行；DELETE 删除一行，没有数据
+'''
+
+JOURNAL_FILENAME = ".label_journal"
+IMAGE, BASE, INSERT, DELETE, SET = range(5)
+HEADER = struct.Struct("<BiI")
+
+
+def label_path_of(image_path):
+    return os.path.splitext(image_path)[0] + ".txt"
+
+
+class EditJournal:
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, JOURNAL_FILENAME)
+        try:
+            self.file = open(self.path, "ab")
+        except OSError as e:
+            print(f"Warning: Cannot open edit journal {self.path}: {e}")
+            self.file = None
+        self.enabled = self.file is not None
+        self.queue = []  # 待写入的记录
+        self.store = None  # 最近一条记录所属的 AnnotationStore，换图片时先写 IMAGE + BASE
+        self.seq = 0
+        self.unsaved = {}  # 标注文件路径 -> 最后一条记录的序号
+        self.save_seq = {}  # 标注文件路径 -> 最近一次提交保存时的序号
+        self.writing = False
+        self.closed = False
+        self.commit_count = 0
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="edit-journal", daemon=True)
+        if self.enabled:
+            self.thread.start()
+
+    def record(self, store, op, index):
+        """记录 store 第 index 行的一次改动(INSERT / SET 记录改动后的行)"""
+        if not self.enabled:
+            return
+        payload = b"" if op == DELETE else store.data[index].tobytes()
+        with self.condition:
+            if store is not self.store:
+                self.begin(store)
+            self.queue.append(HEADER.pack(op, index, len(payload)) + payload)
+            self.seq += 1
+            self.unsaved[label_path_of(store.image_path)] = self.seq
+            self.condition.notify_all()
+
+    def begin(self, store):
+        # 以最近一次读取或保存时的内容为起点，之后的每次改动都有记录
+        name = os.path.relpath(store.image_path, self.folder).encode("utf-8")
+        base = store.saved.tobytes()
+        self.queue.append(HEADER.pack(IMAGE, store.saved.shape[1], len(name)) + name)
+        self.queue.append(HEADER.pack(BASE, len(store.saved), len(base)) + base)
+        self.store = store
+
+    def saving(self, label_path):
+        """标注文件即将以当前内容提交写入"""
+        with self.condition:
+            self.save_seq[label_path] = self.seq
+
+    def saved(self, label_path):
+        """标注文件已写入磁盘：提交之前的记录不再需要"""
+        with self.condition:
+            if self.unsaved.get(label_path, 0) <= self.save_seq.get(label_path, -1):
+                self.unsaved.pop(label_path, None)
+                self.condition.notify_all()
+
+    def discard(self, label_path):
+        """放弃该标注文件未保存的改动(不保存就关闭、删除图片)"""
+        with self.condition:
+            self.unsaved.pop(label_path, None)
+            self.condition.notify_all()
+
+    def flush(self):
+        """阻塞直到已记录的改动都写入并 fsync"""
+        with self.condition:
+            while self.queue or self.writing:
+                self.condition.wait()
+
+    def close(self):
+        """写完队列中的记录；所有改动都已保存时删除日志文件"""
+        if not self.enabled:
+            return
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.file.close()
+        if not self.unsaved:
+            os.remove(self.path)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed and (self.unsaved or self.file.tell() == 0):
+                    self.condition.wait()
+                records, self.queue = self.queue, []
+                self.writing = bool(records)
+            if records:
+                self.file.write(b"".join(records))
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.commit_count += 1
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+                if not self.unsaved and not self.queue and self.file.tell():
+                    # 所有改动都已写入 .txt，日志清空，之后的改动重新从 IMAGE + BASE 开始记录
+                    self.file.truncate(0)
+                    self.file.seek(0)
+                    self.store = None
+                if self.closed and not self.queue:
+                    return
+
+
+def read_journal(path):
+    """重放日志，返回 {图片相对路径: 标注数组}；写到一半的最后一条记录忽略"""
+    with open(path, "rb") as f:
+        buffer = f.read()
+    result = {}
+    name, width, data = None, 0, None
+    pos = 0
+    try:
+        while pos + HEADER.size <= len(buffer):
+            op, index, size = HEADER.unpack_from(buffer, pos)
+            if pos + HEADER.size + size > len(buffer):
+                break
+            payload = buffer[pos + HEADER.size:pos + HEADER.size + size]
+            pos += HEADER.size + size
+            if op == IMAGE:
+                name, width = payload.decode("utf-8"), index
+                continue
+            if op == BASE:
+                data = np.frombuffer(payload, dtype=np.float64).reshape(index, width).copy()
+            elif op == INSERT:
+                data = np.insert(data, index, np.frombuffer(payload, dtype=np.float64), axis=0)
+            elif op == DELETE:
+                data = np.delete(data, index, axis=0)
+            elif op == SET:
+                data[index] = np.frombuffer(payload, dtype=np.float64)
+            result[name] = data
+    except (ValueError, IndexError, UnicodeDecodeError) as e:
+        print(f"Warning: Journal {path} is corrupt after byte {pos}: {e}")
+    return result
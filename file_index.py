@@ -0,0 +1,123 @@
+import bisect
+import numpy as np
+
+'''
+文件名索引：文件名 -> 序号 的映射 + 三元组(trigram)倒排索引，每个文件夹只在第一次搜索时构建一次。
+删除文件时不重建索引，只记录被删除的原始序号，查询结果再换算成当前序号。
+子串搜索：长度 >= 3 的查询取各个三元组倒排表的交集再逐个确认；更短的查询直接在字符数组上向量化匹配。
+'''
+
+SEPARATOR = 0  # 文件名之间的分隔字符，合法文件名里不会出现
+
+
+def trigram_keys(codes):
+    """相邻三个字符的码点拼成一个 uint64(码点不超过 21 位)"""
+    codes = codes.astype(np.uint64)
+    return (codes[:-2] << np.uint64(42)) | (codes[1:-1] << np.uint64(21)) | codes[2:]
+
+
+def run_starts(values):
+    """有序数组中每段相同值第一次出现的位置"""
+    mask = np.ones(len(values), dtype=bool)
+    mask[1:] = values[1:] != values[:-1]
+    return mask
+
+
+class FileIndex:
+    def __init__(self, names):
+        self.names = list(names)
+        self.position = {name: i for i, name in enumerate(self.names)}
+        self.deleted = []  # 已删除文件的原始序号(有序)
+        self.lower = None  # 以下在第一次搜索时才构建
+        self.codes = self.owner = None
+        self.gram_keys = self.offsets = self.postings = None
+
+    def build(self):
+        self.lower = [name.lower() for name in self.names]
+        # 所有文件名连成一个码点数组，owner[i] 为第 i 个字符所属的文件序号
+        joined = "\0".join(self.lower) + "\0"
+        self.codes = np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)
+        separators = self.codes == SEPARATOR
+        self.owner = np.cumsum(separators, dtype=np.int32)
+        self.owner -= separators
+
+        keys = trigram_keys(self.codes)
+        valid = ~(separators[:-2] | separators[1:-1] | separators[2:])
+        keys, owners = keys[valid], self.owner[:-2][valid]
+        # 不同的三元组通常只有几千个：先换成秩，再把 (秩, 文件序号) 压进一个 uint64 排序，
+        # 比按键做稳定 argsort 快得多；排序后相邻重复的就是同一文件名里重复的三元组
+        sorted_keys = np.sort(keys)
+        self.gram_keys = sorted_keys[run_starts(sorted_keys)]
+        packed = np.searchsorted(self.gram_keys, keys).astype(np.uint64) << np.uint64(32)
+        packed |= owners.astype(np.uint64)
+        packed.sort()
+        packed = packed[run_starts(packed)]
+        # 倒排索引(CSR 形式)：gram_keys[k] 的文件序号为 postings[offsets[k]:offsets[k + 1]]，已有序
+        self.postings = (packed & np.uint64(0xFFFFFFFF)).astype(np.int32)
+        self.offsets = np.searchsorted(packed >> np.uint64(32), np.arange(len(self.gram_keys) + 1, dtype=np.uint64))
+
+    def index_of(self, name):
+        """文件名的当前序号，不存在或已删除时返回 -1"""
+        original = self.position.get(name)
+        if original is None:
+            return -1
+        return original - bisect.bisect_left(self.deleted, original)
+
+    def remove(self, name):
+        original = self.position.pop(name, None)
+        if original is not None:
+            bisect.insort(self.deleted, original)
+
+    def posting(self, key):
+        k = np.searchsorted(self.gram_keys, key)
+        if k == len(self.gram_keys) or self.gram_keys[k] != key:
+            return np.array([], dtype=np.int32)
+        return self.postings[self.offsets[k]:self.offsets[k + 1]]
+
+    def scan(self, query):
+        """短查询：在码点数组上逐字符比较"""
+        q = np.frombuffer(query.encode('utf-32-le'), dtype=np.uint32)
+        n = len(self.codes) - len(q) + 1
+        if n <= 0:
+            return np.array([], dtype=np.int32)
+        mask = self.codes[:n] == q[0]
+        for j in range(1, len(q)):
+            mask &= self.codes[j:n + j] == q[j]
+        return self.unique_files(self.owner[:n][mask])
+
+    def unique_files(self, files):
+        """去重并排序：用按文件数的标记数组代替 np.unique 的排序"""
+        flags = np.zeros(len(self.names), dtype=bool)
+        flags[files] = True
+        return np.flatnonzero(flags).astype(np.int32)
+
+    def search_original(self, query):
+        if self.codes is None:
+            self.build()
+        q = np.frombuffer(query.encode('utf-32-le'), dtype=np.uint32)
+        if len(q) < 3:
+            return self.scan(query)
+        lists = sorted((self.posting(key) for key in np.unique(trigram_keys(q))), key=len)
+        candidates = lists[0]
+        if len(lists) > 1 and len(candidates):
+            # 从最短的倒排表开始求交集，每一步只和标记数组比较
+            flags = np.zeros(len(self.names), dtype=bool)
+            for posting in lists[1:]:
+                flags[candidates] = True
+                candidates = posting[flags[posting]]
+                flags[:] = False
+                if not len(candidates):
+                    break
+        if len(q) == 3:
+            return candidates
+        # 三元组都出现不代表是连续子串，需要确认
+        return np.array([i for i in candidates.tolist() if query in self.lower[i]], dtype=np.int32)
+
+    def search(self, query):
+        """不区分大小写的子串搜索，返回有序的当前序号数组"""
+        result = self.search_original(query.lower())
+        if self.deleted:
+            deleted = np.array(self.deleted)
+            result = result[~np.isin(result, deleted)]
+            result = result - np.searchsorted(deleted, result)
+        return result
@@ -0,0 +1,89 @@
+import os
+import re
+import time
+import fnmatch
+
+'''
+用 os.scandir 遍历图片文件夹(可选递归子文件夹)，边扫描边把找到的图片分批交给回调，
+百万张图片的文件夹也能在扫描开始后立即显示第一张。
+include / exclude 为 glob 模式，匹配相对文件夹的路径(分隔符统一为 /，* 可以跨越 /)：
+图片需匹配任一 include(为空时不限制)且不匹配任何 exclude；匹配 exclude 的子文件夹和 .txt 文件也跳过。
+.txt 文件本身或换成任一图片扩展名后匹配 include 时才保留(如 "cam1/*"、"*.jpg" 都保留同名标注)。
+同时记录 .txt 标注文件的 mtime/大小，供数据集索引增量更新。
+'''
+
+
+def compile_globs(patterns):
+    """多个 glob 合并成一个正则，为空时返回 None"""
+    if not patterns:
+        return None
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns))
+
+
+def parse_filter(text):
+    """"cam1/* !*_bak*" -> (["cam1/*"], ["*_bak*"])：空格分隔，! 开头的为排除模式"""
+    include, exclude = [], []
+    for pattern in text.split():
+        if pattern.startswith("!"):
+            if pattern[1:]:
+                exclude.append(pattern[1:])
+        else:
+            include.append(pattern)
+    return include, exclude
+
+
+def scan_folder(folder, extensions, recursive=False, include=(), exclude=(), cancel=None,
+                on_batch=None, batch_interval=0.1):
+    """扫描 folder，返回 ({图片相对路径: (mtime, 大小)}, {去掉 .txt 的标注相对路径: (mtime, 大小)})
+
+    on_batch(相对路径列表) 在找到第一张图片时立即调用一次，之后最多每 batch_interval 秒调用一次；
+    cancel(threading.Event)被设置时尽快返回 None
+    """
+    extensions = tuple(extensions)
+    include_re, exclude_re = compile_globs(include), compile_globs(exclude)
+    label_suffixes = (".txt",) + extensions + tuple(ext.upper() for ext in extensions)
+    images, labels = {}, {}
+    batch, last_batch = [], 0.0
+    pending_dirs = [""]  # 相对路径，非空时以 / 结尾
+    while pending_dirs:
+        rel_dir = pending_dirs.pop()
+        try:
+            entries = os.scandir(os.path.join(folder, rel_dir) if rel_dir else folder)
+        except OSError as e:
+            print(f"Warning: Cannot scan {os.path.join(folder, rel_dir)}: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                if cancel is not None and cancel.is_set():
+                    return None
+                rel = rel_dir + entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):  # 不跟随目录链接，避免循环
+                        if recursive and not (exclude_re and exclude_re.match(rel)):
+                            pending_dirs.append(rel + "/")
+                        continue
+                    lower = entry.name.lower()
+                    if lower.endswith(".txt"):
+                        if exclude_re and exclude_re.match(rel):
+                            continue
+                        if include_re and not any(include_re.match(rel[:-4] + ext) for ext in label_suffixes):
+                            continue
+                        st = entry.stat()
+                        labels[rel[:-4]] = (st.st_mtime, st.st_size)
+                        continue
+                    if (not lower.endswith(extensions) or (include_re and not include_re.match(rel))
+                            or (exclude_re and exclude_re.match(rel))):
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue
+                images[rel] = (st.st_mtime, st.st_size)
+                if on_batch is not None:
+                    batch.append(rel)
+                    now = time.perf_counter()
+                    if now - last_batch >= batch_interval:
+                        on_batch(batch)
+                        batch, last_batch = [], now
+    if batch:
+        on_batch(batch)
+    return images, labels
@@ -0,0 +1,110 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+'''
+按字节预算淘汰的 LRU 缓存 + 线程池预取。
+解码(cv2.imdecode 等)会释放 GIL，放在后台线程里不会卡住界面。
+'''
+
+
+class LRUCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.items = OrderedDict()  # key -> (value, nbytes)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.items
+
+    def put(self, key, value, nbytes):
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            if nbytes > self.max_bytes:
+                return
+            self.items[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.items.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+
+    def discard(self, key):
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.total_bytes = 0
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats_text(self):
+        return (f"缓存: {len(self.items)} 张, {self.total_bytes / 1024 / 1024:.0f}/"
+                f"{self.max_bytes / 1024 / 1024:.0f} MB, 命中率 {self.hit_rate() * 100:.0f}%")
+
+
+class Prefetcher:
+    """用 loader(key, *args) 在后台线程里加载，结果放进 LRUCache
+
+    loader 返回 None 表示加载失败，不缓存；size_of(value) 返回占用的字节数
+    """
+
+    def __init__(self, cache, loader, size_of, workers=2):
+        self.cache = cache
+        self.loader = loader
+        self.size_of = size_of
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.inflight = {}  # key -> Future
+        self.lock = threading.Lock()
+
+    def load(self, key, args):
+        try:
+            value = self.loader(key, *args)
+            if value is not None:
+                self.cache.put(key, value, self.size_of(value))
+            return value
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+
+    def prefetch(self, keys, *args):
+        for key in keys:
+            with self.lock:
+                if key in self.inflight or key in self.cache:
+                    continue
+                self.inflight[key] = self.executor.submit(self.load, key, args)
+
+    def get(self, key, *args):
+        """取出 key 对应的结果：缓存命中直接返回，正在预取则等待，否则在当前线程加载"""
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        with self.lock:
+            future = self.inflight.get(key)
+        if future is not None:
+            return future.result()
+        return self.load(key, args)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,309 @@
+import os
+import sys
+import time
+import struct
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from dataset_index import UNLABELED, LABELED, INVALID
+from label_io import split_lines
+
+'''
+数据集全部标注打包成一个文件(文件夹下的 .labels.cache)，打开时用 np.memmap 映射，不逐个读取 .txt：
+python label_cache.py 数据集目录 --format keypoint --recursive  # 增量更新缓存并打印统计
+python label_cache.py 数据集目录 --no-update  # 只读已有的缓存
+
+每个标注文件一项(按去掉 .txt 的相对路径排序，定宽字节串，可以二分查找)，记录 mtime、大小、状态和实例数；
+文件中的每一行是一个实例，所有实例的数(类别 + 坐标，检测/关键点/分割都一样)连续存放在一个 float32 数组中，
+两级偏移表：file_rows[i]..file_rows[i + 1] 为第 i 个文件的实例，row_offsets[j]..row_offsets[j + 1]
+为第 j 个实例在 values 中的范围。float32 对 0-1 的坐标误差约 6e-8，用于统计足够；编辑标注时工具仍读取 .txt。
+update() 按 mtime/大小逐个文件判断是否过期，只重新读取变化了的文件，其余文件的数据从旧缓存中整段拷贝，
+写入临时文件后替换，读者看到的总是完整的缓存。
+'''
+
+CACHE_FILENAME = ".labels.cache"
+MAGIC = b"LBLCACHE"
+VERSION = 1
+HEADER = struct.Struct("<8sIIqqq")  # 魔数, 版本, 文件名宽度, 文件数, 实例数, 数值个数
+ALIGN = 64
+FILE_DTYPE = np.dtype([("mtime", "<f8"), ("size", "<i8"), ("status", "<i4"), ("instances", "<i4")])
+
+
+def section_sizes(name_width, files, rows, values):
+    """各段的 (dtype, 元素个数)，顺序即文件中的顺序"""
+    return [(np.dtype(f"S{name_width}"), files), (FILE_DTYPE, files), (np.dtype("<i8"), files + 1),
+            (np.dtype("<i8"), rows + 1), (np.dtype("<f4"), values)]
+
+
+def aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def take_ranges(offsets, indices):
+    """offsets 划分的各段中取出第 indices 段，返回 (新的偏移表, 取出的元素在原数组中的下标)"""
+    starts = offsets[indices]
+    lengths = offsets[indices + 1] - starts
+    new_offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    positions = np.arange(new_offsets[-1], dtype=np.int64) - np.repeat(new_offsets[:-1] - starts, lengths)
+    return new_offsets, positions
+
+
+def read_label_file(path):
+    """读取一个标注文件，返回 (状态, 实例数, 所有数, 每行的个数)
+
+    每行至少 5 个数值且第一个为非负整数类别才算有效；无效的文件不保存数值
+    """
+    empty = np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+    except FileNotFoundError:
+        return (UNLABELED, 0) + empty
+    except (OSError, UnicodeDecodeError):
+        return (INVALID, 0) + empty
+    try:
+        values, counts, _ = split_lines(text)
+    except ValueError:
+        return (INVALID, sum(1 for line in text.splitlines() if line.strip())) + empty
+    classes = values[np.cumsum(counts) - counts]
+    if np.any(counts < 5) or np.any((classes < 0) | (classes != np.floor(classes))):
+        return (INVALID, len(counts)) + empty
+    return (LABELED if len(counts) else UNLABELED), len(counts), values.astype(np.float32), counts
+
+
+class CacheData:
+    """缓存的全部数组(可能映射自文件)，更新时整体替换"""
+
+    def __init__(self, names, files, file_rows, row_offsets, values):
+        self.names = names
+        self.files = files
+        self.file_rows = file_rows
+        self.row_offsets = row_offsets
+        self.values = values
+
+    @classmethod
+    def empty(cls):
+        return cls(np.zeros(0, dtype="S1"), np.zeros(0, dtype=FILE_DTYPE), np.zeros(1, dtype=np.int64),
+                   np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.float32))
+
+    def lookup(self, stems):
+        """去掉 .txt 的相对路径 -> 在缓存中的序号，不存在时为 -1"""
+        width = self.names.dtype.itemsize
+        encoded = [stem.encode("utf-8") for stem in stems]
+        query = np.array(encoded, dtype=self.names.dtype)  # 超过定宽的会被截断，下面排除
+        index = np.searchsorted(self.names, query)
+        clipped = np.minimum(index, max(len(self.names) - 1, 0))
+        found = (index < len(self.names)) & (np.array([len(e) <= width for e in encoded], dtype=bool))
+        if len(self.names):
+            found &= self.names[clipped] == query
+        return np.where(found, index, -1)
+
+    def rows(self, i):
+        """第 i 个文件的实例，每个为一个 float32 数组(类别 + 坐标)"""
+        start, end = self.file_rows[i], self.file_rows[i + 1]
+        offsets = self.row_offsets[start:end + 1]
+        return [self.values[offsets[j]:offsets[j + 1]] for j in range(end - start)]
+
+
+class LabelCache:
+    def __init__(self, folder):
+        self.folder = folder
+        self.path = os.path.join(folder, CACHE_FILENAME)
+        self.data = self.load()
+
+    def load(self):
+        """映射缓存文件；不存在、版本不同或不完整时返回空缓存"""
+        if not os.path.exists(self.path):
+            return CacheData.empty()
+        try:
+            mm = np.memmap(self.path, dtype=np.uint8, mode="r")
+            magic, version, name_width, files, rows, values = HEADER.unpack(bytes(mm[:HEADER.size]))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("不是本版本的标注缓存")
+            arrays, offset = [], aligned(HEADER.size)
+            for dtype, count in section_sizes(name_width, files, rows, values):
+                end = offset + dtype.itemsize * count
+                if end > len(mm):
+                    raise ValueError("文件不完整")
+                arrays.append(mm[offset:end].view(dtype))
+                offset = aligned(end)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Warning: Cannot read label cache {self.path}: {e}")
+            return CacheData.empty()
+        return CacheData(*arrays)
+
+    def write(self, data):
+        """写入临时文件后替换，换成新的映射；写不了时新数据只留在内存里"""
+        tmp_path = self.path + ".tmp"
+        header = HEADER.pack(MAGIC, VERSION, data.names.dtype.itemsize, len(data.names),
+                             len(data.row_offsets) - 1, len(data.values))
+        self.data = data  # 新数据已在内存中，先放掉旧的映射再替换文件(Windows 上映射中的文件不能替换)
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(header)
+                for array in (data.names, data.files, data.file_rows, data.row_offsets, data.values):
+                    f.write(b"\0" * (aligned(f.tell()) - f.tell()))
+                    f.write(np.ascontiguousarray(array).tobytes())
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            # 只读文件夹等情况：缓存只放在内存里，功能不变，只是下次打开要重新读取标注
+            print(f"Warning: Cannot write label cache {self.path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self.data = self.load()
+
+    def update(self, labels, cancel=None):
+        """按 scan_folder 的结果 {去掉 .txt 的相对路径: (mtime, 大小)} 增量更新
+
+        返回重新读取的文件数；cancel(threading.Event)被设置时不更新并返回 None
+        """
+        old = self.data
+        stems = sorted(labels)
+        stats = np.array([labels[stem] for stem in stems], dtype=np.float64).reshape(-1, 2)
+        old_index = old.lookup(stems)
+        hit = old_index >= 0
+        fresh = hit.copy()
+        fresh[hit] = ((old.files["mtime"][old_index[hit]] == stats[hit, 0]) &
+                      (old.files["size"][old_index[hit]] == stats[hit, 1]))
+        stale = np.flatnonzero(~fresh)
+        if not len(stale) and len(stems) == len(old.names):
+            return 0
+
+        def read(i):
+            if cancel is not None and cancel.is_set():
+                return read_label_file("")
+            return read_label_file(os.path.join(self.folder, stems[i] + ".txt"))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            parsed = list(executor.map(read, stale.tolist()))
+        if cancel is not None and cancel.is_set():
+            return None
+
+        # 没变的文件从旧缓存整段拷贝，重新读取的接在后面，再按文件名顺序整理
+        kept = np.flatnonzero(fresh)
+        kept_rows, kept_row_index = take_ranges(old.file_rows, old_index[kept])
+        kept_offsets, kept_value_index = take_ranges(old.row_offsets, kept_row_index)
+        new_counts = [result[3] for result in parsed]
+        new_rows = np.zeros(len(parsed) + 1, dtype=np.int64)
+        np.cumsum([len(counts) for counts in new_counts], out=new_rows[1:])
+        all_counts = np.concatenate([np.diff(kept_offsets)] + new_counts).astype(np.int64)
+        pool_offsets = np.zeros(len(all_counts) + 1, dtype=np.int64)
+        np.cumsum(all_counts, out=pool_offsets[1:])
+        pool_values = np.concatenate([old.values[kept_value_index]] + [result[2] for result in parsed])
+        pool_rows = np.concatenate([kept_rows, kept_rows[-1] + new_rows[1:]])
+
+        files = np.zeros(len(stems), dtype=FILE_DTYPE)
+        files["mtime"], files["size"] = stats[:, 0], stats[:, 1]
+        files["status"][kept] = old.files["status"][old_index[kept]]
+        files["instances"][kept] = old.files["instances"][old_index[kept]]
+        files["status"][stale] = [result[0] for result in parsed]
+        files["instances"][stale] = [result[1] for result in parsed]
+
+        order = np.argsort(np.concatenate([kept, stale]), kind="stable")  # 排序后第 i 个文件在池中的序号
+        file_rows, row_index = take_ranges(pool_rows, order)
+        row_offsets, value_index = take_ranges(pool_offsets, row_index)
+        names = np.array([stem.encode("utf-8") for stem in stems], dtype=bytes)
+        if not len(names):
+            names = np.zeros(0, dtype="S1")
+        data = CacheData(names, files, file_rows, row_offsets, pool_values[value_index])
+        del old  # 旧缓存的数组引用着映射，替换文件前放掉
+        self.write(data)
+        return len(stale)
+
+    def label_status(self, stems):
+        """每个标注文件的 (状态, 实例数)，不在缓存中的为 (UNLABELED, 0)"""
+        data = self.data
+        if not len(data.files):
+            return [(UNLABELED, 0)] * len(stems)
+        index = data.lookup(stems)
+        status = np.where(index >= 0, data.files["status"][index], UNLABELED)
+        instances = np.where(index >= 0, data.files["instances"][index], 0)
+        return list(zip(status.tolist(), instances.tolist()))
+
+    def summary(self, label_format="keypoint", num_keypoints=0):
+        """整个数据集的统计，全部在映射的数组上向量化计算"""
+        data = self.data
+        status = data.files["status"]
+        starts = data.row_offsets[:-1]
+        lengths = np.diff(data.row_offsets)
+        classes = data.values[starts].astype(np.int64)
+        result = {"label_files": len(status), "labeled": int(np.count_nonzero(status == LABELED)),
+                  "empty": int(np.count_nonzero(status == UNLABELED)),
+                  "invalid": int(np.count_nonzero(status == INVALID)), "instances": len(starts),
+                  "classes": {int(c): int(n) for c, n in enumerate(np.bincount(classes)) if n}}
+        if label_format == "seg":
+            vertices = (lengths - 1) // 2
+            result["vertices_mean"] = float(vertices.mean()) if len(vertices) else 0.0
+            result["vertices_max"] = int(vertices.max()) if len(vertices) else 0
+            return result
+        # 检测/关键点：bbox 为每行的第 2-5 个数，关键点可见性为第 8、11、... 个数
+        boxes = data.values[starts[:, None] + np.arange(1, 5)] if len(starts) else np.zeros((0, 4))
+        result["box_mean_wh"] = [float(v) for v in boxes[:, 2:].mean(axis=0)] if len(boxes) else [0.0, 0.0]
+        if num_keypoints:
+            full = starts[lengths == 5 + 3 * num_keypoints]
+            visibility = data.values[full[:, None] + 7 + 3 * np.arange(num_keypoints)]
+            result["keypoints_labeled"] = [float(v) for v in (visibility > 0).mean(axis=0)] if len(full) else []
+        return result
+
+
+def format_summary(summary, class_names=None, keypoint_names=None):
+    """统计结果 -> 多行文本，命令行和界面共用"""
+    lines = [f"标注文件 {summary['label_files']} 个: 已标注 {summary['labeled']}, 空 {summary['empty']}, "
+             f"异常 {summary['invalid']}; 实例 {summary['instances']} 个"]
+    for class_id, count in sorted(summary["classes"].items()):
+        name = class_names[class_id] if class_names and class_id < len(class_names) else f"类别{class_id}"
+        lines.append(f"  {name}: {count}")
+    if "vertices_mean" in summary:
+        lines.append(f"多边形顶点数: 平均 {summary['vertices_mean']:.1f}, 最多 {summary['vertices_max']}")
+    if "box_mean_wh" in summary:
+        lines.append("边界框平均宽高: {:.4f} x {:.4f}".format(*summary["box_mean_wh"]))
+    for k, ratio in enumerate(summary.get("keypoints_labeled", [])):
+        name = keypoint_names[k] if keypoint_names and k < len(keypoint_names) else f"关键点{k + 1}"
+        lines.append(f"  {name}: 已标注 {ratio * 100:.1f}%")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="更新数据集的标注缓存并打印统计")
+    parser.add_argument("folder", help="数据集目录(图片与同名 .txt 标注在同一目录)")
+    parser.add_argument("--format", choices=["keypoint", "seg"], default="keypoint", help="标注格式")
+    parser.add_argument("--num-keypoints", type=int,
+                        help="关键点数 K，默认从 dataset_schema.json 读取(与关键点工具相同)")
+    parser.add_argument("--recursive", action="store_true", help="包含子文件夹")
+    parser.add_argument("--filter", default="", help="过滤模式，如 \"cam1/* !*_bak*\"(见 folder_scan.py)")
+    parser.add_argument("--no-update", action="store_true", help="不扫描文件夹，只读取已有的缓存")
+    args = parser.parse_args()
+
+    class_names = keypoint_names = None
+    num_keypoints = args.num_keypoints or 0
+    if args.format == "keypoint" and args.num_keypoints is None:
+        from annotation_store import find_schema
+        try:
+            schema = find_schema(args.folder, os.path.dirname(os.path.abspath(__file__)))
+        except (OSError, ValueError) as e:
+            print(f"读取数据集配置失败: {e}")
+            return 2
+        class_names, keypoint_names, num_keypoints = schema.class_names, schema.keypoint_names, schema.num_keypoints
+
+    start = time.perf_counter()
+    cache = LabelCache(args.folder)
+    if not args.no_update:
+        from folder_scan import scan_folder, parse_filter
+        include, exclude = parse_filter(args.filter)
+        _, labels = scan_folder(args.folder, (".png", ".jpg", ".jpeg", ".bmp", ".gif"), args.recursive,
+                                include, exclude)
+        reread = cache.update(labels)
+        print(f"缓存已更新: 重新读取 {reread} 个标注文件, 耗时 {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    summary = cache.summary(args.format, num_keypoints)
+    print(format_summary(summary, class_names, keypoint_names))
+    print(f"统计耗时 {time.perf_counter() - start:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
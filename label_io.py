@@ -0,0 +1,339 @@
+import io
+import warnings
+from functools import lru_cache
+from itertools import chain
+import numpy as np
+
+'''
+YOLO 标注 .txt 的解析与写入，两个标注工具和批处理脚本共用：
+检测  "类别 cx cy w h"                     -> (N, 5) 数组
+关键点 "类别 cx cy w h x1 y1 v1 ... xK yK vK" -> (N, 5 + 3K) 数组(检测即 K = 0)
+分割  "类别 x1 y1 x2 y2 ..."               -> PolygonLabels(类别、偏移、顶点三个数组)
+
+检测/关键点每行列数固定：整个文件交给 np.loadtxt 的 C 解析器一次转换，
+列数不一致或有非数字时才逐行解析，定位出问题的行。分割每行长度不定：本模块写出的定宽坐标直接按字节矩阵算出数值，
+其他写法所有数一次转换再按每行的个数切开。
+写入固定 PRECISION 位小数。数较多、坐标都在 0-1、整数列都是 0-9 的常见情况直接用 NumPy 按定宽拼出字节，
+不逐个格式化浮点数，离舍入边界很近的数按 % 格式化的结果取整；
+其余情况(含负数、-0.0、类别大于 9)用 % 格式化，两种写法输出相同。
+'''
+
+PRECISION = 6  # 定宽写法按 6 位小数查表，改动时需要同时修改 fixed_width_bytes
+SCALE = 10 ** PRECISION
+FIXED_WIDTH = PRECISION + 3  # "0.123456" 加一个分隔符
+FIXED_MIN_VALUES = 256  # 数少于这个数时逐个格式化更快(NumPy 每次调用有固定开销)
+TIE_TOLERANCE = 1e-6  # 乘以 SCALE 后离 .5 小于这个值的数按 %.6f 取整(0-1 的数乘法误差小于 1e-10)
+
+
+def table_from_text(text):
+    """每个非空行列数相同且都是数字时返回 (N, 列数) 数组，否则返回 None"""
+    if not text.strip():
+        return None
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return np.loadtxt(io.StringIO(text), dtype=np.float64, ndmin=2, comments=None)
+    except ValueError:
+        return None
+
+
+def nonempty_line_numbers(text, count):
+    """非空行的行号(从 1 开始)；没有空行时不必逐行检查"""
+    if text.count("\n") + (not text.endswith("\n")) == count:
+        return np.arange(1, count + 1, dtype=np.int64)
+    return np.array([i for i, line in enumerate(text.splitlines(), 1) if line.strip()], dtype=np.int64)
+
+
+def split_lines(text):
+    """所有非空行的数 -> (一维数组, 每行的个数, 行号)；有非数字时抛出 ValueError"""
+    tokens = [line.split() for line in text.splitlines()]
+    counts = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+    nonempty = np.flatnonzero(counts)
+    values = np.array(list(chain.from_iterable(tokens)), dtype=np.float64)
+    return values, counts[nonempty], nonempty + 1
+
+
+def fit_width(data, width):
+    """关键点多于 K 个时截断，不足或最后一组不完整时补 0"""
+    keep = 5 + (min(data.shape[1], width) - 5) // 3 * 3
+    if keep == width == data.shape[1]:
+        return data
+    out = np.zeros((len(data), width))
+    out[:, :keep] = data[:, :keep]
+    return out
+
+
+def read_box_rows(text, width):
+    """解析检测/关键点行，返回 (数组, 行号, 问题列表)，只检查格式，不检查取值"""
+    data = table_from_text(text)
+    if data is not None and data.shape[1] >= 5:
+        return fit_width(data, width), nonempty_line_numbers(text, len(data)), []
+
+    rows, line_nums, issues = [], [], []
+    for line_num, line in enumerate(text.splitlines(), 1):
+        parts = line.split()
+        if not parts:  # 跳过空行
+            continue
+        if len(parts) < 5:  # 至少需要类别ID和bbox
+            issues.append((line_num, "format", f"格式不正确 - 需要至少5个参数，实际得到{len(parts)}个"))
+            continue
+        parts = parts[:5 + (min(len(parts), width) - 5) // 3 * 3]
+        try:
+            values = [float(p) for p in parts]
+        except ValueError as e:
+            issues.append((line_num, "parse", f"解析失败 - {e}"))
+            continue
+        rows.append(values + [0.0] * (width - len(values)))
+        line_nums.append(line_num)
+    return (np.array(rows, dtype=np.float64).reshape(-1, width),
+            np.array(line_nums, dtype=np.int64), issues)
+
+
+def parse_box_labels(text, num_keypoints=0):
+    """解析并校验检测/关键点标注，返回 (数组, 数组每行在文件中的行号, 问题列表)
+
+    问题为 (行号, 类型, 说明)，类型为 format / parse / bbox / keypoint。
+    关键点多于 K 个时截断，不足或最后一组不完整时补 0；bbox 超出 0-1 的行丢弃，无效的关键点置 0
+    """
+    data, line_nums, issues = read_box_rows(text, 5 + 3 * num_keypoints)
+    boxes = data[:, 1:5]
+    valid = np.all((boxes >= 0) & (boxes <= 1), axis=1) & (data[:, 0] >= 0) & (data[:, 0] == np.floor(data[:, 0]))
+    for i in np.flatnonzero(~valid).tolist():
+        issues.append((int(line_nums[i]), "bbox", f"类别或bbox值无效 - {data[i, :5].tolist()}"))
+
+    keypoints = data[:, 5:].reshape(len(data), num_keypoints, 3)
+    coords = keypoints[:, :, :2]
+    invalid_kp = ~(np.all((coords >= 0) & (coords <= 1), axis=2) & np.isin(keypoints[:, :, 2], (0, 1, 2)))
+    invalid_kp &= valid[:, None]
+    for i, k in zip(*np.nonzero(invalid_kp)):
+        issues.append((int(line_nums[i]), "keypoint", f"关键点{k + 1}值无效 - {keypoints[i, k].tolist()}"))
+    keypoints[invalid_kp] = 0
+    return data[valid], line_nums[valid], issues
+
+
+class PolygonLabels:
+    """一个分割标注文件：第 i 个多边形的类别为 class_ids[i]，顶点为 points[offsets[i]:offsets[i + 1]]"""
+
+    def __init__(self, class_ids, offsets, points, line_nums):
+        self.class_ids = class_ids
+        self.offsets = offsets
+        self.points = points  # (顶点总数, 2)，归一化坐标
+        self.line_nums = line_nums
+
+    def __len__(self):
+        return len(self.class_ids)
+
+    def polygon(self, i):
+        return self.points[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self):
+        for i, class_id in enumerate(self.class_ids.tolist()):
+            yield class_id, self.polygon(i)
+
+    def areas(self):
+        """每个多边形的有向面积的绝对值(鞋带公式，归一化坐标)"""
+        if not len(self):
+            return np.zeros(0)
+        x, y = self.points[:, 0], self.points[:, 1]
+        # 每个顶点的下一个顶点，最后一个顶点接回本多边形的第一个
+        nxt = np.arange(1, len(x) + 1)
+        nxt[self.offsets[1:] - 1] = self.offsets[:-1]
+        return np.abs(np.add.reduceat(x * y[nxt] - y * x[nxt], self.offsets[:-1])) / 2
+
+
+def polygon_arrays(rows):
+    """[(行号, 分割好的一行)] -> PolygonLabels，有非数字时抛出 ValueError"""
+    class_ids = np.array([parts[0] for _, parts in rows], dtype=np.float64)
+    points = np.array(list(chain.from_iterable(parts[1:] for _, parts in rows)), dtype=np.float64)
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([len(parts) // 2 for _, parts in rows], out=offsets[1:])
+    line_nums = np.array([line_num for line_num, _ in rows], dtype=np.int64)
+    return PolygonLabels(class_ids, offsets, points.reshape(-1, 2), line_nums)
+
+
+FIXED_DIGITS = np.array([0, 2, 3, 4, 5, 6, 7])  # "d.dddddd " 中数字所在的字节
+DIGIT_WEIGHTS = 10.0 ** np.arange(PRECISION, -1, -1)
+
+
+def fixed_polygon_rows(text):
+    """按 format_polygon_labels 写出的定宽格式解析：类别为整数，坐标都是 "d.dddddd"、以单个空格分隔
+
+    不逐个转换浮点数：所有坐标拼成 (坐标数, FIXED_WIDTH) 的字节矩阵，直接由数字算出数值；
+    结果与 float() 相同(整数除以 10**6 是正确舍入的)。有不符合的行时返回 None，交给通用解析
+    """
+    class_ids, counts, line_nums, chunks = [], [], [], []
+    for line_num, line in enumerate(text.splitlines(), 1):
+        if not line:
+            continue
+        class_id, _, coords = line.partition(" ")
+        count = (len(coords) + 1) // FIXED_WIDTH
+        if (len(coords) % FIXED_WIDTH != FIXED_WIDTH - 1 or count < 6 or count % 2
+                or not (class_id.isascii() and class_id.isdigit())):
+            return None
+        class_ids.append(class_id)
+        counts.append(count // 2)
+        line_nums.append(line_num)
+        chunks.append(coords)
+    if not chunks:
+        return None
+    cells = np.frombuffer((" ".join(chunks) + " ").encode("ascii", "replace"), dtype=np.uint8)
+    cells = cells.reshape(-1, FIXED_WIDTH)
+    digits = cells[:, FIXED_DIGITS] - 48  # 非数字字符减去后(uint8 回绕)都大于 9
+    if (cells[:, 1] != 46).any() or (cells[:, -1] != 32).any() or (digits > 9).any():
+        return None
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    points = (np.dot(digits, DIGIT_WEIGHTS) / SCALE).reshape(-1, 2)
+    return PolygonLabels(np.array(class_ids, dtype=np.float64), offsets, points,
+                         np.array(line_nums, dtype=np.int64))
+
+
+def read_polygon_rows(text):
+    """解析分割标注行，返回 (PolygonLabels, 问题列表)，只检查格式，不检查取值"""
+    labels = fixed_polygon_rows(text)
+    if labels is not None:
+        return labels, []
+    rows, issues = [], []
+    for line_num, parts in enumerate(map(str.split, text.splitlines()), 1):
+        if not parts:
+            continue
+        if len(parts) < 7 or len(parts) % 2 == 0:
+            issues.append((line_num, "format", f"多边形格式不正确 - 需要类别和至少3个点，实际得到{len(parts)}个数"))
+            continue
+        rows.append((line_num, parts))
+    try:
+        return polygon_arrays(rows), issues
+    except ValueError:
+        pass
+    # 有非数字时逐行找出来，其余的行重新一次转换
+    good = []
+    for line_num, parts in rows:
+        try:
+            np.array(parts, dtype=np.float64)
+        except ValueError as e:
+            issues.append((line_num, "parse", f"解析失败 - {e}"))
+            continue
+        good.append((line_num, parts))
+    return polygon_arrays(good), issues
+
+
+def parse_polygon_labels(text):
+    """解析并校验分割标注，返回 (PolygonLabels, 问题列表)
+
+    问题类型为 format(少于 3 个点或坐标不成对) / parse / class / coords(超出 0-1) / zero-area(面积为 0)；
+    format 和 parse 的行不在结果中，其余问题的行保留
+    """
+    labels, issues = read_polygon_rows(text)
+    class_ids, line_nums = labels.class_ids, labels.line_nums
+    for i in np.flatnonzero((class_ids < 0) | (class_ids != np.floor(class_ids))).tolist():
+        issues.append((int(line_nums[i]), "class", f"类别无效 - {class_ids[i]:g}"))
+    if len(labels):
+        outside = np.logical_or.reduceat(np.any((labels.points < 0) | (labels.points > 1), axis=1),
+                                         labels.offsets[:-1])
+        for i in np.flatnonzero(outside).tolist():
+            issues.append((int(line_nums[i]), "coords", "坐标超出 0-1"))
+    for i in np.flatnonzero(labels.areas() < 5e-13).tolist():  # 所有点共线时面积为 0
+        issues.append((int(line_nums[i]), "zero-area", "多边形面积为 0"))
+    return labels, issues
+
+
+THREE_DIGITS = np.array([b"%03d" % i for i in range(1000)], dtype="S3")  # 一维 S3 表，按下标取比二维表快
+
+
+@lru_cache(maxsize=64)
+def table_layout(int_columns, columns):
+    """返回 (整数列下标, 定宽写法每行保留的字节, 逐个格式化用的每行格式串)
+
+    定宽写法每列先占 FIXED_WIDTH 个字节，整数列只保留一位数字和分隔符
+    """
+    int_index = np.array(int_columns, dtype=np.int64)
+    keep = np.ones((columns, FIXED_WIDTH), dtype=bool)
+    keep[int_index, 2:] = False
+    fmt = " ".join("%d" if i in int_columns else f"%.{PRECISION}f" for i in range(columns)) + "\n"
+    return int_index, keep.ravel(), fmt
+
+
+def fixed_width_bytes(data, int_columns=()):
+    """(N, 列数) 数组 -> 每行 "列 列 ... 列\\n" 的 bytes；有列不满足定宽条件时返回 None，int_columns 为元组
+
+    浮点列需都在 0-1(写成 "d.dddddd")，整数列需都是 0-9 的整数(写成一位数字)；数太少时也返回 None
+    """
+    rows, columns = data.shape
+    if data.size < FIXED_MIN_VALUES:
+        return None
+    int_index, keep, _ = table_layout(int_columns, columns)
+    scaled = data * SCALE
+    quantized = np.rint(scaled)
+    # 乘法有舍入误差，离两个 6 位小数正中间很近的数 rint 可能与 %.6f(按准确的二进制值取整)方向相反，
+    # 这些数(随机坐标中约百万分之几)逐个按 %.6f 重新取整
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < TIE_TOLERANCE
+    if near_tie.any():
+        quantized[near_tie] = [int(("%.6f" % v).replace(".", "")) for v in data[near_tie].tolist()]
+    # signbit 同时排除负数和 -0.0(%.6f 写成 "-0.000000")，NaN 在 <= 比较中排除
+    ok = ~np.signbit(data) & (quantized <= SCALE)
+    ints = data[:, int_index]
+    ok[:, int_index] = ~np.signbit(ints) & (ints >= 0) & (ints <= 9) & (ints == np.floor(ints))
+    if not ok.all():
+        return None
+    # 6 位小数分成前后两个三位数，查表得到数字字符
+    quantized = quantized.astype(np.int32)
+    whole = quantized // SCALE
+    fraction = quantized - whole * SCALE
+    high = fraction // 1000
+    cells = np.empty((rows, columns, FIXED_WIDTH), dtype=np.uint8)
+    cells[:, :, 0] = whole + 48
+    cells[:, :, 1] = 46  # "."
+    cells[:, :, 2:5] = THREE_DIGITS[high].view(np.uint8).reshape(rows, columns, 3)
+    cells[:, :, 5:8] = THREE_DIGITS[fraction - high * 1000].view(np.uint8).reshape(rows, columns, 3)
+    cells[:, :, -1] = 32  # " "
+    if len(int_index):
+        cells[:, int_index, 0] = ints.astype(np.uint8) + 48
+        cells[:, int_index, 1] = 32
+    out = cells.reshape(rows, -1)[:, keep]
+    out[:, -1] = 10  # 每行最后的分隔符换成换行
+    return out.tobytes()
+
+
+def format_table(data, int_columns=()):
+    """(N, 列数) 数组 -> 文本，int_columns(元组)中的列按 %d、其余按 PRECISION 位小数"""
+    if not len(data):
+        return ""
+    text = fixed_width_bytes(data, int_columns)
+    if text is not None:
+        return text.decode("ascii")
+    fmt = table_layout(int_columns, data.shape[1])[2]
+    return "".join(fmt % tuple(row) for row in data.tolist())
+
+
+@lru_cache(maxsize=64)
+def box_int_columns(num_keypoints):
+    return (0,) + tuple(7 + 3 * k for k in range(num_keypoints))
+
+
+def format_box_labels(data):
+    """(N, 5 + 3K) 数组 -> 检测/关键点 .txt 内容"""
+    return format_table(data, box_int_columns((data.shape[1] - 5) // 3))
+
+
+def format_polygon_labels(class_ids, offsets, points):
+    """与 PolygonLabels 相同的三个数组 -> 分割 .txt 内容，每个多边形一行"""
+    class_ids = np.asarray(class_ids).astype(np.int64).tolist()
+    text = fixed_width_bytes(np.asarray(points, dtype=np.float64).reshape(-1, 1))
+    lines = []
+    if text is not None:
+        # 每个坐标 FIXED_WIDTH 个字节，换行符换回空格后按多边形切开
+        text = text.replace(b"\n", b" ").decode("ascii")
+        step = 2 * FIXED_WIDTH
+        for class_id, start, end in zip(class_ids, offsets[:-1].tolist(), offsets[1:].tolist()):
+            lines.append(f"{class_id} {text[start * step:end * step - 1]}\n")
+    else:
+        fmt = f"%.{PRECISION}f"
+        for class_id, start, end in zip(class_ids, offsets[:-1].tolist(), offsets[1:].tolist()):
+            lines.append(f"{class_id} " + " ".join(fmt % v for v in points[start:end].ravel().tolist()) + "\n")
+    return "".join(lines)
+
+
+def format_polygon_line(class_id, points, width, height):
+    """像素坐标的多边形 -> 一行分割标注"""
+    normalized = np.asarray(points, dtype=np.float64).reshape(-1, 2) / (width, height)
+    return format_polygon_labels([class_id], np.array([0, len(normalized)]), normalized)
@@ -0,0 +1,97 @@
+import os
+import threading
+
+'''
+后台标注写入线程：临时文件 + 原子重命名，断电或崩溃时不会留下写了一半的 .txt。
+同一路径在写入前多次提交只保留最后一次内容。
+'''
+
+
+class AtomicLabelWriter:
+    def __init__(self, on_error=None, on_written=None):
+        self.on_error = on_error  # 写入失败时在写入线程中调用 on_error(路径, 异常)
+        self.on_written = on_written  # 某个路径最后提交的内容写入后在写入线程中调用 on_written(路径)
+        self.pending = {}  # 路径 -> 待写入的文本
+        self.writing = None  # 正在写入的路径
+        self.closed = False
+        self.write_count = 0
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.run, name="label-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, path, text):
+        """提交一次写入，立即返回"""
+        with self.condition:
+            self.pending[path] = text
+            self.condition.notify_all()
+
+    def is_pending(self, path):
+        """path 是否还有排队中或正在写入的内容"""
+        with self.condition:
+            return path in self.pending or self.writing == path
+
+    def pending_text(self, path):
+        """path 最后提交、还没写入的内容；正在写入时先等它写完。返回 None 表示磁盘上已是最新内容
+
+        读取标注前先调用：排队中的内容比磁盘上的新，直接从磁盘读会读到旧标注
+        """
+        with self.condition:
+            while path not in self.pending and self.writing == path:
+                self.condition.wait()
+            return self.pending.get(path)
+
+    def flush(self):
+        """阻塞直到所有已提交的内容都写入磁盘"""
+        with self.condition:
+            while self.pending or self.writing is not None:
+                self.condition.wait()
+
+    def close(self):
+        self.flush()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                path, text = self.pending.popitem()
+                self.writing = path
+            try:
+                write_atomic(path, text)
+                self.write_count += 1
+                if self.on_written is not None:
+                    with self.condition:
+                        latest = path not in self.pending
+                    if latest:
+                        self.on_written(path)
+            except OSError as e:
+                print(f"Error: Cannot write labels to {path}: {e}")
+                if self.on_error is not None:
+                    self.on_error(path, e)
+            finally:
+                with self.condition:
+                    self.writing = None
+                    self.condition.notify_all()
+
+
+def write_atomic(path, text):
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        # 磁盘满、替换失败等：不在标注文件旁留下写了一半的临时文件
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
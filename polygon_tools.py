@@ -0,0 +1,162 @@
+import os
+import sys
+import argparse
+import cv2
+import numpy as np
+from PyQt5.QtGui import QImageReader, QImageIOHandler
+from label_writer import write_atomic
+from label_io import parse_polygon_labels, format_polygon_labels
+
+'''
+分割标注的多边形后处理：去重、去共线点、Douglas-Peucker 简化、按顶点预算重采样。
+分割标注工具在写入 .txt 之前调用 postprocess_polygon；
+对已有的标注目录可以批量处理：
+python polygon_tools.py 标注目录 --tolerance 1.0 --max-vertices 200
+'''
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+def remove_duplicate_points(points):
+    """去掉与前一个点重合的点(鼠标没动时会重复采样)"""
+    if len(points) < 2:
+        return points
+    keep = np.ones(len(points), dtype=bool)
+    keep[1:] = np.any(np.diff(points, axis=0) != 0, axis=1)
+    # 首尾重合时去掉尾点，多边形本身就是闭合的
+    if keep.sum() > 1 and np.array_equal(points[0], points[keep][-1]):
+        keep[np.flatnonzero(keep)[-1]] = False
+    return points[keep]
+
+
+def remove_collinear_points(points, eps=0.5):
+    """去掉到相邻两点连线距离小于 eps 像素的中间点"""
+    if len(points) < 4:
+        return points
+    prev_pts = np.roll(points, 1, axis=0)
+    next_pts = np.roll(points, -1, axis=0)
+    d1 = points - prev_pts
+    d2 = next_pts - prev_pts
+    cross = np.abs(d1[:, 0] * d2[:, 1] - d1[:, 1] * d2[:, 0])
+    length = np.hypot(d2[:, 0], d2[:, 1])
+    keep = cross > eps * np.maximum(length, 1e-9)
+    if keep.sum() < 3:
+        return points
+    return points[keep]
+
+
+def simplify_polygon(points, tolerance):
+    """Douglas-Peucker 简化，tolerance 为像素"""
+    if tolerance <= 0 or len(points) < 4:
+        return points
+    approx = cv2.approxPolyDP(points.reshape(-1, 1, 2).astype(np.float32), tolerance, True)
+    approx = approx.reshape(-1, 2)
+    return approx if len(approx) >= 3 else points
+
+
+def resample_polygon(points, num_vertices):
+    """沿周长等间距重采样为 num_vertices 个顶点"""
+    if num_vertices < 3 or len(points) < 3:
+        return points
+    closed = np.vstack([points, points[:1]])
+    seg_len = np.hypot(*np.diff(closed, axis=0).T)
+    cum_len = np.concatenate([[0], np.cumsum(seg_len)])
+    if cum_len[-1] == 0:
+        return points
+    targets = np.linspace(0, cum_len[-1], num_vertices, endpoint=False)
+    xs = np.interp(targets, cum_len, closed[:, 0])
+    ys = np.interp(targets, cum_len, closed[:, 1])
+    return np.stack([xs, ys], axis=1)
+
+
+def postprocess_polygon(points, tolerance=1.0, max_vertices=0, collinear_eps=0.5):
+    """写入标注前的多边形后处理，points 为像素坐标，返回 float 数组 (N, 2)
+
+    max_vertices > 0 时，简化后顶点仍超过预算则按周长重采样到 max_vertices 个
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    points = remove_duplicate_points(points)
+    points = remove_collinear_points(points, collinear_eps)
+    points = simplify_polygon(points, tolerance)
+    if max_vertices and len(points) > max_vertices:
+        points = resample_polygon(points, max_vertices)
+    return points
+
+
+def find_image_size(label_path):
+    """从同名图片的文件头读取尺寸，找不到图片时返回 None
+
+    标注工具按 EXIF 方向旋转后的图片归一化坐标，文件头里的尺寸没有旋转，方向为 90/270 度时交换宽高
+    """
+    stem = os.path.splitext(label_path)[0]
+    for ext in IMAGE_EXTENSIONS + tuple(e.upper() for e in IMAGE_EXTENSIONS):
+        if os.path.exists(stem + ext):
+            reader = QImageReader(stem + ext)
+            reader.setAutoTransform(True)
+            size = reader.size()
+            if size.isValid():
+                if reader.transformation() & QImageIOHandler.TransformationRotate90:
+                    size.transpose()
+                return size.width(), size.height()
+    return None
+
+
+def simplify_label_file(label_path, width, height, tolerance, max_vertices, dry_run=False):
+    """简化一个分割标注文件，返回 (简化前顶点数, 简化后顶点数)"""
+    with open(label_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    labels, issues = parse_polygon_labels(text)
+    # 只处理 "类别 x1 y1 x2 y2 ..." 形式的多边形行，其余原样保留
+    keep_lines = {line_num for line_num, kind, _ in issues if kind in ("format", "parse", "class")}
+    polygons = [(i, postprocess_polygon(labels.polygon(i) * (width, height), tolerance, max_vertices))
+                for i, line_num in enumerate(labels.line_nums.tolist()) if line_num not in keep_lines]
+    before = sum(len(labels.polygon(i)) for i, _ in polygons)
+    after = sum(len(points) for _, points in polygons)
+    if dry_run or after == before:
+        return before, after
+
+    # 所有多边形一次格式化，再按行号放回原来的位置
+    offsets = np.concatenate([[0], np.cumsum([len(points) for _, points in polygons])]).astype(np.int64)
+    points = np.concatenate([points for _, points in polygons]) / (width, height)
+    new_lines = format_polygon_labels([labels.class_ids[i] for i, _ in polygons], offsets, points).splitlines(True)
+    replaced = dict(zip((int(labels.line_nums[i]) for i, _ in polygons), new_lines))
+    out_lines = [replaced.get(line_num, line + '\n') for line_num, line in enumerate(text.splitlines(), 1)]
+    write_atomic(label_path, ''.join(out_lines))
+    return before, after
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量简化已有的 YOLO 分割标注")
+    parser.add_argument("label_dir", help="标注 .txt 所在目录(与图片同目录)")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="Douglas-Peucker 容差(像素)")
+    parser.add_argument("--max-vertices", type=int, default=0, help="每个多边形的顶点预算，0 表示不限制")
+    parser.add_argument("--image-size", type=int, nargs=2, metavar=("W", "H"),
+                        help="找不到同名图片时使用的图片尺寸")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不改写文件")
+    args = parser.parse_args()
+
+    total_before = total_after = files = 0
+    for entry in sorted(os.scandir(args.label_dir), key=lambda e: e.name):
+        if not entry.is_file() or not entry.name.lower().endswith('.txt'):
+            continue
+        size = find_image_size(entry.path) or args.image_size
+        if size is None:
+            print(f"跳过(找不到图片尺寸): {entry.name}")
+            continue
+        before, after = simplify_label_file(entry.path, size[0], size[1], args.tolerance,
+                                            args.max_vertices, args.dry_run)
+        if before:
+            files += 1
+            total_before += before
+            total_after += after
+            print(f"{entry.name}: {before} -> {after} 个顶点")
+
+    if total_before:
+        print(f"共 {files} 个文件, 顶点 {total_before} -> {total_after} "
+              f"(减少 {100 * (1 - total_after / total_before):.1f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+'''
+标注的空间索引(均匀网格)，用于在图片上点选/拖动关键点和边界框。
+边界框登记到它覆盖的所有格子，关键点登记到所在的格子，查询只看点击位置附近的几个格子。
+sync() 逐行比较标注数组，只重新登记改动过的标注，并移除已经不在列表中的标注；坐标均为原图像素。
+'''
+
+CELL_SIZE = 64
+
+
+class SpatialIndex:
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self.image_size = None
+        self.entries = {}  # id(标注) -> {"ann", "signature", "box", "points", "box_cells", "point_cells"}
+        self.position = {}  # id(标注) -> 在当前标注列表中的位置
+        self.box_cells = {}  # 格子 -> {id(标注)}
+        self.point_cells = {}  # 格子 -> {(id(标注), 关键点序号)}
+
+    def clear(self):
+        self.entries.clear()
+        self.position.clear()
+        self.box_cells.clear()
+        self.point_cells.clear()
+
+    def cells(self, x1, y1, x2, y2):
+        c = self.cell_size
+        return [(cx, cy) for cx in range(int(x1 // c), int(x2 // c) + 1)
+                for cy in range(int(y1 // c), int(y2 // c) + 1)]
+
+    def sync(self, annotations, rows, width, height):
+        """与标注同步，返回重新登记的标注数
+
+        annotations 为标注对象列表(只用来区分是哪个标注)，rows 为对应的 (N, 5 + 3K) 标注数组(归一化坐标)
+        """
+        if self.image_size != (width, height):
+            self.clear()
+            self.image_size = (width, height)
+        self.position = {id(ann): i for i, ann in enumerate(annotations)}
+        for key in [key for key in self.entries if key not in self.position]:
+            self.remove(key)
+        changed = 0
+        for ann, row in zip(annotations, rows):
+            key = id(ann)
+            signature = row.tobytes()
+            entry = self.entries.get(key)
+            if entry is not None and entry["signature"] == signature:
+                continue
+            if entry is not None:
+                self.remove(key)
+            self.insert(key, ann, row, signature, width, height)
+            changed += 1
+        return changed
+
+    def insert(self, key, ann, row, signature, width, height):
+        x_center, y_center, w, h = row[1:5].tolist()
+        box = ((x_center - w / 2) * width, (y_center - h / 2) * height,
+               (x_center + w / 2) * width, (y_center + h / 2) * height)
+        entry = {"ann": ann, "signature": signature, "box": box, "points": {},
+                 "box_cells": self.cells(*box), "point_cells": []}
+        for cell in entry["box_cells"]:
+            self.box_cells.setdefault(cell, set()).add(key)
+        for k, (x, y, v) in enumerate(row[5:].reshape(-1, 3).tolist()):
+            if v > 0:  # 未标注的关键点不参与点选
+                point = (x * width, y * height)
+                cell = (int(point[0] // self.cell_size), int(point[1] // self.cell_size))
+                entry["points"][k] = point
+                entry["point_cells"].append(cell)
+                self.point_cells.setdefault(cell, set()).add((key, k))
+        self.entries[key] = entry
+
+    def remove(self, key):
+        entry = self.entries.pop(key)
+        for cell in entry["box_cells"]:
+            keys = self.box_cells[cell]
+            keys.discard(key)
+            if not keys:
+                del self.box_cells[cell]
+        for cell, k in zip(entry["point_cells"], entry["points"]):
+            points = self.point_cells[cell]
+            points.discard((key, k))
+            if not points:
+                del self.point_cells[cell]
+
+    def nearest_keypoint(self, x, y, radius):
+        """radius 以内最近的已标注关键点，返回 (标注位置, 关键点序号)，没有时返回 None"""
+        best, best_d = None, radius * radius
+        for cell in self.cells(x - radius, y - radius, x + radius, y + radius):
+            for key, k in self.point_cells.get(cell, ()):
+                px, py = self.entries[key]["points"][k]
+                d = (px - x) ** 2 + (py - y) ** 2
+                if d <= best_d:
+                    best, best_d = (self.position[key], k), d
+        return best
+
+    def smallest_box(self, x, y):
+        """包含 (x, y) 的面积最小的边界框位置，没有时返回 -1"""
+        best, best_area = -1, None
+        for key in self.box_cells.get((int(x // self.cell_size), int(y // self.cell_size)), ()):
+            x1, y1, x2, y2 = self.entries[key]["box"]
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                area = (x2 - x1) * (y2 - y1)
+                if best_area is None or area < best_area:
+                    best, best_area = self.position[key], area
+        return best
+
+    def box_edge(self, x, y, tolerance):
+        """tolerance 以内最近的边界框边或角
+
+        返回 (标注位置, x 方向的边, y 方向的边)，边用 (x1, y1, x2, y2) 中的下标表示：
+        x 方向为 0 或 2，y 方向为 1 或 3，不在边附近的方向为 None；没有时返回 None
+        """
+        candidates = set()
+        for cell in self.cells(x - tolerance, y - tolerance, x + tolerance, y + tolerance):
+            candidates.update(self.box_cells.get(cell, ()))
+        best, best_key = None, None
+        for key in candidates:
+            x1, y1, x2, y2 = box = self.entries[key]["box"]
+            if not (x1 - tolerance <= x <= x2 + tolerance and y1 - tolerance <= y <= y2 + tolerance):
+                continue
+            ex = 0 if abs(x - x1) <= abs(x - x2) else 2
+            ey = 1 if abs(y - y1) <= abs(y - y2) else 3
+            dx, dy = abs(x - box[ex]), abs(y - box[ey])
+            ex = ex if dx <= tolerance else None
+            ey = ey if dy <= tolerance else None
+            if ex is None and ey is None:
+                continue
+            # 离边越近越优先，一样近时取小框(大框里套小框时小框更难点中)
+            sort_key = (min(d for d, e in ((dx, ex), (dy, ey)) if e is not None), (x2 - x1) * (y2 - y1))
+            if best_key is None or sort_key < best_key:
+                best, best_key = (self.position[key], ex, ey), sort_key
+        return best
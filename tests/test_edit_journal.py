@@ -0,0 +1,45 @@
+import os
+import stat
+import numpy as np
+import edit_journal
+from edit_journal import EditJournal, JOURNAL_FILENAME, read_journal, SET
+from annotation_store import AnnotationStore
+
+
+def edited_store(folder, journal):
+    store = AnnotationStore(1)
+    store.attach(journal, os.path.join(folder, "a.jpg"))
+    store.append(0, [0.5, 0.5, 0.2, 0.2])
+    return store
+
+
+def test_replays_recorded_edits(tmp_path):
+    journal = EditJournal(str(tmp_path))
+    store = edited_store(str(tmp_path), journal)
+    store.set_row(0, np.array([1, 0.4, 0.4, 0.1, 0.1, 0.2, 0.3, 2]))
+    journal.flush()
+    data = read_journal(journal.path)["a.jpg"]
+    assert data.tolist() == [[1, 0.4, 0.4, 0.1, 0.1, 0.2, 0.3, 2]]
+    journal.close()  # 有未保存的改动，日志保留
+    assert os.path.exists(journal.path)
+
+
+def test_read_only_folder_disables_journal(tmp_path, monkeypatch):
+    os.chmod(tmp_path, stat.S_IRUSR | stat.S_IXUSR)
+    if os.access(tmp_path, os.W_OK):  # root 不受权限限制
+        def read_only_open(path, mode="r", *args, **kwargs):
+            if "a" in mode or "w" in mode:
+                raise PermissionError(13, "Permission denied", path)
+            return open(path, mode, *args, **kwargs)
+        monkeypatch.setattr(edit_journal, "open", read_only_open, raising=False)
+    try:
+        journal = EditJournal(str(tmp_path))
+        assert not journal.enabled
+        store = edited_store(str(tmp_path), journal)
+        journal.record(store, SET, 0)
+        journal.saving(os.path.join(tmp_path, "a.txt"))
+        journal.flush()
+        journal.close()
+        assert not os.path.exists(os.path.join(tmp_path, JOURNAL_FILENAME))
+    finally:
+        os.chmod(tmp_path, stat.S_IRWXU)
@@ -0,0 +1,27 @@
+from folder_scan import scan_folder, parse_filter
+
+EXTENSIONS = (".jpg", ".png")
+
+
+def make_tree(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+
+
+def test_include_filter_applies_to_labels(tmp_path):
+    make_tree(tmp_path, ["cam1/a.jpg", "cam1/a.txt", "cam1/orphan.txt", "cam2/a.jpg", "cam2/a.txt", "c.JPG", "c.txt"])
+    images, labels = scan_folder(str(tmp_path), EXTENSIONS, recursive=True, include=parse_filter("cam1/*")[0])
+    assert sorted(images) == ["cam1/a.jpg"]
+    assert sorted(labels) == ["cam1/a", "cam1/orphan"]
+    # 按图片扩展名过滤时同名标注也保留
+    images, labels = scan_folder(str(tmp_path), EXTENSIONS, recursive=True, include=["*.jpg", "*.JPG"])
+    assert sorted(labels) == ["c", "cam1/a", "cam1/orphan", "cam2/a"]
+
+
+def test_exclude_filter_applies_to_labels(tmp_path):
+    make_tree(tmp_path, ["a.jpg", "a.txt", "a_bak.jpg", "a_bak.txt"])
+    include, exclude = parse_filter("!*_bak*")
+    images, labels = scan_folder(str(tmp_path), EXTENSIONS, include=include, exclude=exclude)
+    assert sorted(images) == ["a.jpg"] and sorted(labels) == ["a"]
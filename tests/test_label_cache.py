@@ -0,0 +1,57 @@
+import os
+import stat
+import label_cache
+from label_cache import LabelCache, CACHE_FILENAME
+from dataset_index import DatasetIndex, LABELED, UNLABELED
+from folder_scan import scan_folder
+
+EXTENSIONS = (".jpg",)
+
+
+def make_dataset(folder, count=5):
+    for i in range(count):
+        (folder / f"im{i}.jpg").write_bytes(b"")
+        if i % 2 == 0:
+            (folder / f"im{i}.txt").write_text("0 0.500000 0.500000 0.200000 0.200000\n" * (i + 1))
+
+
+def make_read_only(folder, monkeypatch):
+    """去掉写权限；root 不受权限限制，再让缓存文件写入失败"""
+    os.chmod(folder, stat.S_IRUSR | stat.S_IXUSR)
+    if os.access(folder, os.W_OK):
+        def read_only_open(path, mode="r", *args, **kwargs):
+            if "w" in mode:
+                raise PermissionError(13, "Permission denied", path)
+            return open(path, mode, *args, **kwargs)
+        monkeypatch.setattr(label_cache, "open", read_only_open, raising=False)
+
+
+def test_update_in_read_only_folder_keeps_cache_in_memory(tmp_path, monkeypatch):
+    make_dataset(tmp_path)
+    make_read_only(tmp_path, monkeypatch)
+    try:
+        images, labels = scan_folder(str(tmp_path), EXTENSIONS)
+        cache = LabelCache(str(tmp_path))
+        assert cache.update(labels) == 3
+        assert not os.path.exists(os.path.join(tmp_path, CACHE_FILENAME))
+        assert cache.label_status(["im0", "im1", "im4"]) == [(LABELED, 1), (UNLABELED, 0), (LABELED, 5)]
+        assert cache.summary()["instances"] == 9
+        assert cache.update(labels) == 0  # 内存中的缓存照常用于增量判断
+
+        index = DatasetIndex(str(tmp_path))
+        index.refresh(images, labels, cache)
+        assert index.counts() == {LABELED: 3, UNLABELED: 2}
+        assert index.next_with_status("im0.jpg", [UNLABELED]) == "im1.jpg"
+        index.close()
+    finally:
+        os.chmod(tmp_path, stat.S_IRWXU)
+
+
+def test_update_round_trips_through_file(tmp_path):
+    make_dataset(tmp_path)
+    _, labels = scan_folder(str(tmp_path), EXTENSIONS)
+    LabelCache(str(tmp_path)).update(labels)
+    cache = LabelCache(str(tmp_path))  # 重新打开，从映射读取
+    assert os.path.exists(os.path.join(tmp_path, CACHE_FILENAME))
+    assert cache.update(labels) == 0
+    assert cache.summary()["instances"] == 9
@@ -0,0 +1,97 @@
+import numpy as np
+import label_io
+
+
+def printf_lines(data, int_columns=()):
+    fmt = label_io.table_layout(int_columns, data.shape[1])[2]
+    return "".join(fmt % tuple(row) for row in data.tolist())
+
+
+def test_fixed_width_matches_printf_on_ties():
+    """正好落在两个 6 位小数中间的坐标(十进制 .5，二进制略大或略小)，定宽写法与 %.6f 相同"""
+    ties = np.array([0.8506245, 0.0000005, 0.1234565, 0.9999995, 0.5000005, 0.0000015])
+    # 像素坐标除以图片尺寸，其中有大量这样的数
+    rng = np.random.default_rng(0)
+    sizes = rng.integers(100, 8000, 200000)
+    ratios = rng.integers(0, sizes + 1) / sizes
+    data = np.concatenate([np.repeat(ties, 50), ratios]).reshape(-1, 1)
+    assert data.size >= label_io.FIXED_MIN_VALUES
+    assert label_io.fixed_width_bytes(data).decode("ascii") == printf_lines(data)
+
+
+def test_fixed_width_same_value_regardless_of_file_size():
+    """同一个坐标在小文件(% 格式化)和大文件(定宽)中写法相同"""
+    small = np.array([[0, 0.8506245, 0.5, 0.25, 0.1234565]])
+    large = np.repeat(small, label_io.FIXED_MIN_VALUES, axis=0)
+    assert label_io.format_box_labels(large).splitlines()[0] == label_io.format_box_labels(small).strip()
+
+
+def test_negative_integer_columns_fall_back_to_printf():
+    """类别或可见性为负数时，大数组与小数组一样按 % 格式化"""
+    rng = np.random.default_rng(3)
+    data = rng.random((30, 5 + 3 * 9))
+    data[:, 0] = 1
+    data[:, 7::3] = 2
+    data[0, 0] = -1
+    data[1, 7] = -2
+    data[2, 10] = -0.0
+    assert data.size >= label_io.FIXED_MIN_VALUES
+    int_columns = label_io.box_int_columns(9)
+    assert label_io.fixed_width_bytes(data, int_columns) is None
+    text = label_io.format_box_labels(data)
+    assert text == printf_lines(data, int_columns)
+    assert text.splitlines()[0] == label_io.format_box_labels(data[:1]).strip()
+
+
+def test_box_labels_round_trip():
+    rng = np.random.default_rng(1)
+    data = rng.random((100, 5 + 3 * 4))
+    data[:, 0] = rng.integers(0, 3, 100)
+    data[:, 7::3] = rng.integers(0, 3, (100, 4))
+    text = label_io.format_box_labels(data)
+    assert text == printf_lines(data, label_io.box_int_columns(4))
+    parsed, line_nums, issues = label_io.parse_box_labels(text, 4)
+    assert not issues and len(parsed) == 100
+    assert label_io.format_box_labels(parsed) == text
+
+
+def generic_polygon_rows(text):
+    """去掉定宽快速路径的通用解析，作为对照"""
+    fixed = label_io.fixed_polygon_rows
+    label_io.fixed_polygon_rows = lambda text: None
+    try:
+        return label_io.read_polygon_rows(text)
+    finally:
+        label_io.fixed_polygon_rows = fixed
+
+
+def assert_same_polygons(a, b):
+    for name in ("class_ids", "offsets", "points", "line_nums"):
+        assert np.array_equal(getattr(a, name), getattr(b, name)), name
+
+
+def test_fixed_polygon_rows_matches_generic_parse():
+    rng = np.random.default_rng(2)
+    sizes = rng.integers(3, 40, 20)
+    offsets = np.concatenate([[0], np.cumsum(sizes)])
+    text = label_io.format_polygon_labels(rng.integers(0, 12, 20), offsets, rng.random((offsets[-1], 2)))
+    labels, issues = label_io.read_polygon_rows(text)
+    assert label_io.fixed_polygon_rows(text) is not None and not issues
+    assert_same_polygons(labels, generic_polygon_rows(text)[0])
+    assert np.array_equal(labels.offsets, offsets)
+    # 空行保留行号
+    assert_same_polygons(label_io.read_polygon_rows("\n" + text)[0], generic_polygon_rows("\n" + text)[0])
+
+
+def test_polygon_rows_fall_back_for_other_layouts():
+    for text in ["0 0.1 0.1 0.5 0.1 0.5 0.5\n",  # 非定宽小数
+                 "0 0.100000  0.100000 0.500000 0.100000 0.500000 0.500000\n",  # 两个空格
+                 "0 0.100000 0.100000 0.500000 0.100000 0.500000\n",  # 坐标不成对
+                 "a 0.100000 0.100000 0.500000 0.100000 0.500000 0.500000\n",
+                 "0 0.100000 0.100000 0.500000 0.1x0000 0.500000 0.500000\n",
+                 "0 -0.10000 0.100000 0.500000 0.100000 0.500000 0.500000\n"]:
+        assert label_io.fixed_polygon_rows(text) is None
+        labels, issues = label_io.read_polygon_rows(text)
+        expected, expected_issues = generic_polygon_rows(text)
+        assert_same_polygons(labels, expected)
+        assert issues == expected_issues
@@ -0,0 +1,71 @@
+import threading
+import pytest
+import label_writer
+from label_writer import AtomicLabelWriter
+
+
+def test_pending_text_returns_queued_content(tmp_path, monkeypatch):
+    """A 的写入还在排队时切回 A，应读到排队的内容而不是磁盘上的旧内容"""
+    release = threading.Event()
+    started = threading.Event()
+    write_atomic = label_writer.write_atomic
+
+    def slow_write(path, text):
+        started.set()
+        release.wait(5)
+        write_atomic(path, text)
+
+    monkeypatch.setattr(label_writer, "write_atomic", slow_write)
+    a, b = str(tmp_path / "a.txt"), str(tmp_path / "b.txt")
+    with open(a, "w", encoding="utf-8") as f:
+        f.write("old\n")
+    writer = AtomicLabelWriter()
+    writer.submit(b, "b\n")
+    assert started.wait(5)  # 写入线程卡在 b 上，a 只能排队
+    writer.submit(a, "new\n")
+    assert writer.pending_text(a) == "new\n"
+    writer.submit(a, "")  # 清空标注也是要写入的内容
+    assert writer.pending_text(a) == ""
+    release.set()
+    writer.close()
+    assert writer.pending_text(a) is None
+    with open(a, encoding="utf-8") as f:
+        assert f.read() == ""
+
+
+def test_pending_text_waits_for_write_in_progress(tmp_path, monkeypatch):
+    release = threading.Event()
+    started = threading.Event()
+    write_atomic = label_writer.write_atomic
+
+    def slow_write(path, text):
+        started.set()
+        release.wait(5)
+        write_atomic(path, text)
+
+    monkeypatch.setattr(label_writer, "write_atomic", slow_write)
+    path = str(tmp_path / "a.txt")
+    writer = AtomicLabelWriter()
+    writer.submit(path, "new\n")
+    assert started.wait(5)
+    threading.Timer(0.2, release.set).start()
+    assert writer.pending_text(path) is None  # 等写完才返回，此时磁盘上已是新内容
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "new\n"
+    writer.close()
+
+
+def test_write_atomic_removes_temp_file_on_failure(tmp_path, monkeypatch):
+    path = str(tmp_path / "a.txt")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("old\n")
+
+    def fail_replace(src, dst):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(label_writer.os, "replace", fail_replace)
+    with pytest.raises(OSError):
+        label_writer.write_atomic(path, "new\n")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.txt"]
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "old\n"
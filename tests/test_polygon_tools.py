@@ -0,0 +1,14 @@
+import numpy as np
+import polygon_tools
+from test_seg_decode import jpeg_with_orientation
+
+
+def test_find_image_size_uses_exif_orientation(tmp_path):
+    """EXIF 方向为 6 的 300x200 JPEG 按旋转后的 200x300 反归一化，与标注工具一致"""
+    with open(tmp_path / "rotated.jpg", "wb") as f:
+        f.write(jpeg_with_orientation(np.zeros((200, 300, 3), np.uint8), 6))
+    with open(tmp_path / "plain.jpg", "wb") as f:
+        f.write(jpeg_with_orientation(np.zeros((200, 300, 3), np.uint8), 1))
+    assert polygon_tools.find_image_size(str(tmp_path / "rotated.txt")) == (200, 300)
+    assert polygon_tools.find_image_size(str(tmp_path / "plain.txt")) == (300, 200)
+    assert polygon_tools.find_image_size(str(tmp_path / "missing.txt")) is None
@@ -0,0 +1,44 @@
+import os
+import struct
+import importlib.util
+import cv2
+import numpy as np
+
+TOOL = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "标注--分割数据集标注3-中文-3.py")
+
+
+def load_seg_tool():
+    spec = importlib.util.spec_from_file_location("seg_tool", TOOL)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def jpeg_with_orientation(img, orientation):
+    """在 SOI 后插入只含 Orientation 一项的 EXIF 段"""
+    jpeg = cv2.imencode(".jpg", img)[1].tobytes()
+    tiff = b"MM\x00\x2a\x00\x00\x00\x08" + struct.pack(">HHHIHH", 1, 0x0112, 3, 1, orientation, 0) + bytes(4)
+    app1 = b"Exif\x00\x00" + tiff
+    return jpeg[:2] + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + jpeg[2:]
+
+
+def test_reduced_decode_reports_oriented_size(tmp_path):
+    """EXIF 方向为 6(顺时针 90 度)的 3000x2000 JPEG：缩小解码与全分辨率解码报告相同的原图尺寸"""
+    seg = load_seg_tool()
+    path = str(tmp_path / "rotated.jpg")
+    with open(path, "wb") as f:
+        f.write(jpeg_with_orientation(np.zeros((2000, 3000, 3), np.uint8), 6))
+    img, _, reduced_size, reduction = seg.decode_for_display(path, 900, 800)
+    assert reduction > 1 and img.shape[:2] == (3000 // reduction, 2000 // reduction)
+    _, _, full_size, reduction = seg.decode_for_display(path, 5000, 5000)
+    assert reduction == 1
+    assert reduced_size == full_size == (2000, 3000)
+
+
+def test_reduced_decode_keeps_exact_odd_size(tmp_path):
+    seg = load_seg_tool()
+    for ext in (".jpg", ".png"):
+        path = str(tmp_path / ("odd" + ext))
+        cv2.imwrite(path, np.zeros((2001, 3001, 3), np.uint8))
+        _, _, size, reduction = seg.decode_for_display(path, 900, 800)
+        assert reduction > 1 and size == (3001, 2001)
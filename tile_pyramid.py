@@ -0,0 +1,208 @@
+import math
+import cv2
+import numpy as np
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QImage, QPainter
+
+'''
+可缩放、平移的视口 + 按需构建的分块图像金字塔，两个标注工具共用。
+金字塔第 l 层是原图缩小 2^l 倍，层图像在第一次用到时才由更精细的一层缩小得到；
+绘制时只把当前视口内可见的分块转成 QImage，分块放进按字节预算淘汰的 LRU 缓存。
+'''
+
+TILE_SIZE = 256
+MAX_ZOOM = 64.0
+
+
+class Viewport:
+    """图像坐标与控件坐标之间的变换：zoom 为相对"适应窗口"的放大倍数，center 为视口中心的图像坐标"""
+
+    def __init__(self):
+        self.img_w = self.img_h = 0
+        self.view_w = self.view_h = 0
+        self.zoom = 1.0
+        self.cx = self.cy = 0.0
+
+    def set_image_size(self, width, height):
+        self.img_w, self.img_h = width, height
+        self.reset()
+
+    def set_view_size(self, width, height):
+        self.view_w, self.view_h = width, height
+        self.clamp()
+
+    def reset(self):
+        self.zoom = 1.0
+        self.cx, self.cy = self.img_w / 2, self.img_h / 2
+
+    def is_fit(self):
+        return self.zoom == 1.0
+
+    def fit_scale(self):
+        if not self.img_w or not self.img_h:
+            return 1.0
+        return min(self.view_w / self.img_w, self.view_h / self.img_h)
+
+    def fit_size(self):
+        scale = self.fit_scale()
+        return int(self.img_w * scale), int(self.img_h * scale)
+
+    def transform(self):
+        """返回 (scale_x, scale_y, offset_x, offset_y)，控件坐标 = 图像坐标 * scale + offset"""
+        if self.is_fit():
+            # 适应窗口时与原来的整数居中方式完全一致
+            disp_w, disp_h = self.fit_size()
+            if not disp_w or not disp_h:
+                return 1.0, 1.0, 0, 0
+            return (disp_w / self.img_w, disp_h / self.img_h,
+                    (self.view_w - disp_w) // 2, (self.view_h - disp_h) // 2)
+        scale = self.fit_scale() * self.zoom
+        return scale, scale, self.view_w / 2 - self.cx * scale, self.view_h / 2 - self.cy * scale
+
+    def image_to_widget(self, x, y):
+        sx, sy, ox, oy = self.transform()
+        return x * sx + ox, y * sy + oy
+
+    def widget_to_image(self, x, y):
+        sx, sy, ox, oy = self.transform()
+        return (x - ox) / sx, (y - oy) / sy
+
+    def visible_image_rect(self):
+        """视口内可见的图像区域 (x1, y1, x2, y2)，已裁剪到图像范围"""
+        x1, y1 = self.widget_to_image(0, 0)
+        x2, y2 = self.widget_to_image(self.view_w, self.view_h)
+        return max(0.0, x1), max(0.0, y1), min(float(self.img_w), x2), min(float(self.img_h), y2)
+
+    def display_rect(self):
+        """图像可见部分在控件中的整数矩形 (x, y, w, h)"""
+        x1, y1, x2, y2 = self.visible_image_rect()
+        wx1, wy1 = self.image_to_widget(x1, y1)
+        wx2, wy2 = self.image_to_widget(x2, y2)
+        wx1, wy1 = int(math.floor(wx1)), int(math.floor(wy1))
+        return wx1, wy1, max(0, int(math.ceil(wx2)) - wx1), max(0, int(math.ceil(wy2)) - wy1)
+
+    def zoom_at(self, widget_x, widget_y, factor):
+        """以控件坐标 (widget_x, widget_y) 处的图像点为中心缩放"""
+        img_x, img_y = self.widget_to_image(widget_x, widget_y)
+        if self.is_fit():
+            self.cx, self.cy = self.img_w / 2, self.img_h / 2
+        self.zoom = min(MAX_ZOOM, max(1.0, self.zoom * factor))
+        scale = self.fit_scale() * self.zoom
+        self.cx = img_x - (widget_x - self.view_w / 2) / scale
+        self.cy = img_y - (widget_y - self.view_h / 2) / scale
+        self.clamp()
+
+    def pan(self, dx, dy):
+        """按控件像素平移"""
+        if self.is_fit():
+            return
+        scale = self.fit_scale() * self.zoom
+        self.cx -= dx / scale
+        self.cy -= dy / scale
+        self.clamp()
+
+    def clamp(self):
+        if self.is_fit():
+            self.cx, self.cy = self.img_w / 2, self.img_h / 2
+            return
+        scale = self.fit_scale() * self.zoom
+        half_w = self.view_w / 2 / scale
+        half_h = self.view_h / 2 / scale
+        # 图像比视口小的方向保持居中，否则不允许拖出图像边界
+        self.cx = self.img_w / 2 if half_w * 2 >= self.img_w else min(max(self.cx, half_w), self.img_w - half_w)
+        self.cy = self.img_h / 2 if half_h * 2 >= self.img_h else min(max(self.cy, half_h), self.img_h - half_h)
+
+
+def qimage_to_array(qimg):
+    """把 QImage 转成 RGB32 并返回共享内存的 (H, W, 4) BGRA 数组，调用方需保留返回的 QImage"""
+    qimg = qimg.convertToFormat(QImage.Format_RGB32)
+    ptr = qimg.constBits()
+    ptr.setsize(qimg.byteCount())
+    array = np.frombuffer(ptr, dtype=np.uint8).reshape(qimg.height(), qimg.bytesPerLine())
+    return qimg, array[:, :qimg.width() * 4].reshape(qimg.height(), qimg.width(), 4)
+
+
+def array_to_qimage(array):
+    """BGR(3 通道) 或 BGRA(4 通道) 数组 -> 独立持有内存的 QImage"""
+    height, width = array.shape[:2]
+    array = np.ascontiguousarray(array)
+    if array.shape[2] == 3:
+        return QImage(array.data, width, height, 3 * width, QImage.Format_RGB888).rgbSwapped()
+    return QImage(array.data, width, height, 4 * width, QImage.Format_RGB32).copy()
+
+
+class TilePyramid:
+    """单张图片的分块金字塔
+
+    key 用来区分不同图片在共享分块缓存中的条目；full_loader() 返回原分辨率数组，
+    只有需要比已知层更精细的分块时才会调用
+    """
+
+    def __init__(self, key, width, height, tile_cache, full_loader=None, tile_size=TILE_SIZE):
+        self.key = key
+        self.width, self.height = width, height
+        self.tile_cache = tile_cache
+        self.full_loader = full_loader
+        self.tile_size = tile_size
+        self.levels = {}  # 层号 -> 数组
+        self.max_level = max(0, int(math.ceil(math.log2(max(width, height) / tile_size)))) if width else 0
+
+    def set_level_image(self, level, array):
+        """登记已经解码好的某一层(例如按 1/2^level 缩小解码的图)"""
+        self.levels[level] = array
+
+    def level_image(self, level):
+        if level in self.levels:
+            return self.levels[level]
+        finer = [l for l in self.levels if l < level]
+        if finer:
+            source_level = max(finer)
+            source = self.levels[source_level]
+        elif self.full_loader is not None:
+            source_level, source = 0, self.full_loader()
+            self.levels[0] = source
+        else:
+            # 没有更精细的数据可用，退回到最精细的已知层
+            return self.levels[min(self.levels)]
+        if source_level == level:
+            return source
+        factor = 2 ** (level - source_level)
+        size = (max(1, int(math.ceil(source.shape[1] / factor))), max(1, int(math.ceil(source.shape[0] / factor))))
+        self.levels[level] = cv2.resize(source, size, interpolation=cv2.INTER_AREA)
+        return self.levels[level]
+
+    def choose_level(self, scale):
+        """显示比例 scale(屏幕像素/原图像素) 下分辨率足够的最粗一层"""
+        if scale >= 1:
+            return 0
+        return min(self.max_level, int(math.floor(math.log2(1 / scale))))
+
+    def tile(self, level, tx, ty, level_img):
+        key = (self.key, level, tx, ty)
+        qimg = self.tile_cache.get(key)
+        if qimg is None:
+            t = self.tile_size
+            qimg = array_to_qimage(level_img[ty * t:(ty + 1) * t, tx * t:(tx + 1) * t])
+            self.tile_cache.put(key, qimg, qimg.byteCount())
+        return qimg
+
+    def draw(self, painter, viewport):
+        """只绘制视口内可见的分块"""
+        sx, sy, ox, oy = viewport.transform()
+        level = self.choose_level(sx)
+        level_img = self.level_image(level)
+        rx = level_img.shape[1] / self.width
+        ry = level_img.shape[0] / self.height
+        x1, y1, x2, y2 = viewport.visible_image_rect()
+        t = self.tile_size
+        tx1, ty1 = int(x1 * rx) // t, int(y1 * ry) // t
+        tx2 = min(int(math.ceil(x2 * rx / t)), int(math.ceil(level_img.shape[1] / t)))
+        ty2 = min(int(math.ceil(y2 * ry / t)), int(math.ceil(level_img.shape[0] / t)))
+
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, sx < 1)
+        for ty in range(ty1, ty2):
+            for tx in range(tx1, tx2):
+                qimg = self.tile(level, tx, ty, level_img)
+                left, top = tx * t / rx, ty * t / ry
+                target = QRectF(left * sx + ox, top * sy + oy, qimg.width() / rx * sx, qimg.height() / ry * sy)
+                painter.drawImage(target, qimg)
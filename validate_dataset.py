@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from annotation_store import find_schema
+from label_io import parse_box_labels, parse_polygon_labels
+from folder_scan import scan_folder, parse_filter
+
+'''
+命令行批量校验数据集标注，不需要打开界面：
+python validate_dataset.py 数据集目录 --format keypoint --recursive --report report.jsonl
+python validate_dataset.py 数据集目录 --format seg --workers 8
+
+关键点标注使用与关键点工具读取标注时相同的规则(label_io.parse_box_labels)，另外检查面积为 0 的边界框
+和落在边界框外的已标注关键点；分割标注使用 label_io.parse_polygon_labels。
+没有同名图片的标注文件记为 orphan。标注文件分块交给进程池校验。
+报告为 JSON Lines：每个问题一行 {"file", "line", "type", "message"}(line 为 0 表示整个文件)，
+最后一行为 {"summary": {...}}。有任何问题时退出码为 1。
+'''
+
+TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+CHUNK_SIZE = 1000  # 每个子进程任务校验的文件数
+BOX_TOLERANCE = 1e-6  # 关键点与边界框比较时的容差(标注按 6 位小数保存)
+
+
+def check_keypoint_labels(text, num_keypoints):
+    """返回 (问题列表, 实例数)"""
+    data, line_nums, issues = parse_box_labels(text, num_keypoints)
+    x_center, y_center, w, h = data[:, 1:5].T
+    for i in np.flatnonzero((w <= 0) | (h <= 0)).tolist():
+        issues.append((int(line_nums[i]), "zero-area", f"边界框面积为 0 - w={w[i]}, h={h[i]}"))
+
+    keypoints = data[:, 5:].reshape(len(data), num_keypoints, 3)
+    x, y = keypoints[:, :, 0], keypoints[:, :, 1]
+    half_w, half_h = (w / 2 + BOX_TOLERANCE)[:, None], (h / 2 + BOX_TOLERANCE)[:, None]
+    outside = (keypoints[:, :, 2] > 0) & ((np.abs(x - x_center[:, None]) > half_w) |
+                                          (np.abs(y - y_center[:, None]) > half_h))
+    for i, k in zip(*np.nonzero(outside)):
+        issues.append((int(line_nums[i]), "keypoint-outside-box",
+                       f"关键点{k + 1}在边界框外 - ({x[i, k]:.6f}, {y[i, k]:.6f})"))
+    return issues, len(data)
+
+
+def validate_files(folder, label_format, num_keypoints, paths):
+    """在子进程中校验一批标注文件，返回 (问题记录列表, 实例数)"""
+    records, instances = [], 0
+    for rel in paths:
+        try:
+            with open(os.path.join(folder, rel), "r", encoding="utf-8") as f:
+                text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            records.append({"file": rel, "line": 0, "type": "read-error", "message": str(e)})
+            continue
+        if label_format == "seg":
+            labels, issues = parse_polygon_labels(text)
+            instances += len(labels)
+        else:
+            issues, count = check_keypoint_labels(text, num_keypoints)
+            instances += count
+        records.extend({"file": rel, "line": line, "type": kind, "message": message}
+                       for line, kind, message in sorted(issues))
+    return records, instances
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量校验关键点/分割数据集标注")
+    parser.add_argument("folder", help="数据集目录(图片与同名 .txt 标注在同一目录)")
+    parser.add_argument("--format", choices=["keypoint", "seg"], default="keypoint", help="标注格式")
+    parser.add_argument("--num-keypoints", type=int,
+                        help="关键点数 K，默认从 dataset_schema.json 读取(与关键点工具相同)")
+    parser.add_argument("--recursive", action="store_true", help="包含子文件夹")
+    parser.add_argument("--filter", default="", help="图片过滤模式，如 \"cam1/* !*_bak*\"(见 folder_scan.py)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="进程数")
+    parser.add_argument("--report", default="validation_report.jsonl", help="报告文件(JSON Lines)")
+    args = parser.parse_args()
+
+    num_keypoints = args.num_keypoints
+    if args.format == "keypoint" and num_keypoints is None:
+        try:
+            num_keypoints = find_schema(args.folder, TOOL_DIR).num_keypoints
+        except (OSError, ValueError) as e:
+            print(f"读取数据集配置失败: {e}")
+            return 2
+
+    start = time.perf_counter()
+    include, exclude = parse_filter(args.filter)
+    images, labels = scan_folder(args.folder, IMAGE_EXTENSIONS, args.recursive, include, exclude)
+    image_stems = {os.path.splitext(name)[0] for name in images}
+    label_files = sorted(stem + ".txt" for stem in labels if stem in image_stems)
+    orphans = sorted(stem + ".txt" for stem in labels if stem not in image_stems)
+    scan_time = time.perf_counter() - start
+
+    counts = {}
+    bad_files = set()
+    instances = 0
+    with open(args.report, "w", encoding="utf-8") as report:
+        def write(record):
+            report.write(json.dumps(record, ensure_ascii=False) + "\n")
+            counts[record["type"]] = counts.get(record["type"], 0) + 1
+            bad_files.add(record["file"])
+
+        for rel in orphans:
+            write({"file": rel, "line": 0, "type": "orphan", "message": "没有同名图片"})
+        chunks = [label_files[i:i + CHUNK_SIZE] for i in range(0, len(label_files), CHUNK_SIZE)]
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            for records, count in executor.map(
+                    partial(validate_files, args.folder, args.format, num_keypoints), chunks):
+                instances += count
+                for record in records:
+                    write(record)
+
+        elapsed = time.perf_counter() - start
+        summary = {"folder": args.folder, "format": args.format, "num_keypoints": num_keypoints,
+                   "images": len(images), "label_files": len(label_files),
+                   "unlabeled_images": len(image_stems) - len(label_files), "orphan_labels": len(orphans),
+                   "instances": instances, "files_with_issues": len(bad_files), "issues": counts,
+                   "seconds": round(elapsed, 2)}
+        report.write(json.dumps({"summary": summary}, ensure_ascii=False) + "\n")
+
+    print(f"{len(images)} 张图片, {len(label_files)} 个标注文件, {instances} 个实例, "
+          f"扫描 {scan_time:.1f} s, 共 {elapsed:.1f} s ({len(label_files) / max(elapsed, 1e-9):.0f} 个文件/s)")
+    for kind, count in sorted(counts.items()):
+        print(f"  {kind}: {count}")
+    print(f"{len(bad_files)} 个文件有问题, 报告已写入 {args.report}")
+    return 1 if counts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,23 @@
 import sys
 import cv2
 import os
+import math
+import bisect
+import time
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QLabel, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QSlider, QFileDialog, QWidget, QSizePolicy, QScrollArea, QMessageBox, QButtonGroup)
-from PyQt5.QtCore import Qt, QTimer
-from PyQt5.QtGui import QImage, QPixmap, QPainter
+                             QFileDialog, QWidget, QSizePolicy, QScrollArea, QMessageBox, QButtonGroup)
+from PyQt5.QtCore import Qt, QTimer, QRect, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QImageReader, QImageIOHandler
+from polygon_tools import postprocess_polygon
+from label_io import parse_polygon_labels, format_polygon_line
+from label_writer import AtomicLabelWriter, write_atomic
+from image_cache import LRUCache, Prefetcher
+from tile_pyramid import Viewport, TilePyramid
+from dataset_index import DatasetIndex, UNLABELED
+from folder_scan import scan_folder
+from label_cache import LabelCache
 
 '''
 根据自己显示屏的分辨率，在 setFixedSize 处调节合适的窗口大小
@@ -13,7 +25,133 @@ from PyQt5.QtGui import QImage, QPixmap, QPainter
 个别有误的图片挑选出来，重新放到一个文件夹，再次标注
 '''
 
+def fit_size(img_width, img_height, label_width, label_height):
+    """保持宽高比缩放到显示区域内，返回 (缩放比例, (宽, 高))"""
+    scale = min(label_width / img_width, label_height / img_height)
+    return scale, (int(img_width * scale), int(img_height * scale))
+
+
+REDUCED_DECODE_FLAGS = [(8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                        (2, cv2.IMREAD_REDUCED_COLOR_2), (1, cv2.IMREAD_COLOR)]
+
+
+def decode_image(img_path, flags=cv2.IMREAD_COLOR):
+    try:
+        return cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), flags)
+    except OSError:
+        return None
+
+
+def decode_for_display(img_path, label_width, label_height):
+    """按显示尺寸解码图片，返回 (解码图, RGB 显示图, 原图尺寸(宽, 高), 缩小倍数)；可在后台预取线程中调用
+
+    大图只需要显示分辨率，用 IMREAD_REDUCED_COLOR_2/4/8 直接解码出缩小的图，
+    原图尺寸从文件头读取，保证标注坐标仍按真实尺寸归一化。
+    OpenCV 解码时按 EXIF 方向旋转，文件头里的尺寸没有旋转，方向为 90/270 度时交换宽高，与全分辨率解码一致
+    """
+    reader = QImageReader(img_path)
+    header_size = reader.size()
+    if header_size.isValid() and reader.transformation() & QImageIOHandler.TransformationRotate90:
+        header_size.transpose()
+    reduction, flags = 1, cv2.IMREAD_COLOR
+    if header_size.isValid():
+        scale, _ = fit_size(header_size.width(), header_size.height(), label_width, label_height)
+        reduction, flags = next((k, f) for k, f in REDUCED_DECODE_FLAGS if k == 1 or k * scale <= 1)
+    img = decode_image(img_path, flags)
+    if img is None:
+        return None
+    if reduction == 1 or not header_size.isValid():
+        img_size = (img.shape[1], img.shape[0])
+    else:
+        img_size = (header_size.width(), header_size.height())
+        # 缩小解码的尺寸是原图尺寸除以倍数后取整(JPEG 向上，其他格式向下)；
+        # 对不上时(方向信息读取不一致)以解码结果为准
+        if (abs(img_size[0] - img.shape[1] * reduction) >= reduction or
+                abs(img_size[1] - img.shape[0] * reduction) >= reduction):
+            img_size = (img.shape[1] * reduction, img.shape[0] * reduction)
+    _, size = fit_size(img_size[0], img_size[1], label_width, label_height)
+    return img, to_display_rgb(img, size), img_size, reduction
+
+
+def to_display_rgb(img, size):
+    """缩放并转成 RGB，QImage 可以直接引用这块内存而不用再 rgbSwapped 复制"""
+    return cv2.cvtColor(cv2.resize(img, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2RGB)
+
+
+class StrokeRasterizer:
+    """增量笔画光栅化：每个鼠标事件只画上一点到当前点的线段，并记录整条笔画的包围盒"""
+
+    def __init__(self, canvas, color, radius):
+        self.canvas = canvas
+        self.color = color
+        self.radius = max(0, radius)
+        self.last_point = None
+        self.bbox = None  # 整条笔画覆盖的区域 (x1, y1, x2, y2)
+
+    def touched_rect(self, p1, p2):
+        r = self.radius + 1
+        return (min(p1[0], p2[0]) - r, min(p1[1], p2[1]) - r,
+                max(p1[0], p2[0]) + r + 1, max(p1[1], p2[1]) + r + 1)
+
+    def add_point(self, point):
+        """光栅化新增的一段，返回本次改动的区域"""
+        start = self.last_point if self.last_point is not None else point
+        # OpenCV 粗线两端是圆头，一条线段就等价于沿途逐点画圆
+        cv2.line(self.canvas, start, point, self.color, 2 * self.radius + 1)
+        self.last_point = point
+        rect = self.touched_rect(start, point)
+        if self.bbox is None:
+            self.bbox = rect
+        else:
+            self.bbox = (min(self.bbox[0], rect[0]), min(self.bbox[1], rect[1]),
+                         max(self.bbox[2], rect[2]), max(self.bbox[3], rect[3]))
+        return rect
+
+
+class OverlayLayer:
+    """标注叠加层：原图分辨率的单通道类别索引掩码 + 显示分辨率的 ARGB 预览缓存"""
+
+    def __init__(self, height, width, color_lut):
+        self.mask = np.zeros((height, width), dtype=np.uint8)  # 0 表示未标注，否则为类别索引+1
+        self.color_lut = color_lut  # 类别索引+1 -> BGRA 颜色
+        self.preview = None  # 显示分辨率的 BGRA 缓存，与 preview_qimg 共享内存
+        self.preview_qimg = None
+        self.preview_index = None  # 缩小后的类别索引，重建预览时复用
+        self.buffer_allocs = 0  # 分配显示尺寸缓冲区的次数
+
+    def rebuild_preview(self, src_rect, width, height):
+        """显示尺寸或视口变化时才从原图分辨率的掩码重建预览，src_rect 为可见的掩码区域 (x1, y1, x2, y2)"""
+        if self.preview is None or self.preview.shape[:2] != (height, width):
+            self.preview = np.zeros((height, width, 4), dtype=np.uint8)
+            self.preview_index = np.zeros((height, width), dtype=np.uint8)
+            self.preview_qimg = QImage(self.preview.data, width, height, 4 * width,
+                                       QImage.Format_ARGB32_Premultiplied)
+            self.buffer_allocs += 1
+        # 尺寸不变时原地更新，preview_qimg 始终引用同一块内存
+        x1, y1, x2, y2 = src_rect
+        cv2.resize(self.mask[y1:y2, x1:x2], (width, height), dst=self.preview_index,
+                   interpolation=cv2.INTER_NEAREST)
+        # 索引复制到 4 个通道再逐通道查表，全程写入已有缓冲区(np.take/花式索引都会分配整帧临时数组)
+        cv2.merge([self.preview_index] * 4, dst=self.preview)
+        cv2.LUT(self.preview, self.color_lut.reshape(256, 1, 4), dst=self.preview)
+
+    def begin_stroke(self, class_id, mask_radius, preview_radius):
+        """同一笔画同时画进原图掩码和显示预览，刷新时不再需要缩放原图分辨率的数据"""
+        value = class_id + 1
+        return (StrokeRasterizer(self.mask, value, mask_radius),
+                StrokeRasterizer(self.preview, tuple(int(c) for c in self.color_lut[value]), preview_radius))
+
+    def clear(self):
+        self.mask[:] = 0
+        if self.preview is not None:
+            self.preview[:] = 0
+
+
 class ImageLabel(QLabel):
+    frameRendered = pyqtSignal(float)  # 每次实际重绘后发出本帧耗时(ms)
+    contourSaved = pyqtSignal(int, int)  # 每个笔画写入时发出简化前后的顶点数
+    smoothScaled = pyqtSignal(object, object)  # 后台高质量缩放完成: ((图片路径, 尺寸), 显示图)
+
     def __init__(self):
         super().__init__()
         self.setScaledContents(False)
@@ -23,113 +161,338 @@ class ImageLabel(QLabel):
         self.mask_color = (0, 0, 255)
         self.contour_points = []
         self.contour_id = 0
-        self.img = None
+        self.stroke = None
+        # 写入前的多边形后处理：Douglas-Peucker 容差(原图像素)，顶点预算(0 表示不限制)
+        self.simplify_tolerance = 1.0
+        self.max_vertices = 0
+        self.img = None  # 解码出的图，大图可能是按 img_reduction 缩小解码的
+        self.img_size = None  # 原图尺寸(宽, 高)，标注坐标按它归一化
+        self.img_reduction = 1
+        self.full_img = None  # 原分辨率图，只有确实需要时才解码
         self.scaled_img = None
         self.txt_file_path = None
-        self.overlay = None
-        self.scale_factor = 1.0
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.update_display)
-        self.timer.start(30)
-
-    def set_image(self, img_path):
+        # 标注行保存在内存中，只有改动过(labels_dirty)才交给后台线程原子写入
+        self.label_lines = []
+        self.labels_dirty = False
+        self.label_writer = None  # AtomicLabelWriter，由 MainWindow 设置
+        self.overlay = None  # OverlayLayer
+        self.overlay_opacity = 0.6
+        self.color_lut = np.zeros((256, 4), dtype=np.uint8)
+        self.scale_factor = 1.0  # 当前显示比例(屏幕像素/原图像素)
+        # 可缩放平移的视口：适应窗口时直接画预缩放的显示图，放大后只画可见的金字塔分块
+        self.viewport = Viewport()
+        self.pyramid = None
+        self.tile_cache = LRUCache(256 * 1024 * 1024)
+        self.preview_rect = (0, 0, 0, 0)  # 叠加层预览在控件中的位置 (x, y, w, h)
+        self.pan_pos = None
+        # 拖动窗口边缘时先用最近邻快速缩放，停止 150 ms 后再在后台线程做一次 INTER_AREA 高质量缩放
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(150)
+        self.resize_timer.timeout.connect(self.start_smooth_rescale)
+        self.rescale_executor = ThreadPoolExecutor(max_workers=1)
+        self.scaled_is_fast = False  # 当前显示图是否是快速缩放的
+        self.smoothScaled.connect(self.apply_smooth_rescale)
+        # 事件驱动重绘：只有笔画、缩放、加载图片、重置之后才标记脏区域并重绘，空闲时不做任何工作
+        self.display_qimg = None  # 适应窗口时的底图，直接引用 scaled_img(RGB) 的内存
+        self.buffer_allocs = 0  # 分配显示尺寸缓冲区的次数，稳定状态下的刷新不应增加
+        self.dirty_rect = None  # 待重绘区域(预览坐标 x1, y1, x2, y2)
+        self.full_redraw = False
+        self.render_pending = False
+        # 帧时间统计，用于确认空闲时没有重绘；一帧 = update_display 中重建预览 + paintEvent 实际绘制
+        self.frame_count = 0
+        self.frame_time_total = 0.0
+        self.last_frame_time = 0.0
+        self.prepare_time = 0.0  # 还没绘制出来的预览重建耗时(ms)，计入下一次 paintEvent
+
+    def set_image(self, img_path, decoded=None):
+        """decoded 为 decode_for_display 预取好的结果，为 None 时在当前线程解码"""
         img_path = img_path.replace('\\', '/')
         self.img_path = img_path
         if not os.path.exists(img_path):
             print(f"File does not exist: {img_path}")
             return
-        self.img = cv2.imdecode(np.fromfile(img_path, dtype=np.uint8), cv2.IMREAD_COLOR)
-        if self.img is None:
+        if decoded is None:
+            decoded = decode_for_display(img_path, self.width(), self.height())
+        if decoded is None:
             print(f"Error: Cannot read image from {img_path}")
             return
-        self.overlay = self.img.copy()
+        self.img, scaled_img, self.img_size, self.img_reduction = decoded
+        self.full_img = None
+        self.viewport.set_image_size(*self.img_size)
+        self.pyramid = TilePyramid(img_path, self.img_size[0], self.img_size[1], self.tile_cache, self.full_image)
+        self.pyramid.set_level_image(self.img_reduction.bit_length() - 1, self.img)
+        self.flush_labels()
+        self.overlay = OverlayLayer(self.img_size[1], self.img_size[0], self.color_lut)
         self.txt_file_path = os.path.splitext(img_path)[0] + '.txt'
-        with open(self.txt_file_path, 'w') as f:
-            pass
-        self.update_image()
+        # update_image 只标记重绘，预览在下一轮事件循环才从掩码重建，所以先算出缩放比例再画已有标注
+        self.update_image(scaled_img)
+        self.load_labels()
+
+    def load_labels(self):
+        """读取已有的 YOLO 分割标注并画进叠加层，不修改文件"""
+        self.label_lines = []
+        self.labels_dirty = False
+        # 很快切走又切回来时，这张图片的标注可能还在后台排队，比磁盘上的新
+        text = self.label_writer.pending_text(self.txt_file_path) if self.label_writer is not None else None
+        if text is None:
+            if not os.path.exists(self.txt_file_path):
+                return
+            try:
+                with open(self.txt_file_path, 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                print(f"Error: Cannot read labels from {self.txt_file_path}: {e}")
+                return
+        self.label_lines = [line + '\n' for line in text.splitlines() if line.strip()]
+
+        labels, issues = parse_polygon_labels(text)
+        skip = set()
+        for line_num, kind, message in issues:
+            if kind in ("parse", "class"):
+                print(f"Warning: Invalid label line {line_num} in {self.txt_file_path}: {message}")
+                skip.add(line_num)
+        width, height = self.img_size
+        thickness = 2 * int(self.brush_size / self.scale_factor) + 1
+        for line_num, (class_id, points) in zip(labels.line_nums.tolist(), labels):
+            if line_num not in skip:
+                points = (points * (width, height)).astype(np.int32)
+                cv2.polylines(self.overlay.mask, [points], True, int(class_id) + 1, thickness)
+
+    def flush_labels(self):
+        """有改动时把当前图片的标注交给后台线程写入"""
+        if self.labels_dirty and self.txt_file_path:
+            text = ''.join(self.label_lines)
+            if self.label_writer is not None:
+                self.label_writer.submit(self.txt_file_path, text)
+            else:
+                write_atomic(self.txt_file_path, text)
+            self.labels_dirty = False
 
-    def update_image(self):
+    def update_image(self, scaled_img=None, fast=False):
+        """scaled_img 为预先缩放好的显示图，尺寸与当前窗口不符时重新缩放；fast 时用最近邻快速缩放"""
         if self.img is not None:
-            self.scaled_img = self.scale_image(self.img)
-            self.update_display()
-
-    def scale_image(self, image):
-        label_width = self.width()
-        label_height = self.height()
-        img_height, img_width = image.shape[:2]
-        self.scale_factor = min(label_width / img_width, label_height / img_height)
-        new_width = int(img_width * self.scale_factor)
-        new_height = int(img_height * self.scale_factor)
-        scaled_img = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_AREA)
-        return scaled_img
+            self.viewport.set_view_size(self.width(), self.height())
+            self.scale_factor, size = fit_size(self.img_size[0], self.img_size[1], self.width(), self.height())
+            if scaled_img is None:
+                scaled_img = self.scaled_img
+            if scaled_img is None or (scaled_img.shape[1], scaled_img.shape[0]) != size:
+                if fast:
+                    scaled_img = cv2.cvtColor(cv2.resize(self.img, size, interpolation=cv2.INTER_NEAREST),
+                                              cv2.COLOR_BGR2RGB)
+                else:
+                    scaled_img = to_display_rgb(self.display_source(size), size)
+                self.scaled_is_fast = fast
+            elif scaled_img is not self.scaled_img:
+                self.scaled_is_fast = False
+            if scaled_img is not self.scaled_img:
+                # QImage 不复制数据，scaled_img 和 display_qimg 总是一起替换，保证内存在使用期间有效
+                self.scaled_img = scaled_img
+                self.display_qimg = QImage(scaled_img.data, size[0], size[1], 3 * size[0], QImage.Format_RGB888)
+                self.buffer_allocs += 1
+            self.mark_dirty()
+
+    def display_source(self, size):
+        # 窗口放大到超过缩小解码的分辨率时才需要原分辨率图
+        if self.img.shape[1] < size[0] or self.img.shape[0] < size[1]:
+            return self.full_image()
+        return self.img
+
+    def start_smooth_rescale(self):
+        if self.img is None or not self.scaled_is_fast:
+            return
+        _, size = fit_size(self.img_size[0], self.img_size[1], self.width(), self.height())
+        source = self.display_source(size)
+        key = (self.img_path, size)
+        self.rescale_executor.submit(lambda: self.smoothScaled.emit(key, to_display_rgb(source, size)))
+
+    def apply_smooth_rescale(self, key, scaled_img):
+        # 期间换了图片或又改变了窗口尺寸时丢弃结果
+        if self.img is None or key != (self.img_path, (scaled_img.shape[1], scaled_img.shape[0])):
+            return
+        _, size = fit_size(self.img_size[0], self.img_size[1], self.width(), self.height())
+        if size == key[1]:
+            self.update_image(scaled_img)
+
+    def set_class_color(self, class_id, color):
+        b, g, r = color
+        self.color_lut[class_id + 1] = (b, g, r, 255)
+
+    def full_image(self):
+        """按需解码原分辨率图(例如精确取色、导出掩码)"""
+        if self.img_reduction == 1:
+            return self.img
+        if self.full_img is None:
+            self.full_img = decode_image(self.img_path)
+            if self.full_img is None:
+                return self.img
+        return self.full_img
+
+    def mark_dirty(self, rect=None):
+        """标记需要重绘的区域(预览坐标 x1, y1, x2, y2)，rect 为 None 时整幅重绘"""
+        if rect is None:
+            self.full_redraw = True
+        elif self.dirty_rect is None:
+            self.dirty_rect = rect
+        else:
+            x1, y1, x2, y2 = self.dirty_rect
+            self.dirty_rect = (min(x1, rect[0]), min(y1, rect[1]), max(x2, rect[2]), max(y2, rect[3]))
+        # 同一轮事件循环内的多次标记合并为一次重绘
+        if not self.render_pending:
+            self.render_pending = True
+            QTimer.singleShot(0, self.update_display)
+
+    def to_display_point(self, point):
+        """原图坐标 -> 叠加层预览坐标"""
+        x, y = self.viewport.image_to_widget(point[0], point[1])
+        return int(x - self.preview_rect[0]), int(y - self.preview_rect[1])
+
+    def rebuild_view(self):
+        """视口变化后重建底图和叠加层预览；预览只覆盖可见的、按整像素对齐的原图区域"""
+        sx, sy, _, _ = self.viewport.transform()
+        self.scale_factor = sx
+        x1, y1, x2, y2 = self.viewport.visible_image_rect()
+        src_rect = (int(x1), int(y1), int(math.ceil(x2)), int(math.ceil(y2)))
+        wx1, wy1 = self.viewport.image_to_widget(src_rect[0], src_rect[1])
+        wx2, wy2 = self.viewport.image_to_widget(src_rect[2], src_rect[3])
+        wx1, wy1 = int(round(wx1)), int(round(wy1))
+        width, height = max(1, int(round(wx2)) - wx1), max(1, int(round(wy2)) - wy1)
+        self.preview_rect = (wx1, wy1, width, height)
+        self.overlay.rebuild_preview(src_rect, width, height)
 
     def update_display(self):
-        if self.scaled_img is not None:
-            display_img = self.scaled_img.copy()
-            overlay_scaled = self.scale_image(self.overlay)
-            height, width, channel = display_img.shape
-            bytes_per_line = 3 * width
-            q_img = QImage(display_img.data, width, height, bytes_per_line, QImage.Format_RGB888).rgbSwapped()
-            q_overlay = QImage(overlay_scaled.data, overlay_scaled.shape[1], overlay_scaled.shape[0],
-                                bytes_per_line, QImage.Format_RGB888).rgbSwapped()
-            painter = QPainter()
-            painter.begin(q_img)
-            painter.drawImage(0, 0, q_overlay)
-            painter.end()
-            self.setPixmap(QPixmap.fromImage(q_img))
-            self.setAlignment(Qt.AlignCenter)
+        self.render_pending = False
+        if self.img is None or self.scaled_img is None or (not self.full_redraw and self.dirty_rect is None):
+            return
+        start = time.perf_counter()
+        if self.full_redraw or self.overlay.preview is None:
+            self.rebuild_view()
+            self.update()
+        else:
+            # 笔画已经画进显示分辨率的预览，这里只需要让 Qt 重绘变化的区域
+            offset_x, offset_y, width, height = self.preview_rect
+            dx1, dy1, dx2, dy2 = self.dirty_rect
+            dx1, dy1 = max(0, dx1), max(0, dy1)
+            dx2, dy2 = min(width, dx2), min(height, dy2)
+            if dx2 > dx1 and dy2 > dy1:
+                self.update(QRect(offset_x + dx1, offset_y + dy1, dx2 - dx1, dy2 - dy1))
+        self.full_redraw = False
+        self.dirty_rect = None
+        self.prepare_time += (time.perf_counter() - start) * 1000
+
+    def frame_stats(self):
+        avg = self.frame_time_total / self.frame_count if self.frame_count else 0.0
+        return (f"渲染: {self.frame_count} 帧, 上一帧 {self.last_frame_time:.1f} ms, 平均 {avg:.1f} ms, "
+                f"缓冲分配 {self.allocation_count()} 次")
+
+    def allocation_count(self):
+        overlay_allocs = self.overlay.buffer_allocs if self.overlay is not None else 0
+        return self.buffer_allocs + overlay_allocs
+
+    def paintEvent(self, event):
+        if self.img is None or self.overlay.preview_qimg is None:
+            super().paintEvent(event)
+            return
+        start = time.perf_counter()
+        painter = QPainter(self)
+        if self.viewport.is_fit() and self.display_qimg is not None:
+            _, _, offset_x, offset_y = self.viewport.transform()
+            painter.drawImage(offset_x, offset_y, self.display_qimg)
+        else:
+            self.pyramid.draw(painter, self.viewport)
+        painter.setOpacity(self.overlay_opacity)
+        painter.drawImage(self.preview_rect[0], self.preview_rect[1], self.overlay.preview_qimg)
+        painter.end()
+
+        self.last_frame_time = self.prepare_time + (time.perf_counter() - start) * 1000
+        self.prepare_time = 0.0
+        self.frame_count += 1
+        self.frame_time_total += self.last_frame_time
+        self.frameRendered.emit(self.last_frame_time)
 
     def save_contour_to_file(self):
-        height, width = self.img.shape[:2]
-        with open(self.txt_file_path, 'a') as f:
-            f.write(f"{self.contour_id} " + " ".join(
-                [f"{x / width:.6f} {y / height:.6f}" for x, y in self.contour_points]) + "\n")
+        width, height = self.img_size
+        points = postprocess_polygon(self.contour_points, self.simplify_tolerance, self.max_vertices)
+        self.label_lines.append(format_polygon_line(self.contour_id, points, width, height))
+        self.labels_dirty = True
+        self.contourSaved.emit(len(self.contour_points), len(points))
 
     def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.LeftButton and self.img is not None:
             self.drawing = True
             self.contour_points = [self.convert_to_original_coords(event.pos())]
+            self.stroke = self.overlay.begin_stroke(self.contour_id, int(self.brush_size / self.scale_factor),
+                                                    self.brush_size)
+            self.draw_points()
+        elif event.button() == Qt.MiddleButton:
+            # 中键拖动平移
+            self.pan_pos = event.pos()
 
     def mouseMoveEvent(self, event):
         if self.drawing:
             point = self.convert_to_original_coords(event.pos())
             self.contour_points.append(point)
             self.draw_points()
+        elif self.pan_pos is not None:
+            delta = event.pos() - self.pan_pos
+            self.pan_pos = event.pos()
+            self.viewport.pan(delta.x(), delta.y())
+            self.mark_dirty()
 
     def mouseReleaseEvent(self, event):
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.LeftButton and self.drawing:
             self.drawing = False
+            self.stroke = None
             self.save_contour_to_file()
+        elif event.button() == Qt.MiddleButton:
+            self.pan_pos = None
+
+    def mouseDoubleClickEvent(self, event):
+        # 双击中键恢复适应窗口
+        if event.button() == Qt.MiddleButton and self.img is not None:
+            self.viewport.reset()
+            self.mark_dirty()
+        else:
+            super().mouseDoubleClickEvent(event)
+
+    def wheelEvent(self, event):
+        # 滚轮以鼠标位置为中心缩放
+        if self.img is None or self.drawing:
+            return
+        self.viewport.zoom_at(event.pos().x(), event.pos().y(), 1.25 ** (event.angleDelta().y() / 120))
+        self.mark_dirty()
 
     def convert_to_original_coords(self, point):
-        if self.scaled_img is not None:
-            scaled_height, scaled_width = self.scaled_img.shape[:2]
-            scale_x = self.img.shape[1] / scaled_width
-            scale_y = self.img.shape[0] / scaled_height
-            offset_x = (self.width() - scaled_width) / 2
-            offset_y = (self.height() - scaled_height) / 2
-            orig_x = (point.x() - offset_x) * scale_x
-            orig_y = (point.y() - offset_y) * scale_y
+        if self.img is not None:
+            orig_x, orig_y = self.viewport.widget_to_image(point.x(), point.y())
             return int(orig_x), int(orig_y)
         return point.x(), point.y()
 
     def draw_points(self):
-        for point in self.contour_points:
-            cv2.circle(self.overlay, point, int(self.brush_size / self.scale_factor), self.mask_color, -1)
+        # 只光栅化最新的一段，显示刷新也只缩放这一段覆盖的区域
+        if self.stroke is not None and self.contour_points:
+            mask_stroke, preview_stroke = self.stroke
+            point = self.contour_points[-1]
+            mask_stroke.add_point(point)
+            self.mark_dirty(preview_stroke.add_point(self.to_display_point(point)))
 
     def resizeEvent(self, event):
-        self.update_image()
+        self.update_image(fast=True)
+        self.resize_timer.start()
         super().resizeEvent(event)
 
     def reset_annotation(self):
         if self.img is not None:
-            self.overlay = self.img.copy()
-            with open(self.txt_file_path, 'w') as f:
-                pass
+            self.overlay.clear()
+            if self.label_lines:
+                self.label_lines = []
+                self.labels_dirty = True
             self.update_image()
 
 
 class MainWindow(QMainWindow):
+    saveFailed = pyqtSignal(str, str)  # 后台写入标注失败: (路径, 错误信息)
+
     def __init__(self):
         super().__init__()
         # self.setFixedSize(int(1920), int(1080))  # 窗口大小放大1.5倍
@@ -137,8 +500,26 @@ class MainWindow(QMainWindow):
         self.setFixedSize(int(1724), int(2500))  # 窗口大小放大1.5倍
 
         self.image_label = ImageLabel()
+        self.label_writer = AtomicLabelWriter(on_error=lambda path, e: self.saveFailed.emit(path, str(e)))
+        self.image_label.label_writer = self.label_writer
+        self.saveFailed.connect(self.on_save_failed)
+        # 编辑后空闲一段时间自动写入，防止崩溃丢失
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.setInterval(2000)
+        self.autosave_timer.timeout.connect(self.flush_labels)
         self.image_paths = []
         self.current_image_index = 0
+        self.dataset_index = None  # 文件夹下的 SQLite 索引：标注状态，跳到下一张未标注的图片
+
+        # 后台解码前后的图片，结果(原图 + 缩放好的显示图)放进按字节预算淘汰的 LRU 缓存
+        self.prefetch_next = 3
+        self.prefetch_prev = 1
+        self.image_cache = LRUCache(1024 * 1024 * 1024)
+        self.prefetcher = Prefetcher(self.image_cache, decode_for_display,
+                                     lambda decoded: decoded[0].nbytes + decoded[1].nbytes)
+        self.cache_stats_label = QLabel(self.image_cache.stats_text())
+        self.statusBar().addPermanentWidget(self.cache_stats_label)
 
         scroll_area = QScrollArea()
         scroll_area.setWidget(self.image_label)
@@ -147,6 +528,11 @@ class MainWindow(QMainWindow):
         self.image_name_label = QLabel("图片: ")
         self.image_name_label.setAlignment(Qt.AlignCenter)
 
+        # 帧时间计数，空闲时帧数不再增长
+        self.render_stats_label = QLabel(self.image_label.frame_stats())
+        self.image_label.frameRendered.connect(self.update_render_stats)
+        self.image_label.contourSaved.connect(self.report_vertex_reduction)
+
         # 标签按钮布局
         self.tag_buttons_layout = QHBoxLayout()
         self.create_tag_buttons()
@@ -160,6 +546,9 @@ class MainWindow(QMainWindow):
         next_button = QPushButton("下一张")
         next_button.clicked.connect(self.show_next_image)
 
+        next_unlabeled_button = QPushButton("下一张未标注")
+        next_unlabeled_button.clicked.connect(self.show_next_unlabeled_image)
+
         reset_button = QPushButton("重置")
         reset_button.clicked.connect(self.reset_current_image)
 
@@ -168,7 +557,9 @@ class MainWindow(QMainWindow):
         controls_layout.addWidget(open_folder_button)
         controls_layout.addWidget(prev_button)
         controls_layout.addWidget(next_button)
+        controls_layout.addWidget(next_unlabeled_button)
         controls_layout.addWidget(reset_button)
+        controls_layout.addWidget(self.render_stats_label)
 
         layout = QVBoxLayout()
         layout.addWidget(self.image_name_label)
@@ -214,12 +605,20 @@ class MainWindow(QMainWindow):
             button.setCheckable(True)
             button.clicked.connect(lambda _, index=idx, col=color: self.set_tag(index, col))  # 改为 col=color
             self.button_group.addButton(button, idx)
+            self.image_label.set_class_color(idx, color)
             self.tag_buttons_layout.addWidget(button)
 
         # 默认选择第一个标签
         self.button_group.buttons()[0].setChecked(True)
         self.set_tag(0, self.labels[0][1])
 
+    def update_render_stats(self, frame_time):
+        self.render_stats_label.setText(self.image_label.frame_stats())
+
+    def report_vertex_reduction(self, before, after):
+        self.statusBar().showMessage(f"本次笔画顶点: {before} -> {after}", 5000)
+        self.autosave_timer.start()
+
     def set_tag(self, index, color):
         self.image_label.contour_id = index
         self.image_label.mask_color = color
@@ -228,25 +627,77 @@ class MainWindow(QMainWindow):
         folder_path = QFileDialog.getExistingDirectory(self, "打开图片文件夹", "")
         if folder_path:
             folder_path = folder_path.replace('\\', '/')
-            self.image_paths = sorted(
-                [os.path.join(folder_path, f).replace('\\', '/') for f in os.listdir(folder_path)
-                 if f.lower().endswith(('.png', '.jpg', '.bmp'))]
-            )
+            self.flush_labels()
+            # 文件列表和标注状态来自数据集索引，再次打开时只重新读取变化过的标注文件
+            if self.dataset_index is not None:
+                self.dataset_index.close()
+            self.dataset_index = DatasetIndex(folder_path)
+            images, labels = scan_folder(folder_path, ('.png', '.jpg', '.bmp'))
+            label_cache = LabelCache(folder_path)
+            label_cache.update(labels)
+            self.dataset_index.refresh(images, labels, label_cache)
+            self.image_paths = [folder_path + '/' + name for name in self.dataset_index.names()]
             self.current_image_index = 0
+            unlabeled = self.dataset_index.counts().get(UNLABELED, 0)
+            polygons = label_cache.summary("seg")["instances"]
+            self.statusBar().showMessage(f"共 {len(self.image_paths)} 张图片，未标注 {unlabeled} 张，多边形 {polygons} 个", 5000)
             if self.image_paths:
                 self.show_image()
 
     def show_image(self):
         if self.image_paths:
             img_path = self.image_paths[self.current_image_index]
-            self.image_label.set_image(img_path)
+            label_size = (self.image_label.width(), self.image_label.height())
+            self.flush_labels()
+            self.image_label.set_image(img_path, self.prefetcher.get(img_path, *label_size))
+            # 解码成功时 set_image 才会切换标注文件
+            if self.dataset_index is None:
+                pass
+            elif self.image_label.txt_file_path == os.path.splitext(img_path)[0] + '.txt':
+                self.dataset_index.set_image_info(os.path.basename(img_path), *self.image_label.img_size)
+            else:
+                self.dataset_index.mark_broken(os.path.basename(img_path))
             self.image_name_label.setText(f"图片: {os.path.basename(img_path)}")
+            self.prefetch_neighbors(label_size)
+            self.cache_stats_label.setText(self.image_cache.stats_text())
+
+    def prefetch_neighbors(self, label_size):
+        count = len(self.image_paths)
+        offsets = list(range(1, self.prefetch_next + 1)) + [-i for i in range(1, self.prefetch_prev + 1)]
+        paths = [self.image_paths[(self.current_image_index + offset) % count] for offset in offsets]
+        self.prefetcher.prefetch(paths, *label_size)
 
     def show_previous_image(self):
         if self.image_paths:
             self.current_image_index = (self.current_image_index - 1) % len(self.image_paths)
             self.show_image()
 
+    def flush_labels(self):
+        """写入当前图片改动过的标注，并更新数据集索引中的标注状态"""
+        dirty = self.image_label.labels_dirty
+        self.image_label.flush_labels()
+        if dirty and self.dataset_index is not None:
+            self.dataset_index.update_label(os.path.basename(self.image_label.img_path),
+                                            len(self.image_label.label_lines))
+
+    def on_save_failed(self, path, error):
+        if path == self.image_label.txt_file_path:
+            self.image_label.labels_dirty = True  # 还在当前图片时，下次保存会重新写入
+        QMessageBox.critical(self, "错误", f"保存标注失败: {path}\n{error}")
+
+    def show_next_unlabeled_image(self):
+        """按文件名顺序跳到当前图片之后第一张未标注的图片(到末尾后从头找)，在数据集索引上查询"""
+        if not self.image_paths or self.dataset_index is None:
+            return
+        self.flush_labels()
+        current = self.image_paths[self.current_image_index]
+        name = self.dataset_index.next_with_status(os.path.basename(current), (UNLABELED,))
+        if name is None or name == os.path.basename(current):
+            self.statusBar().showMessage("没有其他未标注的图片", 3000)
+            return
+        self.current_image_index = bisect.bisect_left(self.image_paths, os.path.dirname(current) + '/' + name)
+        self.show_image()
+
     def show_next_image(self):
         if self.image_paths:
             if self.current_image_index == len(self.image_paths) - 1:
@@ -272,6 +723,18 @@ class MainWindow(QMainWindow):
 
     def reset_current_image(self):
         self.image_label.reset_annotation()
+        self.autosave_timer.start()
+
+    def closeEvent(self, event):
+        self.flush_labels()
+        self.label_writer.close()
+        self.prefetcher.shutdown()
+        # 排队中的高质量缩放不再需要，避免窗口销毁后才发出 smoothScaled
+        self.image_label.rescale_executor.shutdown(wait=False, cancel_futures=True)
+        if self.dataset_index is not None:
+            self.dataset_index.close()
+            self.dataset_index = None
+        event.accept()
 
 
 if __name__ == '__main__':
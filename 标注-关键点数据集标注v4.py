@@ -1,12 +1,103 @@
 import os
 import sys
-import json
+import time
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-                             QLabel, QPushButton, QComboBox, QCheckBox, QScrollArea,
-                             QGroupBox, QFileDialog, QMessageBox, QInputDialog, QDialog,
-                             QShortcut, QListWidget, QListWidgetItem, QLineEdit)
-from PyQt5.QtCore import Qt, QPoint, pyqtSignal, QTimer
-from PyQt5.QtGui import QPixmap, QPainter, QPen, QColor, QCursor, QKeySequence, QFont
+                             QLabel, QPushButton, QComboBox, QFileDialog, QMessageBox, QInputDialog, QDialog,
+                             QShortcut, QTableView, QLineEdit, QTreeView, QHeaderView, QMenu,
+                             QStyledItemDelegate, QCheckBox, QStyle)
+from PyQt5.QtCore import Qt, QPoint, QPointF, QRect, QRectF, QSize, pyqtSignal, QTimer, QRunnable, QThreadPool, QAbstractListModel, QModelIndex
+from PyQt5.QtGui import (QPixmap, QImage, QImageReader, QPainter, QPen, QColor, QKeySequence,
+                         QStandardItemModel, QStandardItem, QStaticText)
+from image_cache import LRUCache
+from label_writer import AtomicLabelWriter, write_atomic
+from file_index import FileIndex
+from tile_pyramid import Viewport, TilePyramid, qimage_to_array
+from spatial_index import SpatialIndex
+from annotation_store import (AnnotationStore, SCHEMA_FILENAME, DEFAULT_SCHEMA, parse_schema, find_schema,
+                              parse_labels)
+from label_io import format_box_labels
+from edit_journal import EditJournal, JOURNAL_FILENAME, read_journal, label_path_of
+from dataset_index import DatasetIndex
+from label_cache import LabelCache, format_summary
+from folder_scan import scan_folder, parse_filter
+
+TOOL_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+LABEL_MIN_BOX = 30  # 显示尺寸小于该像素数的框不画类别名
+KEYPOINT_LABEL_MIN_BOX = 60  # 显示尺寸小于该像素数的框不画关键点序号
+MAX_KEYPOINT_LABELS = 1000  # 同时显示的关键点序号超过该数量时不画序号
+MARKER_HALF = 7  # 关键点标记小图的半边长(直径 10 的圆加 2 像素描边)
+HIGHLIGHT_FILL = QColor(255, 255, 0, 50)  # 高亮框的半透明黄色填充
+KEYPOINT_HIT_RADIUS = 8  # 点选关键点的范围(屏幕像素)
+EDGE_HIT_TOLERANCE = 5  # 点选边界框边的范围(屏幕像素)
+
+
+def read_image(path, max_size=None):
+    """解码图片(可在任意线程调用)，返回 (QImage, 原图尺寸)，失败时 QImage 为 None
+
+    给出 max_size 时直接按比例缩小解码到不超过 max_size，JPEG 会在 DCT 阶段就缩小
+    """
+    reader = QImageReader(path)
+    size = reader.size()
+    if (max_size is not None and size.isValid() and
+            (size.width() > max_size.width() or size.height() > max_size.height())):
+        reader.setScaledSize(size.scaled(max_size, Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return None, size
+    return image, size if size.isValid() else image.size()
+
+
+class ImageLoadTask(QRunnable):
+    """在 QThreadPool 中解码一张图片，完成后调用 callback(key, QImage, 原图尺寸)"""
+
+    def __init__(self, key, max_size, callback):
+        super().__init__()
+        self.key = key
+        self.max_size = max_size
+        self.callback = callback
+
+    def run(self):
+        image, size = read_image(self.key[0], self.max_size)
+        self.callback(self.key, image, size)
+
+
+class FolderScanTask(QRunnable):
+    """在 QThreadPool 中扫描图片文件夹，增量更新标注缓存和数据集索引
+
+    找到的图片分批调用 on_batch(相对路径列表)；结束后调用 on_done(结果)，取消时结果为 None，否则为
+    {"names": 排序后的文件列表, "file_index": FileIndex, "statuses": {文件名: 状态}, "counts": {状态: 张数},
+     "changes": (新增, 变化, 删除)}，耗时的排序和建索引都在后台完成
+    """
+
+    def __init__(self, folder, dataset_index, label_cache, recursive, include, exclude, cancel, on_batch, on_done):
+        super().__init__()
+        self.folder = folder
+        self.dataset_index = dataset_index
+        self.label_cache = label_cache
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.cancel = cancel
+        self.on_batch = on_batch
+        self.on_done = on_done
+
+    def run(self):
+        scanned = scan_folder(self.folder, IMAGE_EXTENSIONS, self.recursive, self.include, self.exclude,
+                              self.cancel, self.on_batch)
+        changes = None
+        if scanned is not None and self.label_cache.update(scanned[1], self.cancel) is not None:
+            changes = self.dataset_index.refresh(*scanned, self.label_cache, cancel=self.cancel)
+        if changes is None:
+            self.on_done(None)
+            return
+        names = self.dataset_index.names()
+        self.on_done({"names": names, "file_index": FileIndex(names), "statuses": self.dataset_index.statuses(),
+                      "counts": self.dataset_index.counts(), "changes": changes})
 
 
 class ImageDisplayWidget(QLabel):
@@ -14,16 +105,23 @@ class ImageDisplayWidget(QLabel):
     mouseClicked = pyqtSignal(QPoint)
     bboxClicked = pyqtSignal(int)  # 新增：点击标注框信号
     rightClicked = pyqtSignal()  # 新增右键点击信号
+    smoothScaled = pyqtSignal(object, object)  # 后台高质量缩放完成: ((图片 cacheKey, 尺寸), QImage)
+    frameRendered = pyqtSignal(float)  # 每次实际重绘后发出本帧耗时(ms)
+    annotationDragged = pyqtSignal(int, object)  # 拖动关键点或边界框结束: (标注序号, 拖动前的标注行)
 
     def __init__(self):
         super().__init__()
         self.setAlignment(Qt.AlignCenter)
-        self.setStyleSheet("background-color: black;")
+        self.setStyleSheet("background-color: black; color: white;")
         self.setMouseTracking(True)
 
         self.image = None
+        self.image_size = None  # 原图尺寸，image 可能是按显示尺寸缩小解码的
+        self.image_path = None
         self.scaled_pixmap = None
-        self.annotations = []
+        self.store = None  # 当前图片的 AnnotationStore
+        self.ann_ids = []  # 显示的标注在 store 中的序号(隐藏的标注不显示)
+        self.annotations = []  # 显示的标注(store 中对应行的视图)
         self.class_names = []
         self.keypoint_names = []
         self.drawing_mode = False
@@ -31,14 +129,173 @@ class ImageDisplayWidget(QLabel):
         self.mouse_pos = None
         self.highlighted_bbox = -1  # 新增：高亮显示的标注框索引
 
-    def set_image(self, pixmap):
+        # 点选用的空间索引在第一次查询时才与标注同步；拖动时标注层不含被拖动的标注，它单独实时绘制
+        self.spatial_index = SpatialIndex()
+        self.index_dirty = True
+        self.drag = None  # (位置, "keypoint", 关键点序号) 或 (位置, "edge", x 方向的边, y 方向的边)
+        self.drag_origin = None
+
+        # 标注层只在标注变化时重画到缓存的 QPixmap 中，鼠标移动时只局部刷新十字准线和橡皮筋矩形；
+        # 高亮的标注不在层里，每帧单独画，换高亮时只重画新旧两个标注所在的区域；
+        # 缩放平移时先把旧标注层按新旧变换拉伸平移后贴上，停止 150 ms 后再重画
+        self.annotation_layer = None
+        self.layer_transform = None  # 标注层绘制时视口的 transform()
+        self.layer_highlighted = -1  # 标注层绘制时排除的高亮标注(在 annotations 中的位置)
+        self.layer_numbers = True  # 标注层是否画了关键点序号(太多时都不画)
+        self.layer_timer = QTimer(self)
+        self.layer_timer.setSingleShot(True)
+        self.layer_timer.setInterval(150)
+        self.layer_timer.timeout.connect(self.invalidate_annotations)
+        self.static_texts = {}
+        self.marker_sprites = {}
+        self.frame_count = 0
+        self.frame_time_total = 0.0
+        self.last_frame_time = 0.0
+
+        # 缩放平移：滚轮缩放，中键拖动平移，双击中键恢复适应窗口
+        self.viewport = Viewport()
+        self.pyramid = None
+        self.pyramid_source = None  # 金字塔第 0 层数组所引用的 QImage
+        self.tile_cache = LRUCache(256 * 1024 * 1024)
+        self.pan_pos = None
+
+        # 拖动窗口边缘时先快速缩放，停止 150 ms 后再在后台线程做一次平滑缩放
+        self.source_qimage = None  # 后台缩放用的 QImage(QPixmap 只能在界面线程使用)
+        self.resize_timer = QTimer(self)
+        self.resize_timer.setSingleShot(True)
+        self.resize_timer.setInterval(150)
+        self.resize_timer.timeout.connect(self.start_smooth_rescale)
+        self.scale_executor = ThreadPoolExecutor(max_workers=1)
+        self.smoothScaled.connect(self.apply_smooth_rescale)
+
+    def set_image(self, pixmap, image_size=None, image_path=None):
         self.image = pixmap
+        self.image_size = image_size or (pixmap.size() if pixmap else None)
+        self.image_path = image_path
+        self.pyramid = None
+        self.pyramid_source = None
+        self.source_qimage = None
+        self.index_dirty = True
+        if pixmap:
+            self.setText("")
+            self.viewport.set_image_size(self.image_size.width(), self.image_size.height())
         self.update_display()
 
-    def set_annotations(self, annotations, class_names, keypoint_names):
-        self.annotations = annotations
+    def is_reduced(self):
+        return self.image_path is not None and self.image.size() != self.image_size
+
+    def get_pyramid(self):
+        """第一次放大时才为当前图片构建分块金字塔"""
+        if self.pyramid is None:
+            # 显示用的图是缩小解码的，放大时才读取原分辨率
+            full = QImage(self.image_path) if self.is_reduced() else QImage()
+            self.pyramid_source, array = qimage_to_array(full if not full.isNull() else self.get_source_qimage())
+            self.pyramid = TilePyramid(self.image.cacheKey(), self.image_size.width(), self.image_size.height(),
+                                       self.tile_cache)
+            self.pyramid.set_level_image(0, array)
+        return self.pyramid
+
+    def set_annotations(self, store, class_names, keypoint_names, ann_ids=None):
+        self.store = store
+        self.ann_ids = list(range(len(store))) if ann_ids is None else ann_ids
+        self.annotations = [store[i] for i in self.ann_ids]
         self.class_names = class_names
         self.keypoint_names = keypoint_names
+        self.index_dirty = True
+        self.drag = None
+        self.invalidate_annotations()
+
+    def get_spatial_index(self):
+        if self.index_dirty:
+            self.spatial_index.sync(self.annotations, self.store.data[self.ann_ids],
+                                    self.image_size.width(), self.image_size.height())
+            self.index_dirty = False
+        return self.spatial_index
+
+    def highlighted_position(self):
+        """高亮的标注在 annotations 中的位置，未显示时为 -1"""
+        try:
+            return self.ann_ids.index(self.highlighted_bbox)
+        except ValueError:
+            return -1
+
+    def hit_test(self, pos):
+        """控件坐标 pos 处的标注：("keypoint", 位置, 关键点序号)、("edge", 位置, x 边, y 边)、("box", 位置) 或 None
+
+        关键点优先于边，边优先于框内部；都按屏幕像素的距离判断，和缩放无关
+        """
+        img_pos = self.get_image_position(pos)
+        if img_pos is None or not self.annotations:
+            return None
+        x, y = img_pos
+        scale = self.viewport.transform()[0]
+        index = self.get_spatial_index()
+        keypoint = index.nearest_keypoint(x, y, KEYPOINT_HIT_RADIUS / scale)
+        if keypoint is not None:
+            return ("keypoint",) + keypoint
+        edge = index.box_edge(x, y, EDGE_HIT_TOLERANCE / scale)
+        if edge is not None:
+            return ("edge",) + edge
+        position = index.smallest_box(x, y)
+        return ("box", position) if position >= 0 else None
+
+    def hover_cursor(self, hit):
+        if hit is None or hit[0] == "box":
+            return Qt.ArrowCursor
+        if hit[0] == "keypoint":
+            return Qt.SizeAllCursor
+        ex, ey = hit[2], hit[3]
+        if ex is None:
+            return Qt.SizeVerCursor
+        if ey is None:
+            return Qt.SizeHorCursor
+        return Qt.SizeFDiagCursor if (ex == 0) == (ey == 1) else Qt.SizeBDiagCursor
+
+    def start_drag(self, hit):
+        self.drag = (hit[1], hit[0]) + hit[2:]
+        self.drag_origin = self.store.data[self.ann_ids[hit[1]]].copy()
+        self.invalidate_annotations()
+
+    def drag_to(self, pos):
+        """把正在拖动的关键点/边移到 pos，关键点限制在边界框内，边不越过对边"""
+        img_w, img_h = self.image_size.width(), self.image_size.height()
+        x, y = self.viewport.widget_to_image(pos.x(), pos.y())
+        x, y = min(max(x, 0.0), float(img_w)), min(max(y, 0.0), float(img_h))
+        ann = self.annotations[self.drag[0]]
+        x_center, y_center, w, h = ann["bbox"]
+        box = [(x_center - w / 2) * img_w, (y_center - h / 2) * img_h,
+               (x_center + w / 2) * img_w, (y_center + h / 2) * img_h]
+        if self.drag[1] == "keypoint":
+            k = self.drag[2]
+            x, y = min(max(x, box[0]), box[2]), min(max(y, box[1]), box[3])
+            ann["keypoints"][k] = (x / img_w, y / img_h, ann["keypoints"][k][2])
+        else:
+            ex, ey = self.drag[2], self.drag[3]
+            if ex is not None:
+                box[ex] = min(x, box[2] - 1) if ex == 0 else max(x, box[0] + 1)
+            if ey is not None:
+                box[ey] = min(y, box[3] - 1) if ey == 1 else max(y, box[1] + 1)
+            ann["bbox"] = [(box[0] + box[2]) / 2 / img_w, (box[1] + box[3]) / 2 / img_h,
+                           (box[2] - box[0]) / img_w, (box[3] - box[1]) / img_h]
+        self.update()
+
+    def finish_drag(self):
+        ann_idx = self.ann_ids[self.drag[0]]
+        origin = self.drag_origin
+        self.drag = None
+        self.drag_origin = None
+        self.index_dirty = True
+        self.invalidate_annotations()
+        if not np.array_equal(self.store.data[ann_idx], origin):
+            self.annotationDragged.emit(ann_idx, origin)
+
+    def invalidate_annotations(self):
+        self.annotation_layer = None
+        self.update()
+
+    def view_changed(self):
+        """缩放或平移：这一帧沿用旧标注层，停下后再按新的缩放重画"""
+        self.layer_timer.start()
         self.update()
 
     def set_drawing_mode(self, enabled):
@@ -56,76 +313,253 @@ class ImageDisplayWidget(QLabel):
     def set_highlighted_bbox(self, index):
         """设置要高亮显示的标注框索引"""
         self.highlighted_bbox = index
-        self.update()
+        if self.annotation_layer is None or self.layer_transform != self.viewport.transform():
+            self.invalidate_annotations()
+            return
+        changed = [p for p in (self.layer_highlighted, self.highlighted_position()) if p >= 0]
+        self.layer_highlighted = self.highlighted_position()
+        if changed:
+            self.redraw_layer_region(self.store.data[[self.ann_ids[p] for p in changed]])
 
     def get_image_position(self, pos):
         if not self.image or not self.scaled_pixmap:
             return None
 
-        label_size = self.size()
-        pixmap_size = self.scaled_pixmap.size()
-        offset_x = (label_size.width() - pixmap_size.width()) // 2
-        offset_y = (label_size.height() - pixmap_size.height()) // 2
+        x, y = self.viewport.widget_to_image(pos.x(), pos.y())
+        if 0 <= x < self.image_size.width() and 0 <= y < self.image_size.height():
+            return (x, y)
+        return None
 
-        img_x = pos.x() - offset_x
-        img_y = pos.y() - offset_y
+    def display_geometry(self):
+        """返回 (offset_x, offset_y, 显示宽, 显示高)：整幅图片在控件中的位置和大小"""
+        sx, sy, offset_x, offset_y = self.viewport.transform()
+        return offset_x, offset_y, self.image_size.width() * sx, self.image_size.height() * sy
 
-        if 0 <= img_x < pixmap_size.width() and 0 <= img_y < pixmap_size.height():
-            scale_x = self.image.width() / pixmap_size.width()
-            scale_y = self.image.height() / pixmap_size.height()
-            return (img_x * scale_x, img_y * scale_y)
-        return None
+    def get_source_qimage(self):
+        if self.source_qimage is None:
+            self.source_qimage = self.image.toImage()
+        return self.source_qimage
 
-    def update_display(self):
+    def update_display(self, fast=False):
         if self.image:
+            self.viewport.set_view_size(self.width(), self.height())
             self.scaled_pixmap = self.image.scaled(
-                self.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            self.setPixmap(self.scaled_pixmap)
+                QSize(*self.viewport.fit_size()), Qt.IgnoreAspectRatio,
+                Qt.FastTransformation if fast else Qt.SmoothTransformation)
+        else:
+            self.scaled_pixmap = None
+        self.invalidate_annotations()
+
+    def start_smooth_rescale(self):
+        if not self.image:
+            return
+        key = (self.image.cacheKey(), self.size())
+        target = QSize(*self.viewport.fit_size())
+        if self.is_reduced() and (target.width() > self.image.width() or target.height() > self.image.height()):
+            # 窗口比解码尺寸大了：后台按新尺寸重新解码，而不是放大已缩小的图
+            source, path = None, self.image_path
+        else:
+            source, path = self.get_source_qimage(), None
+        self.scale_executor.submit(self.smooth_rescale, key, target, source, path)
+
+    def smooth_rescale(self, key, target, source, path):
+        if source is None:
+            source, _ = read_image(path, target)
+            if source is None:
+                return
+        self.smoothScaled.emit(key, source.scaled(target, Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+
+    def apply_smooth_rescale(self, key, scaled):
+        # 期间换了图片或又改变了窗口尺寸时丢弃结果
+        if self.image and key == (self.image.cacheKey(), self.size()):
+            self.scaled_pixmap = QPixmap.fromImage(scaled)
+            self.update()
 
     def resizeEvent(self, event):
-        self.update_display()
+        self.update_display(fast=True)
+        self.resize_timer.start()
+
+    def wheelEvent(self, event):
+        if not self.image:
+            return
+        self.viewport.zoom_at(event.pos().x(), event.pos().y(), 1.25 ** (event.angleDelta().y() / 120))
+        self.view_changed()
+
+    def mouseDoubleClickEvent(self, event):
+        if event.button() == Qt.MiddleButton and self.image:
+            self.viewport.reset()
+            self.view_changed()
+        else:
+            super().mouseDoubleClickEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        if event.button() == Qt.MiddleButton:
+            self.pan_pos = None
+        elif event.button() == Qt.LeftButton and self.drag is not None:
+            self.finish_drag()
 
     def mouseMoveEvent(self, event):
+        if self.pan_pos is not None:
+            delta = event.pos() - self.pan_pos
+            self.viewport.pan(delta.x(), delta.y())
+            self.pan_pos = event.pos()
+            self.view_changed()
+        elif self.drag is not None:
+            self.drag_to(event.pos())
+        elif self.drawing_mode:
+            # 只重画旧、新两个位置的十字准线和橡皮筋矩形
+            for rect in self.cursor_rects(self.mouse_pos) + self.cursor_rects(event.pos()):
+                self.update(rect)
+        elif self.scaled_pixmap and self.annotations:
+            self.setCursor(self.hover_cursor(self.hit_test(event.pos())))
         self.mouse_pos = event.pos()
         self.mouseMoved.emit(event.pos())
-        self.update()
+
+    def cursor_rects(self, pos):
+        """十字准线和橡皮筋矩形在 pos 处占据的控件区域"""
+        if pos is None:
+            return []
+        rects = [QRect(0, pos.y() - 1, self.width(), 3), QRect(pos.x() - 1, 0, 3, self.height())]
+        if self.bbox_start and self.image:
+            start_x, start_y = self.viewport.image_to_widget(*self.bbox_start)
+            rects.append(QRect(QPoint(int(start_x), int(start_y)), pos).normalized().adjusted(-2, -2, 2, 2))
+        return rects
 
     def mousePressEvent(self, event):
         if event.button() == Qt.RightButton:
             self.rightClicked.emit()  # 发射信号
             return
 
+        if event.button() == Qt.MiddleButton:
+            self.pan_pos = event.pos()
+            return
+
         if event.button() == Qt.RightButton and self.drawing_mode:
             return
 
-        # 新增：检测是否点击了标注框
+        # 检测是否点击了标注：关键点和边可以直接拖动，框内部只选中(重叠时选最小的框)
         if event.button() == Qt.LeftButton and not self.drawing_mode and self.scaled_pixmap:
-            img_pos = self.get_image_position(event.pos())
-            if img_pos:
-                x, y = img_pos
-                img_w, img_h = self.image.width(), self.image.height()
+            hit = self.hit_test(event.pos())
+            if hit is not None:
+                self.bboxClicked.emit(self.ann_ids[hit[1]])  # 发射信号，传递标注框索引
+                if hit[0] != "box":
+                    self.start_drag(hit)
+                return
 
-                # 检查是否点击了某个标注框
-                for i, ann in enumerate(self.annotations):
-                    x_center, y_center, width, height = ann["bbox"]
-                    x1 = (x_center - width / 2) * img_w
-                    y1 = (y_center - height / 2) * img_h
-                    x2 = (x_center + width / 2) * img_w
-                    y2 = (y_center + height / 2) * img_h
+        self.mouseClicked.emit(event.pos())
 
-                    if x1 <= x <= x2 and y1 <= y <= y2:
-                        self.bboxClicked.emit(i)  # 发射信号，传递标注框索引
-                        return
+    def frame_stats(self):
+        avg = self.frame_time_total / self.frame_count if self.frame_count else 0.0
+        return f"绘制: {self.frame_count} 帧, 上一帧 {self.last_frame_time:.2f} ms, 平均 {avg:.2f} ms"
+
+    def get_annotation_layer(self):
+        """静态标注层(边界框、类别、关键点，都按普通样式)，按当前缩放画到透明 QPixmap 中缓存"""
+        if self.annotation_layer is None or self.annotation_layer.size() != self.size() * self.devicePixelRatioF():
+            ratio = self.devicePixelRatioF()
+            self.annotation_layer = QPixmap(self.size() * ratio)
+            self.annotation_layer.setDevicePixelRatio(ratio)
+            self.annotation_layer.fill(Qt.transparent)
+            self.layer_transform = self.viewport.transform()
+            self.layer_timer.stop()
+            self.layer_highlighted = self.highlighted_position()
+            painter = QPainter(self.annotation_layer)
+            painter.setFont(self.font())
+            painter.setRenderHint(QPainter.Antialiasing)
+            self.layer_numbers = self.draw_annotations(painter, self.store.data[self.layer_ann_ids()], -1)
+            painter.end()
+        return self.annotation_layer
+
+    def layer_ann_ids(self, positions=None):
+        """标注层中画的标注在 store 中的序号(高亮和正在拖动的标注不在层里)，positions 为候选的位置"""
+        skip = {self.layer_highlighted, self.drag[0] if self.drag is not None else -1}
+        if positions is None:
+            positions = range(len(self.ann_ids))
+        return [self.ann_ids[p] for p in positions if p not in skip]
+
+    def annotation_extents(self, rows):
+        """每个标注(框和可见的关键点，加上标记和文字的余量)在控件中占据的范围，(N, 4) 数组 x1 y1 x2 y2"""
+        offset_x, offset_y, disp_w, disp_h = self.display_geometry()
+        x_center, y_center, w, h = rows[:, 1:5].T
+        shown = rows[:, 7::3] > 0
+        x1 = np.minimum(x_center - w / 2, np.where(shown, rows[:, 5::3], np.inf).min(axis=1, initial=np.inf))
+        y1 = np.minimum(y_center - h / 2, np.where(shown, rows[:, 6::3], np.inf).min(axis=1, initial=np.inf))
+        x2 = np.maximum(x_center + w / 2, np.where(shown, rows[:, 5::3], -np.inf).max(axis=1, initial=-np.inf))
+        y2 = np.maximum(y_center + h / 2, np.where(shown, rows[:, 6::3], -np.inf).max(axis=1, initial=-np.inf))
+        metrics = self.fontMetrics()
+        margin = max([metrics.horizontalAdvance(name) for name in self.class_names + ["99"]]) + 20
+        return np.stack([offset_x + x1 * disp_w - margin, offset_y + y1 * disp_h - margin,
+                         offset_x + x2 * disp_w + margin, offset_y + y2 * disp_h + margin], axis=1)
+
+    def redraw_layer_region(self, rows):
+        """只重画标注层中 rows(标注数组行)所占的区域：清空后重画层内与该区域相交的标注，结果与整体重画相同"""
+        extents = self.annotation_extents(rows)
+        rect = QRectF(QPointF(*extents[:, :2].min(axis=0)), QPointF(*extents[:, 2:].max(axis=0))).toAlignedRect()
+        layer_extents = self.annotation_extents(self.store.data[self.ann_ids])
+        overlapping = np.flatnonzero((layer_extents[:, 0] < rect.right() + 1) & (layer_extents[:, 2] > rect.left()) &
+                                     (layer_extents[:, 1] < rect.bottom() + 1) & (layer_extents[:, 3] > rect.top()))
+        painter = QPainter(self.annotation_layer)
+        painter.setCompositionMode(QPainter.CompositionMode_Clear)
+        painter.fillRect(rect, Qt.transparent)
+        painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+        painter.setClipRect(rect)
+        painter.setFont(self.font())
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.draw_annotations(painter, self.store.data[self.layer_ann_ids(overlapping.tolist())], -1,
+                              numbers=self.layer_numbers)
+        painter.end()
+        self.update()
 
-        self.mouseClicked.emit(event.pos())
+    def draw_annotation_layer(self, painter):
+        layer = self.get_annotation_layer()
+        transform = self.viewport.transform()
+        if transform == self.layer_transform:
+            painter.drawPixmap(0, 0, layer)
+            return
+        # 缩放平移过程中：控件坐标 = (旧控件坐标 - 旧偏移) / 旧比例 * 新比例 + 新偏移
+        old_sx, old_sy, old_x, old_y = self.layer_transform
+        sx, sy, offset_x, offset_y = transform
+        painter.save()
+        painter.translate(offset_x - old_x * sx / old_sx, offset_y - old_y * sy / old_sy)
+        painter.scale(sx / old_sx, sy / old_sy)
+        painter.drawPixmap(0, 0, layer)
+        painter.restore()
 
     def paintEvent(self, event):
         super().paintEvent(event)
         if not self.image:
             return
 
+        start = time.perf_counter()
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.Antialiasing)
+        if self.viewport.is_fit() and self.scaled_pixmap:
+            offset_x, offset_y, _, _ = self.display_geometry()
+            painter.drawPixmap(int(offset_x), int(offset_y), self.scaled_pixmap)
+        elif self.scaled_pixmap:
+            # 放大后只绘制可见的分块
+            self.get_pyramid().draw(painter, self.viewport)
+
+        if self.scaled_pixmap and self.annotations:
+            highlighted = self.highlighted_position()
+            dragged = self.drag[0] if self.drag is not None else -1
+            if highlighted >= 0 and highlighted != dragged:
+                # 高亮的半透明填充在标注层下面，边框、关键点和文字画在标注层上面(盖住层里的普通样式)
+                row = self.store.data[self.ann_ids[highlighted]]
+                offset_x, offset_y, disp_w, disp_h = self.display_geometry()
+                x_center, y_center, w, h = row[1:5].tolist()
+                painter.fillRect(QRectF(offset_x + (x_center - w / 2) * disp_w, offset_y + (y_center - h / 2) * disp_h,
+                                        w * disp_w, h * disp_h), HIGHLIGHT_FILL)
+            self.draw_annotation_layer(painter)
+            # 被拖动的标注不在缓存的标注层里，每帧单独画(高亮时连同填充)
+            live = [(highlighted, False)] if highlighted >= 0 and highlighted != dragged else []
+            if dragged >= 0:
+                live.append((dragged, True))
+            for position, fill in live:
+                painter.save()
+                painter.setRenderHint(QPainter.Antialiasing)
+                self.draw_annotations(painter, self.store.data[[self.ann_ids[position]]],
+                                      0 if position == highlighted else -1, fill,
+                                      None if position == dragged else self.layer_numbers)
+                painter.restore()
 
         # 绘制十字准线
         if self.drawing_mode and self.mouse_pos:
@@ -137,14 +571,10 @@ class ImageDisplayWidget(QLabel):
             if self.bbox_start:
                 img_pos = self.get_image_position(self.mouse_pos)
                 if img_pos:
-                    img_w, img_h = self.image.width(), self.image.height()
-                    start_x = self.bbox_start[0] / img_w * self.scaled_pixmap.width()
-                    start_y = self.bbox_start[1] / img_h * self.scaled_pixmap.height()
-
-                    label_size = self.size()
-                    pixmap_size = self.scaled_pixmap.size()
-                    offset_x = (label_size.width() - pixmap_size.width()) // 2
-                    offset_y = (label_size.height() - pixmap_size.height()) // 2
+                    img_w, img_h = self.image_size.width(), self.image_size.height()
+                    offset_x, offset_y, disp_w, disp_h = self.display_geometry()
+                    start_x = self.bbox_start[0] / img_w * disp_w
+                    start_y = self.bbox_start[1] / img_h * disp_h
 
                     painter.setBrush(Qt.NoBrush)
                     painter.drawRect(
@@ -154,170 +584,436 @@ class ImageDisplayWidget(QLabel):
                         int(self.mouse_pos.y() - offset_y - start_y)
                     )
 
-        # 绘制标注
-        if self.scaled_pixmap and self.annotations:
-            label_size = self.size()
-            pixmap_size = self.scaled_pixmap.size()
-            offset_x = (label_size.width() - pixmap_size.width()) // 2
-            offset_y = (label_size.height() - pixmap_size.height()) // 2
-            painter.translate(offset_x, offset_y)
-
-            img_w, img_h = self.image.width(), self.image.height()
-            scale_x = pixmap_size.width() / img_w
-            scale_y = pixmap_size.height() / img_h
-
-            for i, ann in enumerate(self.annotations):
-                # 边界框
-                x_center, y_center, width, height = ann["bbox"]
-                x1 = (x_center - width / 2) * pixmap_size.width()
-                y1 = (y_center - height / 2) * pixmap_size.height()
-                x2 = (x_center + width / 2) * pixmap_size.width()
-                y2 = (y_center + height / 2) * pixmap_size.height()
-
-                color = QColor(0, 255, 0)
-                if ann["class_id"] < len(self.class_names):
-                    hue = (ann["class_id"] * 60) % 360
-                    color.setHsv(hue, 255, 255)
-
-                # 新增：如果是高亮的标注框，使用更粗的线条和不同颜色
-                if i == self.highlighted_bbox:
-                    pen = QPen(QColor(255, 255, 0), 4)  # 黄色粗边框
-                    painter.setPen(pen)
-                    painter.setBrush(QColor(255, 255, 0, 50))  # 半透明黄色填充
-                else:
-                    pen = QPen(color, 2)
-                    painter.setPen(pen)
-                    painter.setBrush(Qt.NoBrush)
-
-                painter.drawRect(int(x1), int(y1), int(x2 - x1), int(y2 - y1))
+        painter.end()
+
+        self.last_frame_time = (time.perf_counter() - start) * 1000
+        self.frame_count += 1
+        self.frame_time_total += self.last_frame_time
+        self.frameRendered.emit(self.last_frame_time)
+
+    def class_color(self, class_id):
+        color = QColor(0, 255, 0)
+        if class_id < len(self.class_names):
+            color.setHsv((class_id * 60) % 360, 255, 255)
+        return color
+
+    def static_text(self, text):
+        """排好版的文字缓存，重复绘制时不再重新排版"""
+        static = self.static_texts.get(text)
+        if static is None:
+            static = QStaticText(text)
+            static.setPerformanceHint(QStaticText.AggressiveCaching)
+            self.static_texts[text] = static
+        return static
+
+    def marker_sprite(self, color, visibility):
+        """关键点标记：外圈为标注颜色，可见填红色、遮挡填橙色"""
+        key = (color.rgb(), visibility)
+        sprite = self.marker_sprites.get(key)
+        if sprite is None:
+            ratio = self.devicePixelRatioF()
+            sprite = QPixmap(QSize(2 * MARKER_HALF, 2 * MARKER_HALF) * ratio)
+            sprite.setDevicePixelRatio(ratio)
+            sprite.fill(Qt.transparent)
+            painter = QPainter(sprite)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(QPen(color, 2))
+            painter.setBrush(QColor(255, 0, 0) if visibility == 2 else QColor(255, 165, 0))
+            painter.drawEllipse(QRectF(MARKER_HALF - 5, MARKER_HALF - 5, 10, 10))
+            painter.end()
+            self.marker_sprites[key] = sprite
+        return sprite
+
+    def draw_annotations(self, painter, rows, highlighted, fill=True, numbers=None):
+        """按样式分组批量绘制：同一颜色的框一次 drawRects，关键点贴预渲染的小图，文字用 QStaticText
+
+        rows 为要绘制的标注数组行，highlighted 为其中高亮的行号，fill 为 False 时高亮的框不画半透明填充；
+        numbers 为 None 时关键点序号太多就都不画，为 True/False 时按给定的决定(局部重画沿用整体重画时的决定)。
+        返回是否画了关键点序号
+        """
+        offset_x, offset_y, disp_w, disp_h = self.display_geometry()
+        painter.translate(offset_x, offset_y)
+
+        count = len(rows)
+        boxes = rows[:, 1:5]
+        class_ids = rows[:, 0].astype(np.int64)
+        x1 = (boxes[:, 0] - boxes[:, 2] / 2) * disp_w
+        y1 = (boxes[:, 1] - boxes[:, 3] / 2) * disp_h
+        box_w = boxes[:, 2] * disp_w
+        box_h = boxes[:, 3] * disp_h
+        # 每个框的颜色分组：高亮的框单独一组(-1)
+        groups = class_ids.copy()
+        if highlighted >= 0:
+            groups[highlighted] = -1
+        colors = {group: self.class_color(group) for group in np.unique(class_ids).tolist()}
+        colors[-1] = QColor(255, 255, 0)
+
+        # 边界框：横平竖直的线不需要抗锯齿，关掉后快很多
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        painter.setBrush(Qt.NoBrush)
+        for group in np.unique(groups).tolist():
+            if group == -1:
+                continue
+            painter.setPen(QPen(colors[group], 2))
+            painter.drawRects([QRectF(x1[i], y1[i], box_w[i], box_h[i]) for i in np.flatnonzero(groups == group)])
+        if highlighted >= 0:
+            painter.setPen(QPen(colors[-1], 4))  # 黄色粗边框
+            painter.setBrush(HIGHLIGHT_FILL if fill else Qt.NoBrush)  # 半透明黄色填充
+            painter.drawRect(QRectF(x1[highlighted], y1[highlighted], box_w[highlighted], box_h[highlighted]))
+            painter.setBrush(Qt.NoBrush)
+        painter.setRenderHint(QPainter.Antialiasing)
 
-                # 绘制类别标签
-                class_name = self.class_names[ann["class_id"]] if ann["class_id"] < len(self.class_names) else str(
-                    ann["class_id"])
-                painter.drawText(int(x1) + 5, int(y1) + 15, class_name)
+        # 关键点：同一样式(外圈颜色, 可见/遮挡)的点贴同一个预先画好的抗锯齿小图
+        num_keypoints = (rows.shape[1] - 5) // 3
+        keypoints = rows[:, 5:].reshape(-1, 3)
+        owner = np.repeat(np.arange(count), num_keypoints)
+        kp_index = np.tile(np.arange(num_keypoints), count)
+        px = keypoints[:, 0] * disp_w
+        py = keypoints[:, 1] * disp_h
+        visibility = keypoints[:, 2]
+        kp_groups = groups[owner]
+        shown = visibility > 0
+        sprite_x = px.astype(np.int64) - MARKER_HALF
+        sprite_y = py.astype(np.int64) - MARKER_HALF
+        draw_pixmap = painter.drawPixmap
+        for group in np.unique(kp_groups[shown]).tolist():
+            for v in (1, 2):
+                selected = (kp_groups == group) & (visibility == v)
+                if selected.any():
+                    sprite = self.marker_sprite(colors[group], v)
+                    for x, y in zip(sprite_x[selected].tolist(), sprite_y[selected].tolist()):
+                        draw_pixmap(x, y, sprite)
+
+        # 文字：框太小时看不清，直接跳过；关键点太多时序号互相重叠，也不画(右侧列表里有)
+        ascent = painter.fontMetrics().ascent()
+        name_shown = (box_w >= LABEL_MIN_BOX) & (box_h >= LABEL_MIN_BOX)
+        number_shown = (shown & (kp_index < len(self.keypoint_names)) &
+                        (box_w[owner] >= KEYPOINT_LABEL_MIN_BOX) & (box_h[owner] >= KEYPOINT_LABEL_MIN_BOX))
+        if numbers is None:
+            numbers = np.count_nonzero(number_shown) <= MAX_KEYPOINT_LABELS
+        if not numbers:
+            number_shown[:] = False
+        for group in np.unique(groups).tolist():
+            painter.setPen(colors[group])
+            for i in np.flatnonzero(name_shown & (groups == group)).tolist():
+                class_id = int(class_ids[i])
+                name = self.class_names[class_id] if class_id < len(self.class_names) else str(class_id)
+                painter.drawStaticText(QPointF(x1[i] + 5, y1[i] + 15 - ascent), self.static_text(name))
+            for k in np.flatnonzero(number_shown & (kp_groups == group)).tolist():
+                painter.drawStaticText(QPointF(px[k] + 10, py[k] + 5 - ascent), self.static_text(str(kp_index[k] + 1)))
+        return numbers
+
+
+class ImageListModel(QAbstractListModel):
+    """文件列表模型：视图只会为可见的行调用 data()，50 万张图片也不需要创建 50 万个控件
+
+    行数和显示内容直接来自 files 和 rows，换文件夹、过滤时只重置模型，不把文件名复制进 Qt。
+    rows 为过滤后显示的文件序号(有序 numpy 数组)，None 表示显示全部；标注状态按文件名懒计算并缓存
+    """
+    StatusRole = Qt.UserRole + 1
+    UNLABELED, LABELED, INVALID = range(3)
+    STATUS_COLORS = {UNLABELED: QColor(200, 200, 200), LABELED: QColor(0, 170, 0), INVALID: QColor(220, 0, 0)}
 
-                # 关键点
-                for kp_idx, (x, y, v) in enumerate(ann["keypoints"]):
-                    if v > 0:
-                        px = x * pixmap_size.width()
-                        py = y * pixmap_size.height()
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.folder = ""
+        self.files = []
+        self.rows = None
+        self.row_count = 0  # 显示的行数；扫描中 files 先追加，add_rows 时才增加
+        self.status = {}
+        self.current = -1
+
+    def set_files(self, folder, files, status=None):
+        """status 为 {文件名: 状态}(来自数据集索引)，没有的文件在显示时再检查标注文件"""
+        self.folder = folder
+        self.files = files
+        self.status = dict(status) if status else {}
+        self.current = -1
+        self.set_filter(None)
+
+    def set_filter(self, rows):
+        self.beginResetModel()
+        self.rows = rows
+        self.row_count = len(self.files) if rows is None else len(rows)
+        self.endResetModel()
+
+    def add_rows(self, count):
+        """files 末尾追加了 count 个文件(扫描中)：只增加行数，显示内容在 data() 中从 files 取"""
+        if self.rows is None and count > 0:
+            self.beginInsertRows(QModelIndex(), self.row_count, self.row_count + count - 1)
+            self.row_count += count
+            self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def file_index(self, row):
+        return row if self.rows is None else int(self.rows[row])
+
+    def row_for(self, file_idx):
+        """文件序号对应的行号，被过滤掉时返回 -1"""
+        if self.rows is None:
+            return file_idx if 0 <= file_idx < self.row_count else -1
+        row = int(np.searchsorted(self.rows, file_idx))
+        return row if row < len(self.rows) and self.rows[row] == file_idx else -1
+
+    def file_status(self, name):
+        status = self.status.get(name)
+        if status is None:
+            txt_path = os.path.splitext(os.path.join(self.folder, name))[0] + ".txt"
+            try:
+                status = self.LABELED if os.path.getsize(txt_path) > 0 else self.UNLABELED
+            except OSError:
+                status = self.UNLABELED
+            self.status[name] = status
+        return status
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        file_idx = self.file_index(index.row())
+        name = self.files[file_idx]
+        if role == Qt.DisplayRole:
+            return name
+        if role == self.StatusRole:
+            return self.file_status(name)
+        if role == Qt.DecorationRole:
+            return self.STATUS_COLORS[self.file_status(name)]
+        if role == Qt.BackgroundRole and file_idx == self.current:
+            return QColor(200, 255, 200)  # 浅绿色背景
+        return None
 
-                        # 安全获取关键点名称
-                        kp_name = f"关键点{kp_idx + 1}"
-                        if kp_idx < len(self.keypoint_names):
-                            kp_name = self.keypoint_names[kp_idx]
+    def row_changed(self, file_idx):
+        row = self.row_for(file_idx)
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
 
-                        if v == 2:  # 可见
-                            painter.setBrush(QColor(255, 0, 0))
-                        else:  # 遮挡
-                            painter.setBrush(QColor(255, 165, 0))
+    def set_current(self, file_idx):
+        """切换当前图片的高亮，只刷新新旧两行"""
+        old, self.current = self.current, file_idx
+        self.row_changed(old)
+        self.row_changed(file_idx)
 
-                        painter.drawEllipse(int(px) - 5, int(py) - 5, 10, 10)
+    def set_status(self, file_idx, status):
+        self.status[self.files[file_idx]] = status
+        self.row_changed(file_idx)
 
-                        if kp_idx < len(self.keypoint_names):
-                            painter.drawText(int(px) + 10, int(py) + 5, str(kp_idx + 1))  # 只显示数字
 
-            painter.end()
+class ImageListView(QTableView):
+    """单列、无表头的文件列表
 
+    用 QTableView 而不是 QListView：QListView 布局时对每一行调用模型的 index()，模型在 Python 中时
+    50 万行要几秒；QTableView 的行位置由固定行高的表头在 C++ 中算出，只访问可见的行
+    """
+    fileClicked = pyqtSignal(int)  # 点击的文件序号
 
-class ImageListWidget(QListWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setSelectionMode(QListWidget.SingleSelection)
-        self.setVerticalScrollMode(QListWidget.ScrollPerPixel)
+        self.setSelectionMode(QTableView.SingleSelection)
+        self.setSelectionBehavior(QTableView.SelectRows)
+        self.setVerticalScrollMode(QTableView.ScrollPerPixel)
         self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOn)
+        self.horizontalHeader().hide()
+        self.horizontalHeader().setStretchLastSection(True)
+        self.verticalHeader().hide()
+        # 所有行等高，视图不需要逐行测量尺寸
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.setShowGrid(False)
+        self.setWordWrap(False)
+        self.setTabKeyNavigation(False)
+        size = self.style().pixelMetric(QStyle.PM_ListViewIconSize)  # 状态色块与列表视图一样大
+        self.setIconSize(QSize(size, size))
+        self.setEditTriggers(QTableView.NoEditTriggers)
         self.setStyleSheet("""
-            QListWidget {
+            QTableView {
                 border: 1px solid #ccc;
                 background-color: white;
             }
-            QListWidget::item {
+            QTableView::item {
                 padding: 2px;
                 border-bottom: 1px solid #eee;
             }
-            QListWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #d8e6f3;
                 color: black;
             }
-            QListWidget::item:hover {
+            QTableView::item:hover {
                 background-color: #f0f0f0;
             }
         """)
-
-        # 预加载的项数
-        self.preload_count = 50
-        # 当前加载的范围
-        self.loaded_start = 0
-        self.loaded_end = 0
-
-        # 连接滚动事件
-        self.verticalScrollBar().valueChanged.connect(self.handle_scroll)
-
-    def set_items(self, items):
-        """设置所有项目，但不立即加载"""
-        self.clear()
-        self.items = items
-        self.total_count = len(items)
-        self.loaded_start = 0
-        self.loaded_end = 0
-        self.load_items(0, min(self.preload_count, self.total_count))
-
-    def load_items(self, start, end):
-        """加载指定范围内的项目"""
-        if start >= end or start >= self.total_count:
+        self.clicked.connect(lambda index: self.fileClicked.emit(self.model().file_index(index.row())))
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.modelReset.connect(self.update_row_height)
+        model.rowsInserted.connect(self.update_row_height)
+
+    def update_row_height(self):
+        """按第一行的内容(样式表的内边距、状态色块、字体)设置统一的行高"""
+        if self.model().rowCount() > 0:
+            self.verticalHeader().setDefaultSectionSize(self.sizeHintForRow(0))
+
+    def scroll_to_file(self, file_idx):
+        """选中并滚动到指定文件序号的行"""
+        row = self.model().row_for(file_idx)
+        if row < 0:
+            self.clearSelection()
             return
+        index = self.model().index(row)
+        self.setCurrentIndex(index)
+        self.scrollTo(index, QTableView.PositionAtTop)
 
-        # 确保范围有效
-        start = max(0, start)
-        end = min(self.total_count, end)
 
-        # 添加新项目
-        for i in range(start, end):
-            item = QListWidgetItem(self.items[i])
-            self.addItem(item)
-
-        self.loaded_start = min(self.loaded_start, start) if self.loaded_start != 0 else start
-        self.loaded_end = max(self.loaded_end, end)
-
-    def handle_scroll(self, value):
-        """处理滚动事件，动态加载项目"""
-        scroll_bar = self.verticalScrollBar()
-        max_value = scroll_bar.maximum()
-        current_pos = value
-
-        # 如果接近底部，加载更多项目
-        if current_pos > max_value * 0.8 and self.loaded_end < self.total_count:
-            new_end = min(self.loaded_end + self.preload_count, self.total_count)
-            self.load_items(self.loaded_end, new_end)
-
-        # 如果接近顶部，加载前面的项目
-        elif current_pos < max_value * 0.2 and self.loaded_start > 0:
-            new_start = max(0, self.loaded_start - self.preload_count)
-            self.load_items(new_start, self.loaded_start)
-            # 调整滚动位置以保持视觉连续性
-            scroll_bar.setValue(value + (self.loaded_start - new_start) * self.sizeHintForRow(0))
-            self.loaded_start = new_start
-
-    def scroll_to_item(self, index):
-        """滚动到指定索引的项目"""
-        if index < 0 or index >= self.total_count:
-            return
+class AnnotationTreeModel(QStandardItemModel):
+    """右侧标注面板的模型：每个标注一行(最新的在最上面)，其下每个关键点一行
+
+    标注改动时只更新受影响的行，不再整体重建控件；updating 为 True 时的 itemChanged 来自程序自身
+    """
+    HIGHLIGHT = QColor(255, 255, 160)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setHorizontalHeaderLabels(["标注", "可见性"])
+        self.annotations = []
+        self.class_names = []
+        self.keypoint_names = []
+        self.highlighted = -1
+        self.updating = False
 
-        # 如果项目在已加载范围内，直接滚动到它
-        if self.loaded_start <= index < self.loaded_end:
-            self.setCurrentRow(index - self.loaded_start)
-            self.scrollToItem(self.item(index - self.loaded_start), QListWidget.PositionAtTop)
+    def set_annotations(self, annotations, visible, class_names, keypoint_names):
+        self.updating = True
+        self.removeRows(0, self.rowCount())
+        self.annotations = annotations
+        self.class_names = class_names
+        self.keypoint_names = keypoint_names
+        self.highlighted = -1
+        for i in range(len(annotations)):
+            self.insertRow(0, self.make_row(i, i in visible))
+        self.updating = False
+
+    def display_row(self, ann_idx):
+        return len(self.annotations) - 1 - ann_idx
+
+    def annotation_index(self, index):
+        """(标注序号, 关键点序号)，标注行的关键点序号为 -1"""
+        if index.parent().isValid():
+            return self.display_row(index.parent().row()), index.row()
+        return self.display_row(index.row()), -1
+
+    def make_row(self, ann_idx, visible):
+        name_item = QStandardItem()
+        name_item.setEditable(False)
+        name_item.setCheckable(True)
+        name_item.setCheckState(Qt.Checked if visible else Qt.Unchecked)
+        count_item = QStandardItem()
+        count_item.setEditable(False)
+        for _ in self.annotations[ann_idx]["keypoints"]:
+            kp_item = QStandardItem()
+            kp_item.setEditable(False)
+            name_item.appendRow([kp_item, QStandardItem()])
+        self.fill_annotation(ann_idx, name_item, count_item)
+        return [name_item, count_item]
+
+    def fill_annotation(self, ann_idx, name_item, count_item):
+        ann = self.annotations[ann_idx]
+        class_id = ann["class_id"]
+        class_name = self.class_names[class_id] if class_id < len(self.class_names) else str(class_id)
+        x, y, w, h = ann["bbox"]
+        name_item.setText(f"{class_name}  x={x:.4f}, y={y:.4f}, w={w:.4f}, h={h:.4f}")
+        labeled = sum(1 for kp in ann["keypoints"] if kp[2] > 0)
+        count_item.setText(f"{labeled}/{len(ann['keypoints'])}")
+        for kp_idx in range(len(ann["keypoints"])):
+            self.fill_keypoint(ann_idx, kp_idx, name_item)
+
+    def fill_keypoint(self, ann_idx, kp_idx, name_item):
+        x, y, v = self.annotations[ann_idx]["keypoints"][kp_idx]
+        kp_name = self.keypoint_names[kp_idx] if kp_idx < len(self.keypoint_names) else f"关键点{kp_idx + 1}"
+        kp_item = name_item.child(kp_idx, 0)
+        vis_item = name_item.child(kp_idx, 1)
+        if v == 0 and x == 0 and y == 0:
+            kp_item.setText(f"{kp_idx + 1}. {kp_name}: 未标注")
+            kp_item.setForeground(QColor(160, 160, 160))
         else:
-            # 否则加载包含该项目的区域
-            start = max(0, index - self.preload_count // 2)
-            end = min(self.total_count, index + self.preload_count // 2)
-            self.load_items(start, end)
-            self.setCurrentRow(index - start)
-            self.scrollToItem(self.item(index - start), QListWidget.PositionAtTop)
+            kp_item.setText(f"{kp_idx + 1}. {kp_name}: ({x:.2f}, {y:.2f})")
+            kp_item.setForeground(QColor(0, 0, 0))
+        vis_item.setText({2: "可见", 1: "遮挡"}.get(v, ""))
+        vis_item.setData(v, Qt.UserRole)
+        # 只有已标注的关键点可以切换 可见/遮挡
+        vis_item.setEditable(v > 0)
+
+    def update_annotation(self, ann_idx):
+        row = self.display_row(ann_idx)
+        self.updating = True
+        self.fill_annotation(ann_idx, self.item(row, 0), self.item(row, 1))
+        self.updating = False
+
+    def update_keypoint(self, ann_idx, kp_idx):
+        row = self.display_row(ann_idx)
+        self.updating = True
+        self.fill_keypoint(ann_idx, kp_idx, self.item(row, 0))
+        ann = self.annotations[ann_idx]
+        self.item(row, 1).setText(f"{sum(1 for kp in ann['keypoints'] if kp[2] > 0)}/{len(ann['keypoints'])}")
+        self.updating = False
+
+    def insert_annotation(self, ann_idx, visible=True):
+        """annotations 中已插入 ann_idx 之后调用"""
+        if self.highlighted >= ann_idx:
+            self.highlighted += 1
+        self.updating = True
+        self.insertRow(self.display_row(ann_idx), self.make_row(ann_idx, visible))
+        self.updating = False
+
+    def remove_annotation(self, ann_idx):
+        """annotations 中删除 ann_idx 之前调用"""
+        if self.highlighted == ann_idx:
+            self.highlighted = -1
+        elif self.highlighted > ann_idx:
+            self.highlighted -= 1
+        self.removeRow(self.display_row(ann_idx))
+
+    def set_highlight(self, ann_idx):
+        """只改新旧两行的背景色"""
+        self.updating = True
+        for idx, color in ((self.highlighted, None), (ann_idx, self.HIGHLIGHT)):
+            if 0 <= idx < len(self.annotations):
+                for column in range(2):
+                    item = self.item(self.display_row(idx), column)
+                    if color is None:
+                        item.setData(None, Qt.BackgroundRole)
+                    else:
+                        item.setBackground(color)
+        self.highlighted = ann_idx
+        self.updating = False
+
+
+class VisibilityDelegate(QStyledItemDelegate):
+    """关键点行的"可见性"列用下拉框编辑，结果以 v 值存入 Qt.UserRole"""
+    CHOICES = [("可见", 2), ("遮挡", 1)]
+
+    def createEditor(self, parent, option, index):
+        editor = QComboBox(parent)
+        editor.addItems([text for text, _ in self.CHOICES])
+        editor.activated.connect(lambda _: self.commitData.emit(editor))
+        return editor
+
+    def setEditorData(self, editor, index):
+        v = index.data(Qt.UserRole)
+        editor.setCurrentIndex(0 if v == 2 else 1)
+
+    def setModelData(self, editor, model, index):
+        text, v = self.CHOICES[editor.currentIndex()]
+        if v != index.data(Qt.UserRole):
+            model.setData(index, v, Qt.UserRole)
 
 
 class KeyPointLabeler(QMainWindow):
+    imageLoaded = pyqtSignal(object, object, object)  # 后台解码完成: ((路径, mtime), QImage, 原图尺寸)
+    saveFailed = pyqtSignal(str, str)  # 后台写入标注失败: (路径, 错误信息)
+    scanBatch = pyqtSignal(object, object)  # 扫描到一批图片: (扫描的取消标记, 相对路径列表)
+    scanFinished = pyqtSignal(object, object)  # 扫描和索引更新完成: (扫描的取消标记, FolderScanTask 的结果)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("关键点标注工具")
@@ -328,8 +1024,12 @@ class KeyPointLabeler(QMainWindow):
         self.image_files = []
         self.current_image_index = -1
         self.current_image = None
+        self.current_image_size = None  # 原图尺寸，current_image 是按显示尺寸解码的
         self.current_image_path = ""
-        self.annotations = []
+        self.current_image_key = None
+        self.file_index = FileIndex([])  # 文件名 -> 序号 及搜索用的倒排索引
+        self.dataset_index = None  # 文件夹下的 SQLite 索引：标注状态、实例数，跳到下一张未标注的图片
+        self.label_cache = None  # 文件夹下打包的全部标注，用于数据集统计
         self.drawing_bbox = False
         self.bbox_start = None
         self.bbox_end = None
@@ -340,14 +1040,68 @@ class KeyPointLabeler(QMainWindow):
         self.visible_annotations = set()
         self.highlighted_annotation = -1  # 新增：当前高亮的标注索引
 
-        # 配置
-        # self.class_names = ["people"]
-        self.class_names = ["standing", "sidelying", "prone"]
-        self.keypoint_names = [f"关键点{i + 1}" for i in range(9)]
+        # 图片在 QThreadPool 中按显示尺寸解码，结果按 (路径, mtime) 放进 LRU 缓存，并预取前后几张
+        self.pixmap_cache = LRUCache(256 * 1024 * 1024)
+        self.load_pool = QThreadPool(self)
+        self.load_pool.setMaxThreadCount(2)
+        self.loading = set()
+        self.prefetch_next = 2
+        self.prefetch_prev = 1
+        self.imageLoaded.connect(self.on_image_loaded)
+
+        # 打开文件夹时在后台扫描，找到的图片分批追加到文件列表，第一批到达就显示第一张；
+        # 扫描结束后再换成排序好的列表。scan_cancel 同时用来区分过期扫描发来的信号
+        self.scan_pool = QThreadPool(self)
+        self.scan_pool.setMaxThreadCount(1)
+        self.scan_cancel = None
+        self.scan_first_image = None  # 扫描中自动显示的第一张(扫描顺序，不一定是排序后的第一张)
+        self.recovered_labels = 0
+        self.scanBatch.connect(self.on_scan_batch)
+        self.scanFinished.connect(self.on_scan_finished)
+
+        # 标注只有改动过才保存，交给后台线程写临时文件再重命名；同一文件排队中的多次保存只写最后一次
+        self.label_writer = AtomicLabelWriter(on_error=lambda path, e: self.saveFailed.emit(path, str(e)),
+                                              on_written=self.on_label_written)
+        self.saveFailed.connect(self.on_save_failed)
+
+        # 每次改动先记入文件夹下的 .label_journal(见 edit_journal.py)，崩溃后重新打开该文件夹时恢复；
+        # 每 30 秒把当前图片的改动写入 .txt，所有改动都写入后日志被清空
+        self.journal = None
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.timeout.connect(self.save_annotations)
+        self.autosave_timer.start(30000)
+
+        # 配置：类别、关键点名称和关键点数 K 来自 dataset_schema.json(格式见 annotation_store.py)，
+        # 打开的图片文件夹里有该文件时优先使用，都没有时为 3 个类别、9 个关键点
+        self.schema = parse_schema(DEFAULT_SCHEMA)
+        self.class_names = self.schema.class_names
+        self.keypoint_names = self.schema.keypoint_names
+        self.annotations = AnnotationStore(self.schema.num_keypoints)
 
         # 创建UI
         self.init_ui()
         self.setup_shortcuts()
+        self.apply_schema(None)
+
+    def apply_schema(self, folder):
+        """使用 folder(为 None 或没有配置文件时为工具目录)的数据集配置，读取失败时保留当前配置"""
+        try:
+            schema = find_schema(folder, TOOL_DIR)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "警告", f"读取 {SCHEMA_FILENAME} 失败: {e}")
+            return
+        self.schema = schema
+        self.class_names = schema.class_names
+        self.keypoint_names = schema.keypoint_names
+        self.annotations = AnnotationStore(schema.num_keypoints)
+        self.visible_annotations = set()
+        self.undo_stack = []
+        self.class_combo.clear()
+        self.class_combo.addItems(self.class_names)
+        self.update_annotation_display()
+        self.update_display()
+        self.status_bar.showMessage(
+            f"数据集配置: {len(self.class_names)} 个类别, {schema.num_keypoints} 个关键点", 3000)
 
     def init_ui(self):
         main_widget = QWidget()
@@ -375,6 +1129,27 @@ class KeyPointLabeler(QMainWindow):
         top_buttons.addWidget(self.btn_next)
         left_layout.addLayout(top_buttons)
 
+        # 扫描选项：递归子文件夹(如 camera_id/date/)，过滤模式见 folder_scan.py
+        scan_options = QHBoxLayout()
+        self.chk_recursive = QCheckBox("包含子文件夹")
+        scan_options.addWidget(self.chk_recursive)
+        self.scan_filter_box = QLineEdit()
+        self.scan_filter_box.setPlaceholderText("扫描过滤, 如 cam1/* !*_bak*")
+        scan_options.addWidget(self.scan_filter_box)
+        left_layout.addLayout(scan_options)
+
+        jump_buttons = QHBoxLayout()
+        self.btn_next_unlabeled = QPushButton("下一张未标注(U)")
+        self.btn_next_unlabeled.clicked.connect(self.next_unlabeled_image)
+        jump_buttons.addWidget(self.btn_next_unlabeled)
+        self.btn_next_invalid = QPushButton("下一张异常(I)")
+        self.btn_next_invalid.clicked.connect(self.next_invalid_image)
+        jump_buttons.addWidget(self.btn_next_invalid)
+        self.btn_dataset_stats = QPushButton("数据集统计")
+        self.btn_dataset_stats.clicked.connect(self.show_dataset_stats)
+        jump_buttons.addWidget(self.btn_dataset_stats)
+        left_layout.addLayout(jump_buttons)
+
         # 图片信息
         self.lbl_image_info = QLabel("图片信息将显示在这里")
         left_layout.addWidget(self.lbl_image_info)
@@ -387,12 +1162,19 @@ class KeyPointLabeler(QMainWindow):
         # 搜索框
         self.search_box = QLineEdit()
         self.search_box.setPlaceholderText("搜索图片...")
-        self.search_box.textChanged.connect(self.filter_file_list)
+        # 输入停顿 200 ms 后再搜索
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(200)
+        self.search_timer.timeout.connect(self.filter_file_list)
+        self.search_box.textChanged.connect(self.search_timer.start)
         left_layout.addWidget(self.search_box)
 
         # 文件列表 - 现在放在下方，占据剩余空间
-        self.file_list = ImageListWidget()
-        self.file_list.itemClicked.connect(self.on_file_item_clicked)
+        self.file_model = ImageListModel(self)
+        self.file_list = ImageListView()
+        self.file_list.setModel(self.file_model)
+        self.file_list.fileClicked.connect(self.on_file_item_clicked)
         left_layout.addWidget(self.file_list, 1)  # 添加伸缩因子1使列表占据剩余空间
 
         main_layout.addWidget(left_panel, 2)  # 左侧区域占2份宽度
@@ -404,6 +1186,7 @@ class KeyPointLabeler(QMainWindow):
         self.image_display.mouseMoved.connect(self.update_mouse_position)
         self.image_display.mouseClicked.connect(self.handle_image_click)
         self.image_display.bboxClicked.connect(self.highlight_annotation)
+        self.image_display.annotationDragged.connect(self.on_annotation_dragged)
         center_panel.addWidget(self.image_display)
         main_layout.addLayout(center_panel, 5)  # 中间区域占5份宽度
 
@@ -430,80 +1213,65 @@ class KeyPointLabeler(QMainWindow):
         self.btn_save.clicked.connect(self.save_annotations)
         right_panel.addWidget(self.btn_save)
 
-        self.annotation_scroll = QScrollArea()
-        self.annotation_scroll.setWidgetResizable(True)
-        self.annotation_widget = QWidget()
-        self.annotation_layout = QVBoxLayout()
-        self.annotation_widget.setLayout(self.annotation_layout)
-        self.annotation_scroll.setWidget(self.annotation_widget)
-        right_panel.addWidget(self.annotation_scroll)
+        # 标注列表：单击选中并高亮，双击添加/编辑关键点，右键菜单编辑或删除
+        self.annotation_model = AnnotationTreeModel(self)
+        self.annotation_model.itemChanged.connect(self.on_annotation_item_changed)
+        self.annotation_view = QTreeView()
+        self.annotation_view.setModel(self.annotation_model)
+        self.annotation_view.setUniformRowHeights(True)
+        self.annotation_view.setItemDelegateForColumn(1, VisibilityDelegate(self.annotation_view))
+        self.annotation_view.setEditTriggers(QTreeView.SelectedClicked | QTreeView.DoubleClicked)
+        self.annotation_view.header().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.annotation_view.header().setStretchLastSection(False)
+        self.annotation_view.setContextMenuPolicy(Qt.CustomContextMenu)
+        self.annotation_view.customContextMenuRequested.connect(self.show_annotation_menu)
+        self.annotation_view.clicked.connect(self.on_annotation_clicked)
+        self.annotation_view.doubleClicked.connect(self.on_annotation_double_clicked)
+        right_panel.addWidget(self.annotation_view)
         main_layout.addLayout(right_panel, 3)  # 右侧区域占3份宽度
 
         self.status_bar = self.statusBar()
         self.lbl_mouse_pos = QLabel("鼠标位置: (0, 0)")
         self.status_bar.addPermanentWidget(self.lbl_mouse_pos)
+        self.lbl_render_stats = QLabel(self.image_display.frame_stats())
+        self.image_display.frameRendered.connect(
+            lambda _: self.lbl_render_stats.setText(self.image_display.frame_stats()))
+        self.status_bar.addPermanentWidget(self.lbl_render_stats)
 
     def filter_file_list(self):
         """根据搜索框内容过滤文件列表"""
+        if self.scan_cancel is not None:
+            return  # 扫描中的列表还没有搜索索引，扫描结束后再过滤
         search_text = self.search_box.text().lower()
         if not search_text:
             # 如果没有搜索文本，显示所有文件
-            self.file_list.set_items(self.image_files)
+            self.file_model.set_filter(None)
         else:
             # 过滤出包含搜索文本的文件名
-            filtered_files = [f for f in self.image_files if search_text in f.lower()]
-            self.file_list.set_items(filtered_files)
+            self.file_model.set_filter(self.file_index.search(search_text))
 
         # 如果当前图片在过滤后的列表中，高亮显示
         if self.current_image_index >= 0 and self.current_image_path:
-            current_file = os.path.basename(self.current_image_path)
-            try:
-                idx = self.file_list.items.index(current_file)
-                self.file_list.scroll_to_item(idx)
-            except ValueError:
-                pass
+            self.file_list.scroll_to_file(self.current_image_index)
 
-    def on_file_item_clicked(self, item):
+    def on_file_item_clicked(self, idx):
         """点击文件列表中的项目时加载对应图片"""
-        filename = item.text()
-        try:
-            idx = self.image_files.index(filename)
-            if idx != self.current_image_index:
-                self.save_annotations()
-                self.current_image_index = idx
-                self.load_image()
-        except ValueError:
-            pass
+        if idx != self.current_image_index:
+            self.save_annotations()
+            self.current_image_index = idx
+            self.load_image()
 
     def update_file_list_selection(self):
         """更新文件列表中的选中项以匹配当前图片"""
         if not self.image_files or self.current_image_index < 0:
             return
 
-        # 确保文件列表已加载当前项目
-        current_file = os.path.basename(self.current_image_path)
-        try:
-            idx = self.file_list.items.index(current_file)
-            self.file_list.scroll_to_item(idx)
-
-            # 清除之前的选择
-            for i in range(self.file_list.count()):
-                item = self.file_list.item(i)
-                item.setSelected(False)
-                # 重置背景色
-                item.setBackground(QColor(255, 255, 255))
-
-            # 设置当前选中项的背景色
-            current_item = self.file_list.item(idx - self.file_list.loaded_start)
-            if current_item:
-                current_item.setSelected(True)
-                current_item.setBackground(QColor(200, 255, 200))  # 浅绿色背景
-        except ValueError:
-            pass
+        self.file_model.set_current(self.current_image_index)
+        self.file_list.scroll_to_file(self.current_image_index)
 
     def setup_shortcuts(self):
         # 类别选择快捷键
-        for i in range(5):
+        for i in range(9):
             shortcut = QShortcut(Qt.Key_1 + i, self)
             shortcut.activated.connect(lambda idx=i: self.select_class_and_start_bbox(idx))
 
@@ -523,6 +1291,8 @@ class KeyPointLabeler(QMainWindow):
 
         # 新增：跳转快捷键 (G键)
         QShortcut(Qt.Key_G, self).activated.connect(self.jump_to_image)
+        QShortcut(Qt.Key_U, self).activated.connect(self.next_unlabeled_image)
+        QShortcut(Qt.Key_I, self).activated.connect(self.next_invalid_image)
 
     def jump_to_image(self):
         """跳转到指定图片"""
@@ -545,28 +1315,85 @@ class KeyPointLabeler(QMainWindow):
                 self.current_image_index = idx
                 self.load_image()
 
+    def next_unlabeled_image(self):
+        self.jump_to_status((ImageListModel.UNLABELED,), "未标注")
+
+    def next_invalid_image(self):
+        self.jump_to_status((ImageListModel.INVALID,), "异常(图片无法解码或标注格式错误)")
+
+    def show_dataset_stats(self):
+        """各类别实例数、边界框平均大小和每个关键点的标注比例，在标注缓存上计算(不读取 .txt)"""
+        if self.label_cache is None:
+            return
+        if self.scan_cancel is not None:
+            self.status_bar.showMessage("正在扫描文件夹，完成后才能统计", 3000)
+            return
+        summary = self.label_cache.summary("keypoint", self.schema.num_keypoints)
+        text = format_summary(summary, self.schema.class_names, self.schema.keypoint_names)
+        QMessageBox.information(self, "数据集统计", text + "\n\n(统计截至打开文件夹时，之后保存的改动下次打开时计入)")
+
+    def jump_to_status(self, statuses, description):
+        """按文件名顺序跳到当前图片之后第一张指定状态的图片(到末尾后从头找)，在数据集索引上查询"""
+        if not self.image_files or self.dataset_index is None:
+            return
+        if self.scan_cancel is not None:
+            self.status_bar.showMessage("正在扫描文件夹，完成后才能按标注状态跳转", 3000)
+            return
+        self.save_annotations()
+        name = self.dataset_index.next_with_status(self.image_files[self.current_image_index], statuses)
+        idx = -1 if name is None else self.file_index.index_of(name)
+        if idx < 0 or idx == self.current_image_index:
+            self.status_bar.showMessage(f"没有其他{description}的图片", 3000)
+            return
+        self.current_image_index = idx
+        self.load_image()
+
     def highlight_annotation(self, ann_idx):
         """高亮显示指定的标注"""
         if 0 <= ann_idx < len(self.annotations):
             self.highlighted_annotation = ann_idx
             self.image_display.set_highlighted_bbox(ann_idx)
 
-            # 滚动到对应的标注组
-            scroll_widget = self.annotation_scroll.widget()
-            if scroll_widget:
-                target_widget = scroll_widget.layout().itemAt(len(self.annotations) - ann_idx - 1).widget()
-                if target_widget:
-                    # 设置高亮背景色
-                    for i in range(self.annotation_layout.count()):
-                        item = self.annotation_layout.itemAt(i)
-                        if item.widget():
-                            item.widget().setStyleSheet("")
+            # 高亮并滚动到对应的标注行
+            self.annotation_model.set_highlight(ann_idx)
+            index = self.annotation_model.index(self.annotation_model.display_row(ann_idx), 0)
+            self.annotation_view.scrollTo(index, QTreeView.PositionAtTop)
+
+    def on_annotation_clicked(self, index):
+        ann_idx, _ = self.annotation_model.annotation_index(index)
+        if ann_idx != self.highlighted_annotation:
+            self.highlight_annotation(ann_idx)
 
-                    target_widget.setStyleSheet("QGroupBox { background-color: #FFFFA0; }")
+    def on_annotation_double_clicked(self, index):
+        ann_idx, kp_idx = self.annotation_model.annotation_index(index)
+        if kp_idx == -1:
+            self.start_adding_keypoints(ann_idx)
 
-                    # 滚动到目标位置
-                    scroll_bar = self.annotation_scroll.verticalScrollBar()
-                    scroll_bar.setValue(target_widget.y())
+    def on_annotation_item_changed(self, item):
+        """面板上的复选框和可见性下拉框"""
+        if self.annotation_model.updating:
+            return
+        ann_idx, kp_idx = self.annotation_model.annotation_index(item.index())
+        if kp_idx == -1 and item.column() == 0:
+            self.toggle_annotation_visibility(ann_idx, item.checkState() == Qt.Checked)
+        elif kp_idx >= 0 and item.column() == 1:
+            self.set_keypoint_visibility(ann_idx, kp_idx, item.data(Qt.UserRole))
+            self.annotation_model.update_keypoint(ann_idx, kp_idx)
+
+    def show_annotation_menu(self, pos):
+        index = self.annotation_view.indexAt(pos)
+        if not index.isValid():
+            return
+        ann_idx, kp_idx = self.annotation_model.annotation_index(index)
+        menu = QMenu(self)
+        if kp_idx == -1:
+            menu.addAction("添加/编辑关键点", lambda: self.start_adding_keypoints(ann_idx))
+            menu.addAction("编辑边界框属性", lambda: self.edit_bbox(ann_idx))
+            menu.addAction("删除整个标注", lambda: self.delete_annotation(ann_idx))
+        else:
+            menu.addAction("编辑关键点", lambda: self.edit_keypoint(ann_idx, kp_idx))
+            menu.addAction("删除关键点", lambda: self.delete_keypoint(ann_idx, kp_idx))
+        menu.exec_(self.annotation_view.viewport().mapToGlobal(pos))
 
     def delete_highlighted_annotation(self):
         """删除当前高亮的标注"""
@@ -578,6 +1405,9 @@ class KeyPointLabeler(QMainWindow):
         """删除当前图片及其标注文件"""
         if not self.current_image_path:
             return
+        if self.scan_cancel is not None:
+            self.status_bar.showMessage("正在扫描文件夹，完成后再删除图片", 3000)
+            return
 
         reply = QMessageBox.question(
             self, "确认删除",
@@ -587,7 +1417,14 @@ class KeyPointLabeler(QMainWindow):
 
         if reply == QMessageBox.Yes:
             try:
+                # 先等排队中的写入完成，免得删除后标注文件又被写出来
+                self.label_writer.flush()
+                self.annotations.mark_saved()
+                if self.journal is not None:
+                    self.journal.discard(label_path_of(self.current_image_path))
+
                 # 删除图片文件
+                self.pixmap_cache.discard(self.current_image_key)
                 os.remove(self.current_image_path)
 
                 # 删除对应的标注文件
@@ -596,8 +1433,11 @@ class KeyPointLabeler(QMainWindow):
                     os.remove(txt_path)
 
                 # 从文件列表中移除
+                self.file_index.remove(self.image_files[self.current_image_index])
+                self.dataset_index.remove(self.image_files[self.current_image_index])
                 del self.image_files[self.current_image_index]
-                self.file_list.set_items(self.image_files)  # 更新文件列表
+                self.file_model.set_files(self.image_dir, self.image_files)  # 更新文件列表
+                self.filter_file_list()
 
                 # 加载下一张或上一张图片
                 if self.current_image_index >= len(self.image_files):
@@ -608,10 +1448,12 @@ class KeyPointLabeler(QMainWindow):
                 else:
                     # 没有更多图片了
                     self.current_image = None
+                    self.current_image_size = None
                     self.current_image_path = ""
+                    self.current_image_key = None
                     self.image_display.set_image(None)
                     self.lbl_image_info.setText("没有图片")
-                    self.annotations = []
+                    self.annotations = AnnotationStore(self.schema.num_keypoints)
                     self.update_annotation_display()
                     self.update_display()
 
@@ -660,19 +1502,131 @@ class KeyPointLabeler(QMainWindow):
     def open_folder(self):
         folder = QFileDialog.getExistingDirectory(self, "选择图片文件夹")
         if folder:
+            self.save_annotations()
+            self.label_writer.flush()
+            self.cancel_scan()
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
+            if self.dataset_index is not None:
+                self.dataset_index.close()
             self.image_dir = folder
-            self.image_files = [f for f in os.listdir(folder)
-                                if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))]
-            self.image_files.sort()
+            self.apply_schema(folder)
+            self.recovered_labels = self.recover_journal(folder)
+            self.journal = EditJournal(folder)
+
+            self.image_files = []
+            self.file_index = FileIndex([])
+            self.file_model.set_files(self.image_dir, self.image_files)
+            self.current_image_index = -1
+            self.current_image = None
+            self.current_image_size = None
+            self.current_image_path = ""
+            self.current_image_key = None
+            self.image_display.set_image(None)
+            self.lbl_image_info.setText("正在扫描文件夹...")
+            self.update_ui_state()
 
-            if self.image_files:
-                # 初始化文件列表
-                self.file_list.set_items(self.image_files)
+            # 文件列表和标注状态来自数据集索引，再次打开时只重新读取变化过的标注文件
+            self.dataset_index = DatasetIndex(folder)
+            self.label_cache = LabelCache(folder)
+            include, exclude = parse_filter(self.scan_filter_box.text())
+            cancel = self.scan_cancel = threading.Event()
+            self.scan_pool.start(FolderScanTask(
+                folder, self.dataset_index, self.label_cache, self.chk_recursive.isChecked(), include, exclude, cancel,
+                lambda names: self.scanBatch.emit(cancel, names),
+                lambda result: self.scanFinished.emit(cancel, result)))
+            self.status_bar.showMessage(self.journal_warning() + "正在扫描文件夹...")
+
+    def cancel_scan(self):
+        """取消正在进行的扫描，等后台任务退出(它会访问数据集索引)"""
+        if self.scan_cancel is not None:
+            self.scan_cancel.set()
+            self.scan_cancel = None
+        self.scan_pool.waitForDone()
+
+    def on_scan_batch(self, cancel, names):
+        if cancel is not self.scan_cancel:
+            return  # 已取消的扫描
+        self.image_files.extend(names)
+        self.file_model.add_rows(len(names))
+        if self.current_image_index < 0:
+            self.current_image_index = 0
+            self.scan_first_image = names[0]
+            self.load_image()
+        else:
+            self.update_ui_state()
+            self.lbl_image_info.setText(
+                f"图片 {self.current_image_index + 1}/{len(self.image_files)}: {self.image_files[self.current_image_index]}")
+        self.status_bar.showMessage(f"正在扫描文件夹... 已找到 {len(self.image_files)} 张图片")
 
-                self.current_image_index = 0
-                self.load_image()
-            else:
-                QMessageBox.warning(self, "警告", "文件夹中没有图片文件")
+    def on_scan_finished(self, cancel, result):
+        if cancel is not self.scan_cancel:
+            return
+        self.scan_cancel = None
+        if result is None:
+            return
+        # 换成排序好的列表，当前图片按文件名找到新的序号
+        current = self.image_files[self.current_image_index] if self.current_image_index >= 0 else None
+        self.image_files = result["names"]
+        self.file_index = result["file_index"]
+        self.file_model.set_files(self.image_dir, self.image_files, result["statuses"])
+        self.filter_file_list()
+
+        counts = result["counts"]
+        message = ("扫描完成: 新增 {}, 变化 {}, 删除 {}; ".format(*result["changes"]) +
+                   f"未标注 {counts.get(ImageListModel.UNLABELED, 0)} 张, 异常 {counts.get(ImageListModel.INVALID, 0)} 张")
+        if self.recovered_labels:
+            message = f"从编辑日志恢复了 {self.recovered_labels} 张图片未保存的标注; " + message
+        self.status_bar.showMessage(self.journal_warning() + message, 5000)
+
+        if not self.image_files:
+            self.lbl_image_info.setText("没有图片")
+            QMessageBox.warning(self, "警告", "文件夹中没有图片文件")
+            return
+        index = -1 if current is None else self.file_index.index_of(current)
+        if current == self.scan_first_image and not self.annotations.is_dirty():
+            index = -1  # 还停在自动显示的那张且没有改动时，换成排序后的第一张
+        if index < 0:
+            self.current_image_index = 0
+            self.load_image()
+        else:
+            self.current_image_index = index
+            self.update_ui_state()
+            self.lbl_image_info.setText(
+                f"图片 {index + 1}/{len(self.image_files)}: {self.image_files[index]}")
+            self.update_file_list_selection()
+
+    def journal_warning(self):
+        if self.journal is not None and not self.journal.enabled:
+            return "文件夹不可写，编辑日志已停用(崩溃时无法恢复未保存的改动); "
+        return ""
+
+    def recover_journal(self, folder):
+        """上次没有正常关闭时，把日志中还没写入 .txt 的改动写回标注文件，返回恢复的图片数"""
+        path = os.path.join(folder, JOURNAL_FILENAME)
+        if not os.path.exists(path):
+            return 0
+        recovered = 0
+        for name, data in read_journal(path).items():
+            image_path = os.path.join(folder, name)
+            txt_path = label_path_of(image_path)
+            if not os.path.exists(image_path) or data.shape[1] != self.schema.row_size():
+                print(f"警告: 跳过日志中的 {name}(图片不存在或关键点数与配置不一致)")
+                continue
+            try:
+                if os.path.exists(txt_path):
+                    with open(txt_path, "r", encoding="utf-8") as f:
+                        on_disk, _ = parse_labels(f.read(), self.schema.num_keypoints)
+                    if np.array_equal(on_disk, data):
+                        continue
+                write_atomic(txt_path, format_box_labels(data))
+                recovered += 1
+            except OSError as e:
+                print(f"Error: Cannot recover labels to {txt_path}: {e}")
+                return recovered  # 保留日志，下次打开时再恢复
+        os.remove(path)
+        return recovered
 
     def load_image(self):
         if 0 <= self.current_image_index < len(self.image_files):
@@ -686,14 +1640,18 @@ class KeyPointLabeler(QMainWindow):
             self.image_display.set_drawing_mode(False)
 
             self.current_image_path = os.path.join(self.image_dir, self.image_files[self.current_image_index])
-            pixmap = QPixmap(self.current_image_path)
-
-            if pixmap.isNull():
-                QMessageBox.warning(self, "错误", f"无法加载图片: {self.current_image_path}")
-                return
+            self.current_image_key = self.image_key(self.current_image_index)
+            cached = self.pixmap_cache.get(self.current_image_key)
+            if cached is not None:
+                self.show_loaded_image(*cached)
+            else:
+                # 先显示占位，解码完成后在 on_image_loaded 中换上图片
+                self.current_image = None
+                self.current_image_size = None
+                self.image_display.set_image(None)
+                self.image_display.setText("加载中...")
+                self.request_image(self.current_image_key)
 
-            self.current_image = pixmap
-            self.image_display.set_image(pixmap)
             self.load_annotations()
             self.update_ui_state()
             self.lbl_image_info.setText(
@@ -701,71 +1659,83 @@ class KeyPointLabeler(QMainWindow):
 
             # 更新文件列表选中状态
             self.update_file_list_selection()
+            self.prefetch_neighbors()
+
+    def image_key(self, index):
+        path = os.path.join(self.image_dir, self.image_files[index])
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        return path, mtime
+
+    def request_image(self, key):
+        if key in self.loading or key in self.pixmap_cache:
+            return
+        self.loading.add(key)
+        self.load_pool.start(ImageLoadTask(key, self.image_display.size(), self.imageLoaded.emit))
+
+    def prefetch_neighbors(self):
+        start = max(0, self.current_image_index - self.prefetch_prev)
+        end = min(len(self.image_files), self.current_image_index + self.prefetch_next + 1)
+        for i in range(start, end):
+            if i != self.current_image_index:
+                self.request_image(self.image_key(i))
+
+    def on_image_loaded(self, key, image, image_size):
+        self.loading.discard(key)
+        prefix = os.path.join(self.image_dir, "")
+        name = key[0][len(prefix):]  # 相对文件夹的路径，与文件列表和数据集索引中的名称相同
+        indexed = self.dataset_index is not None and key[0].startswith(prefix)
+        if image is None:
+            idx = self.file_index.index_of(name)
+            if idx >= 0:
+                self.file_model.set_status(idx, ImageListModel.INVALID)
+            if indexed:
+                self.dataset_index.mark_broken(name)
+            if key == self.current_image_key:
+                self.image_display.setText("")
+                QMessageBox.warning(self, "错误", f"无法加载图片: {key[0]}")
+            return
+        if indexed:
+            self.dataset_index.set_image_info(name, image_size.width(), image_size.height())
+        # QPixmap 只能在界面线程创建
+        pixmap = QPixmap.fromImage(image)
+        self.pixmap_cache.put(key, (pixmap, image_size), pixmap.width() * pixmap.height() * 4)
+        if key == self.current_image_key:
+            self.show_loaded_image(pixmap, image_size)
+
+    def show_loaded_image(self, pixmap, image_size):
+        self.current_image = pixmap
+        self.current_image_size = image_size
+        self.image_display.set_image(pixmap, image_size, self.current_image_path)
+        self.update_display()
 
     def update_ui_state(self):
         self.btn_prev.setEnabled(self.current_image_index > 0)
         self.btn_next.setEnabled(self.current_image_index < len(self.image_files) - 1)
 
     def load_annotations(self):
-        self.annotations = []
+        self.annotations = AnnotationStore(self.schema.num_keypoints)
         self.visible_annotations = set()
         txt_path = os.path.splitext(self.current_image_path)[0] + ".txt"
 
-        if os.path.exists(txt_path):
+        # 很快切走又切回来时，这张图片的标注可能还在后台排队，比磁盘上的新，以排队的内容为准
+        pending = self.label_writer.pending_text(txt_path)
+        if pending is not None or os.path.exists(txt_path):
             try:
-                with open(txt_path, "r", encoding='utf-8') as f:
-                    for line_num, line in enumerate(f, 1):
-                        line = line.strip()
-                        if not line:  # 跳过空行
-                            continue
-
-                        parts = line.split()
-                        if len(parts) < 5:  # 至少需要类别ID和bbox
-                            print(f"警告: 第{line_num}行格式不正确 - 需要至少5个参数，实际得到{len(parts)}个")
-                            continue
-
-                        try:
-                            class_id = int(parts[0])
-                            bbox = list(map(float, parts[1:5]))
-                            # 验证bbox值是否在合理范围内
-                            if not (0 <= bbox[0] <= 1 and 0 <= bbox[1] <= 1 and
-                                    0 <= bbox[2] <= 1 and 0 <= bbox[3] <= 1):
-                                print(f"警告: 第{line_num}行bbox值超出0-1范围 - {bbox}")
-                                continue
-
-                            # 解析关键点 (确保有9个关键点)
-                            keypoints = []
-                            for i in range(5, min(5 + 9 * 3, len(parts)), 3):
-                                if i + 2 < len(parts):
-                                    x = float(parts[i])
-                                    y = float(parts[i + 1])
-                                    v = int(parts[i + 2])
-                                    # 验证关键点值
-                                    if not (0 <= x <= 1 and 0 <= y <= 1 and v in (0, 1, 2)):
-                                        print(f"警告: 第{line_num}行关键点值无效 - x:{x}, y:{y}, v:{v}")
-                                        x, y, v = 0, 0, 0  # 设为无效
-                                    keypoints.append((x, y, v))  # 直接添加，不要else分支
-                                else:
-                                    keypoints.append((0, 0, 0))  # 只有数据不足时才补0
-
-                            # 补全到9个关键点
-                            while len(keypoints) < 9:
-                                keypoints.append((0, 0, 0))
-
-                            self.annotations.append({
-                                "class_id": class_id,
-                                "bbox": bbox,
-                                "keypoints": keypoints
-                            })
-                            self.visible_annotations.add(len(self.annotations) - 1)
-
-                        except ValueError as e:
-                            print(f"错误: 第{line_num}行解析失败 - {str(e)}")
-                            continue
-
+                # 整个文件解析成一个数组后统一校验：bbox 越界的行丢弃，无效的关键点置 0，关键点数按 schema 截断或补 0
+                if pending is not None:
+                    self.annotations, warnings = AnnotationStore.from_text(pending, self.schema.num_keypoints)
+                else:
+                    self.annotations, warnings = AnnotationStore.load(txt_path, self.schema.num_keypoints)
             except Exception as e:
                 QMessageBox.critical(self, "错误", f"加载标注文件失败: {str(e)}")
                 return
+            for warning in warnings:
+                print(f"警告: {warning}")
+            self.visible_annotations = set(range(len(self.annotations)))
+        self.annotations.attach(self.journal, self.current_image_path)
 
         self.update_annotation_display()
         self.update_display()
@@ -787,115 +1757,15 @@ class KeyPointLabeler(QMainWindow):
             x, y, _ = self.annotations[ann_idx]["keypoints"][kp_idx]
             self.annotations[ann_idx]["keypoints"][kp_idx] = (x, y, 0)
 
-            self.update_annotation_display()
+            self.annotation_model.update_keypoint(ann_idx, kp_idx)
             self.update_display()
 
-    def create_visibility_handler(self, ann_idx, kp_idx, visibility, checkbox):
-        """创建可见性状态变更处理器"""
-
-        def handler(checked):
-            if checked:
-                # 只有当复选框被选中时才更新状态
-                self.set_keypoint_visibility(ann_idx, kp_idx, visibility)
-                # 确保UI状态同步
-                checkbox.setChecked(True)
-
-        return handler
-
     def update_annotation_display(self):
-        # 清除现有布局
-        while self.annotation_layout.count():
-            child = self.annotation_layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-
-        # 正向遍历标注，但插入到最前面，这样最新的会显示在最上面
-        for i in range(len(self.annotations)):
-            ann = self.annotations[i]
-            group_box = QGroupBox(f"{self.class_names[ann['class_id']]}")
-
-            # 设置高亮背景色
-            if i == self.highlighted_annotation:
-                group_box.setStyleSheet("QGroupBox { background-color: #FFFFA0; }")
-
-            group_layout = QVBoxLayout()
-
-            bbox_label = QLabel(
-                f"边界框: x={ann['bbox'][0]:.4f}, y={ann['bbox'][1]:.4f}, "
-                f"w={ann['bbox'][2]:.4f}, h={ann['bbox'][3]:.4f}"
-            )
-            group_layout.addWidget(bbox_label)
-
-            chk_show_bbox = QCheckBox("显示边界框和关键点")
-            chk_show_bbox.setChecked(i in self.visible_annotations)
-            chk_show_bbox.stateChanged.connect(lambda state, idx=i: self.toggle_annotation_visibility(idx, state))
-            group_layout.addWidget(chk_show_bbox)
-
-            btn_add_keypoints = QPushButton("添加/编辑关键点")
-            btn_add_keypoints.clicked.connect(lambda _, idx=i: self.start_adding_keypoints(idx))
-            group_layout.addWidget(btn_add_keypoints)
-
-            for kp_idx, (x, y, v) in enumerate(ann["keypoints"]):
-                if v == 0 and x == 0 and y == 0:
-                    continue
-
-                # 安全获取关键点名称
-                kp_name = f"关键点{kp_idx + 1}"  # 默认名称
-                if kp_idx < len(self.keypoint_names):
-                    kp_name = self.keypoint_names[kp_idx]
-
-                kp_widget = QWidget()
-                kp_layout = QHBoxLayout()
-                kp_layout.setContentsMargins(0, 0, 0, 0)
-
-                # 关键点基本信息
-                kp_label = QLabel(f"{kp_idx + 1}. {kp_name}: ({x:.2f}, {y:.2f})")
-                kp_layout.addWidget(kp_label, 1)
-
-                # 可见性状态选择
-                visibility_widget = QWidget()
-                visibility_layout = QHBoxLayout()
-                visibility_layout.setContentsMargins(0, 0, 0, 0)
-
-                # 可见(v=2)单选按钮
-                btn_visible = QCheckBox("可见")
-                btn_visible.setChecked(v == 2)
-                btn_visible.toggled.connect(self.create_visibility_handler(i, kp_idx, 2, btn_visible))
-                visibility_layout.addWidget(btn_visible)
-
-                # 遮挡(v=1)单选按钮
-                btn_occluded = QCheckBox("遮挡")
-                btn_occluded.setChecked(v == 1)
-                btn_occluded.toggled.connect(self.create_visibility_handler(i, kp_idx, 1, btn_occluded))
-                visibility_layout.addWidget(btn_occluded)
-
-                # 设置互斥逻辑 - 只影响当前关键点的两个复选框
-                btn_visible.toggled.connect(lambda checked, btn=btn_occluded: btn.setChecked(not checked))
-                btn_occluded.toggled.connect(lambda checked, btn=btn_visible: btn.setChecked(not checked))
-
-                visibility_widget.setLayout(visibility_layout)
-                kp_layout.addWidget(visibility_widget)
-
-                # 删除按钮
-                btn_delete = QPushButton("删除")
-                btn_delete.clicked.connect(lambda _, idx=i, kp=kp_idx: self.delete_keypoint(idx, kp))
-                kp_layout.addWidget(btn_delete)
-
-                kp_widget.setLayout(kp_layout)
-                group_layout.addWidget(kp_widget)
-
-            btn_edit_bbox = QPushButton("编辑边界框属性")
-            btn_edit_bbox.clicked.connect(lambda _, idx=i: self.edit_bbox(idx))
-            group_layout.addWidget(btn_edit_bbox)
-
-            btn_delete = QPushButton("删除整个标注")
-            btn_delete.clicked.connect(lambda _, idx=i: self.delete_annotation(idx))
-            group_layout.addWidget(btn_delete)
-
-            group_box.setLayout(group_layout)
-            self.annotation_layout.insertWidget(0, group_box)
-
-        self.annotation_layout.addStretch()
+        """整体刷新标注面板，只在换图片时使用；单个标注的改动调用 annotation_model 的增量更新"""
+        self.annotation_model.set_annotations(self.annotations, self.visible_annotations,
+                                              self.class_names, self.keypoint_names)
+        if 0 <= self.highlighted_annotation < len(self.annotations):
+            self.annotation_model.set_highlight(self.highlighted_annotation)
 
     def toggle_annotation_visibility(self, ann_idx, state):
         if state:
@@ -912,8 +1782,14 @@ class KeyPointLabeler(QMainWindow):
             self.update_display()
 
     def update_display(self):
-        visible_anns = [ann for i, ann in enumerate(self.annotations) if i in self.visible_annotations]
-        self.image_display.set_annotations(visible_anns, self.class_names, self.keypoint_names)
+        ann_ids = [i for i in range(len(self.annotations)) if i in self.visible_annotations]
+        self.image_display.set_annotations(self.annotations, self.class_names, self.keypoint_names, ann_ids)
+
+    def on_annotation_dragged(self, ann_idx, origin):
+        """在图片上拖动了关键点或边界框的边，origin 为拖动前的标注行"""
+        self.undo_stack.append(("move", ann_idx, origin))
+        self.annotation_model.update_annotation(ann_idx)
+        self.update_display()
 
     def start_bbox_drawing(self):
         # 先取消任何正在进行的操作
@@ -963,19 +1839,14 @@ class KeyPointLabeler(QMainWindow):
         y1, y2 = min(y1, y2), max(y1, y2)
 
         # 计算归一化坐标
-        img_w, img_h = self.current_image.width(), self.current_image.height()
+        img_w, img_h = self.current_image_size.width(), self.current_image_size.height()
         x_center = ((x1 + x2) / 2) / img_w
         y_center = ((y1 + y2) / 2) / img_h
         width = (x2 - x1) / img_w
         height = (y2 - y1) / img_h
 
-        # 添加新标注
-        new_ann_idx = len(self.annotations)
-        self.annotations.append({
-            "class_id": self.class_combo.currentIndex(),
-            "bbox": [x_center, y_center, width, height],
-            "keypoints": [(0, 0, 0)] * 9  # 初始化9个不可见关键点
-        })
+        # 添加新标注(K 个关键点都未标注)
+        new_ann_idx = self.annotations.append(self.class_combo.currentIndex(), [x_center, y_center, width, height])
         self.visible_annotations.add(new_ann_idx)
 
         # 重置状态
@@ -986,7 +1857,7 @@ class KeyPointLabeler(QMainWindow):
         self.image_display.setCursor(Qt.ArrowCursor)  # 强制恢复箭头光标
 
         # 更新显示
-        self.update_annotation_display()
+        self.annotation_model.insert_annotation(new_ann_idx)
         self.update_display()
 
         # 添加到撤销栈
@@ -1031,17 +1902,19 @@ class KeyPointLabeler(QMainWindow):
                 self.image_display.setCursor(Qt.ArrowCursor)  # 强制恢复箭头光标
                 return
 
-            # 确保不超过9个关键点
-            if len(self.temp_keypoints) > 9:
-                self.temp_keypoints = self.temp_keypoints[:9]
-                QMessageBox.warning(self, "提示", "已自动截断为前9个关键点")
+            # 确保不超过 K 个关键点
+            num_keypoints = self.schema.num_keypoints
+            if len(self.temp_keypoints) > num_keypoints:
+                self.temp_keypoints = self.temp_keypoints[:num_keypoints]
+                QMessageBox.warning(self, "提示", f"已自动截断为前{num_keypoints}个关键点")
 
-            # 确保有9个关键点，不足的补0
-            while len(self.temp_keypoints) < 9:
+            # 确保有 K 个关键点，不足的补0
+            while len(self.temp_keypoints) < num_keypoints:
                 self.temp_keypoints.append((0, 0, 0))
 
             # 更新标注
             self.annotations[self.current_annotation_idx]["keypoints"] = self.temp_keypoints.copy()
+            self.annotation_model.update_annotation(self.current_annotation_idx)
 
             # 重置状态
             self.adding_keypoints = False
@@ -1053,7 +1926,6 @@ class KeyPointLabeler(QMainWindow):
             self.image_display.setCursor(Qt.ArrowCursor)  # 强制恢复箭头光标
 
             # 更新显示
-            self.update_annotation_display()
             self.update_display()
             self.status_bar.showMessage("关键点标注完成", 2000)
 
@@ -1100,7 +1972,7 @@ class KeyPointLabeler(QMainWindow):
                 # 获取当前标注和边界框信息
                 ann = self.annotations[self.current_annotation_idx]
                 x_center, y_center, width, height = ann["bbox"]
-                img_w, img_h = self.current_image.width(), self.current_image.height()
+                img_w, img_h = self.current_image_size.width(), self.current_image_size.height()
 
                 # 计算边界框的实际坐标范围
                 bbox_x1 = (x_center - width / 2) * img_w
@@ -1134,8 +2006,8 @@ class KeyPointLabeler(QMainWindow):
                 # 更新临时关键点列表
                 self.temp_keypoints = [kp for kp in ann["keypoints"] if kp[2] > 0]
 
-                # 更新显示
-                self.update_annotation_display()
+                # 更新显示：面板上只刷新这一个关键点行
+                self.annotation_model.update_keypoint(self.current_annotation_idx, first_invisible)
                 self.update_display()
 
                 # 检查是否还有未标注的点
@@ -1183,7 +2055,7 @@ class KeyPointLabeler(QMainWindow):
                 old_v = v
                 new_v = 2 - visibility_combo.currentIndex()
                 self.annotations[ann_idx]["keypoints"][kp_idx] = (x, y, new_v)
-                self.update_annotation_display()
+                self.annotation_model.update_keypoint(ann_idx, kp_idx)
                 self.update_display()
 
                 # 添加到撤销栈
@@ -1219,7 +2091,7 @@ class KeyPointLabeler(QMainWindow):
 
                 self.annotations[ann_idx]["class_id"] = class_combo.currentIndex()
 
-                self.update_annotation_display()
+                self.annotation_model.update_annotation(ann_idx)
                 self.update_display()
 
                 # 添加到撤销栈
@@ -1233,18 +2105,16 @@ class KeyPointLabeler(QMainWindow):
             # 将关键点设置为不可见
             self.annotations[ann_idx]["keypoints"][kp_idx] = (0, 0, 0)
 
-            self.update_annotation_display()
+            self.annotation_model.update_keypoint(ann_idx, kp_idx)
             self.update_display()
 
     def delete_annotation(self, ann_idx):
         if 0 <= ann_idx < len(self.annotations):
-            # 保存到撤销栈
-            self.undo_stack.append(("delete_annotation", ann_idx, self.annotations[ann_idx]))
-
-            del self.annotations[ann_idx]
+            self.annotation_model.remove_annotation(ann_idx)
+            # 保存到撤销栈(被删除的标注行)
+            self.undo_stack.append(("delete_annotation", ann_idx, self.annotations.pop(ann_idx)))
             # 更新可见标注索引
             self.visible_annotations = {i if i < ann_idx else i - 1 for i in self.visible_annotations if i != ann_idx}
-            self.update_annotation_display()
             self.update_display()
 
     def undo_action(self):
@@ -1254,7 +2124,8 @@ class KeyPointLabeler(QMainWindow):
             if action[0] == "add_bbox":
                 ann_idx = action[1]
                 if 0 <= ann_idx < len(self.annotations):
-                    del self.annotations[ann_idx]
+                    self.annotation_model.remove_annotation(ann_idx)
+                    self.annotations.pop(ann_idx)
                     self.visible_annotations.discard(ann_idx)
 
             elif action[0] == "edit_keypoint":
@@ -1263,11 +2134,13 @@ class KeyPointLabeler(QMainWindow):
                         0 <= kp_idx < len(self.annotations[ann_idx]["keypoints"])):
                     x, y, _ = self.annotations[ann_idx]["keypoints"][kp_idx]
                     self.annotations[ann_idx]["keypoints"][kp_idx] = (x, y, old_v)
+                    self.annotation_model.update_keypoint(ann_idx, kp_idx)
 
             elif action[0] == "edit_bbox":
                 ann_idx, old_class = action[1], action[2]
                 if 0 <= ann_idx < len(self.annotations):
                     self.annotations[ann_idx]["class_id"] = old_class
+                    self.annotation_model.update_annotation(ann_idx)
 
             elif action[0] == "delete_annotation":
                 ann_idx, annotation = action[1], action[2]
@@ -1275,41 +2148,53 @@ class KeyPointLabeler(QMainWindow):
                 # 更新可见标注索引
                 self.visible_annotations = {i if i < ann_idx else i + 1 for i in self.visible_annotations}
                 self.visible_annotations.add(ann_idx)
+                self.annotation_model.insert_annotation(ann_idx)
+
+            elif action[0] == "move":
+                ann_idx, old_row = action[1], action[2]
+                if 0 <= ann_idx < len(self.annotations):
+                    self.annotations.set_row(ann_idx, old_row)
+                    self.annotation_model.update_annotation(ann_idx)
 
             elif action[0] == "delete_keypoint":
                 ann_idx, kp_idx, old_kp = action[1], action[2], action[3]
                 if 0 <= ann_idx < len(self.annotations) and kp_idx < len(self.annotations[ann_idx]["keypoints"]):
                     self.annotations[ann_idx]["keypoints"][kp_idx] = old_kp
+                    self.annotation_model.update_keypoint(ann_idx, kp_idx)
 
-            self.update_annotation_display()
             self.update_display()
 
     def save_annotations(self):
+        """有改动时才保存：只看过的图片不会生成或改写标注文件"""
         if not self.current_image_path:
             return
-
         txt_path = os.path.splitext(self.current_image_path)[0] + ".txt"
+        if self.journal is not None:
+            self.journal.saving(txt_path)
+        if not self.annotations.is_dirty():
+            # 改了又撤销回去：磁盘上已是当前内容，日志里这张图片的记录不再需要
+            if self.journal is not None and not self.label_writer.is_pending(txt_path):
+                self.journal.saved(txt_path)
+            return
 
-        try:
-            with open(txt_path, "w") as f:
-                for ann in self.annotations:
-                    line = [str(ann["class_id"])]
-                    line.extend(map(str, ann["bbox"]))
-
-                    # 写入关键点 (确保有9个关键点)
-                    keypoints = ann["keypoints"]
-                    for i in range(9):
-                        if i < len(keypoints):
-                            x, y, v = keypoints[i]
-                        else:
-                            x, y, v = 0, 0, 0
-                        line.extend([str(x), str(y), str(v)])
-
-                    f.write(" ".join(line) + "\n")
-
-            self.status_bar.showMessage(f"标注已保存到 {txt_path}", 3000)
-        except Exception as e:
-            QMessageBox.critical(self, "错误", f"保存标注失败: {e}")
+        self.label_writer.submit(txt_path, self.annotations.to_text())
+        self.annotations.mark_saved()
+        self.file_model.set_status(self.current_image_index,
+                                   ImageListModel.LABELED if self.annotations else ImageListModel.UNLABELED)
+        if self.dataset_index is not None:
+            self.dataset_index.update_label(self.image_files[self.current_image_index], len(self.annotations))
+        self.status_bar.showMessage(f"标注已保存到 {txt_path}", 3000)
+
+    def on_label_written(self, path):
+        # 在写入线程中调用
+        journal = self.journal
+        if journal is not None:
+            journal.saved(path)
+
+    def on_save_failed(self, path, error):
+        if path == os.path.splitext(self.current_image_path)[0] + ".txt":
+            self.annotations.mark_dirty()  # 还在当前图片时，下次保存会重新写入
+        QMessageBox.critical(self, "错误", f"保存标注失败: {path}\n{error}")
 
     def prev_image(self):
         if self.current_image_index > 0:
@@ -1324,7 +2209,7 @@ class KeyPointLabeler(QMainWindow):
             self.load_image()
 
     def closeEvent(self, event):
-        if self.annotations:
+        if self.annotations.is_dirty():
             reply = QMessageBox.question(
                 self, "保存标注",
                 "是否保存当前图片的标注?",
@@ -1336,7 +2221,23 @@ class KeyPointLabeler(QMainWindow):
             elif reply == QMessageBox.Cancel:
                 event.ignore()
                 return
-
+            elif self.journal is not None:
+                self.journal.discard(label_path_of(self.current_image_path))
+
+        # 丢弃排队的预取，等待正在解码的任务结束后再销毁窗口
+        self.load_pool.clear()
+        self.load_pool.waitForDone()
+        self.cancel_scan()
+        # 等后台写完所有排队的标注
+        self.label_writer.close()
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+        if self.dataset_index is not None:
+            # 已排队的图片加载信号在关闭后仍可能送达，置空后 on_image_loaded 不再写索引
+            self.dataset_index.close()
+            self.dataset_index = None
+        self.label_cache = None
         event.accept()
 
 